@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Local agent for the Universal Time Tracker CLI
+An optional background process that keeps a keep-alive HTTP session to the
+server and a short-lived cache of session status, and forwards `tt` requests
+received over a Unix domain socket. Run `tt agent start` to launch it; the
+CLI talks to the server directly whenever the agent isn't running.
+
+Protocol: one JSON object per line in each direction, e.g.
+    {"op": "request", "method": "GET", "url": "...", "params": {...}}
+    {"status": 200, "body": "...", "headers": {...}}
+"""
+
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from pathlib import Path
+
+import spool
+
+# Seconds a cached /sessions/status answer is served without asking the server
+STATUS_TTL = 5
+
+# Keep-alive connections per server, one per request forwarded at the same time
+POOL_SIZE = 8
+
+
+def socket_path():
+    """Location of the agent socket (TIME_TRACKER_AGENT_SOCKET overrides it)"""
+    if os.environ.get('TIME_TRACKER_AGENT_SOCKET'):
+        return Path(os.environ['TIME_TRACKER_AGENT_SOCKET'])
+    return spool.cache_dir() / 'agent.sock'
+
+
+class AgentError(Exception):
+    """The agent accepted a request but failed while handling it"""
+
+
+class AgentResponse:
+    """The parts of a requests.Response the CLI uses"""
+
+    def __init__(self, status_code, text, headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.text)
+
+
+def call(message, timeout=15):
+    """Send one message to the agent and return its reply
+
+    Returns None if no agent is listening, so callers can fall back to direct
+    mode. Once connected, failures raise AgentError instead: the agent may
+    already have forwarded the request, so it must not be resent blindly.
+    """
+    path = socket_path()
+    if not path.exists():
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(str(path))
+        except OSError:
+            return None
+        try:
+            sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
+            data = b''
+            while not data.endswith(b'\n'):
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                data += chunk
+        except OSError as e:
+            raise AgentError(str(e))
+    finally:
+        sock.close()
+    if not data:
+        raise AgentError('Agent closed the connection')
+    return json.loads(data)
+
+
+def ping(timeout=2):
+    """Agent statistics, or None if no agent is answering"""
+    try:
+        return call({'op': 'ping'}, timeout=timeout)
+    except (AgentError, ValueError):
+        return None
+
+
+def request(method, url, **kwargs):
+    """Forward an HTTP request through the agent; None if it isn't running"""
+    reply = call({
+        'op': 'request',
+        'method': method,
+        'url': url,
+        'params': kwargs.get('params'),
+        'json': kwargs.get('json'),
+        'headers': kwargs.get('headers'),
+        'timeout': kwargs.get('timeout', 10)
+    })
+    if reply is None:
+        return None
+    if 'error' in reply:
+        raise AgentError(reply['error'])
+    return AgentResponse(reply['status'], reply['body'], reply.get('headers'))
+
+
+class Agent:
+    """Shared state behind the socket server"""
+
+    def __init__(self):
+        import requests
+        self.requests = requests
+        # Shared by the handler threads; each request forwarded at the same time
+        # takes its own pooled connection
+        self.http = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE
+        )
+        self.http.mount('http://', adapter)
+        self.http.mount('https://', adapter)
+        # Guards status_cache, generation and served, never a request in flight
+        self.lock = threading.Lock()
+        self.status_cache = {}
+        # Bumped by every write, so a status fetched across one isn't cached
+        self.generation = 0
+        self.started_at = time.time()
+        self.served = 0
+
+    def dispatch(self, message):
+        op = message.get('op')
+        if op == 'request':
+            return self.forward(message)
+        if op == 'ping':
+            return {
+                'pid': os.getpid(),
+                'uptime_seconds': int(time.time() - self.started_at),
+                'requests_served': self.served,
+                'cached_statuses': len(self.status_cache)
+            }
+        if op == 'stop':
+            # Stop accepting new clients right away; they fall back to direct mode
+            socket_path().unlink(missing_ok=True)
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return {'stopping': True}
+        return {'error': f'Unknown op: {op}'}
+
+    def forward(self, message):
+        method = message['method'].upper()
+        url = message['url']
+        cacheable = method == 'GET' and url.endswith('/sessions/status')
+        key = (url, json.dumps(message.get('params'), sort_keys=True),
+               json.dumps(message.get('headers'), sort_keys=True))
+
+        write = method != 'GET'
+
+        with self.lock:
+            self.served += 1
+            if cacheable:
+                cached = self.status_cache.get(key)
+                if cached and cached[0] > time.monotonic():
+                    return cached[1]
+            elif write:
+                # Any write may change what status reports
+                self.status_cache.clear()
+                self.generation += 1
+            generation = self.generation
+
+        # Outside the lock, so a slow write doesn't hold up status calls
+        timeout = message.get('timeout', 10)
+        if isinstance(timeout, list):
+            timeout = tuple(timeout)  # (connect, read) arrives as a JSON array
+        try:
+            response = self.http.request(
+                method, url,
+                params=message.get('params'),
+                json=message.get('json'),
+                headers=message.get('headers'),
+                timeout=timeout
+            )
+        except self.requests.exceptions.ConnectionError:
+            return {'error': 'Cannot connect to time tracker server'}
+        except self.requests.exceptions.Timeout:
+            return {'error': 'Request timed out'}
+        except self.requests.exceptions.RequestException as e:
+            return {'error': str(e)}
+        finally:
+            if write:
+                with self.lock:
+                    self.status_cache.clear()
+                    self.generation += 1
+
+        reply = {
+            'status': response.status_code,
+            'body': response.text,
+            'headers': dict(response.headers),
+        }
+        if cacheable and response.status_code == 200:
+            with self.lock:
+                if self.generation == generation:
+                    self.status_cache[key] = (time.monotonic() + STATUS_TTL, reply)
+        return reply
+
+
+class AgentHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                reply = self.server.agent.dispatch(json.loads(line))
+            except Exception as e:
+                reply = {'error': f'Agent error: {e}'}
+            self.wfile.write(json.dumps(reply).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class AgentServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve():
+    """Run the agent in the foreground until it is stopped"""
+    path = socket_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.exists():
+        if call({'op': 'ping'}, timeout=1) is not None:
+            print(f"Agent already running on {path}", file=sys.stderr)
+            sys.exit(1)
+        # Left behind by an agent that didn't shut down cleanly
+        path.unlink()
+
+    agent = Agent()
+    old_umask = os.umask(0o077)  # socket readable by this user only
+    try:
+        server = AgentServer(str(path), AgentHandler)
+    finally:
+        os.umask(old_umask)
+    server.agent = agent
+    agent.server = server
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        path.unlink(missing_ok=True)
+
+
+if __name__ == '__main__':
+    serve()
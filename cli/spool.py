@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Offline event spool for the Universal Time Tracker CLI
+Start/stop/break/commit events are appended to a local JSONL file with the
+client's timestamp and a unique id, then replayed to the server in one batch.
+The server applies each id at most once, so events can be resent safely.
+"""
+
+import json
+import os
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows - fall back to unlocked appends
+    fcntl = None
+
+# Events sent per replay request (the server accepts up to 500)
+REPLAY_BATCH_SIZE = 200
+
+
+def cache_dir():
+    """Per-user directory for CLI state ($XDG_CACHE_HOME/timetracker)"""
+    cache_home = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(cache_home) / 'timetracker'
+
+
+def spool_path():
+    """Location of the spool file (TIME_TRACKER_SPOOL overrides the cache dir)"""
+    if os.environ.get('TIME_TRACKER_SPOOL'):
+        return Path(os.environ['TIME_TRACKER_SPOOL'])
+    return cache_dir() / 'spool.jsonl'
+
+
+@contextmanager
+def _locked(path, mode):
+    """Open the spool with an exclusive lock held for the duration"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, mode, encoding='utf-8') as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield f
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def make_event(event_type, server_url, payload):
+    """Build a spool event stamped with the current time and its UTC offset"""
+    return {
+        'id': uuid.uuid4().hex,
+        'type': event_type,
+        'timestamp': datetime.now().astimezone().isoformat(),
+        'server_url': server_url,
+        'payload': payload
+    }
+
+
+def append(event):
+    """Durably append an event to the spool"""
+    with _locked(spool_path(), 'a') as f:
+        f.write(json.dumps(event) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def pending():
+    """Events waiting to be sent, oldest first"""
+    path = spool_path()
+    if not path.exists():
+        return []
+    with _locked(path, 'r') as f:
+        return _parse(f)
+
+
+def _parse(f):
+    events = []
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            events.append(json.loads(line))
+        except ValueError:
+            # A torn final line from a crash mid-write; nothing else can be
+            # recovered from it
+            continue
+    return events
+
+
+def flush(send):
+    """Replay spooled events and drop the ones the server has settled
+
+    ``send(server_url, events)`` posts one batch and returns the server's
+    per-event results, or None if the server could not be reached. Events the
+    server answered (including client errors, which would fail again) are
+    removed; events for unreachable servers or that hit server errors stay
+    queued in order. Returns the list of results received.
+
+    The lock is only held to read the spool and to remove the settled events,
+    not while sending, so other commands can append in the meantime. A
+    concurrent flush may send the same events again; the server answers those
+    from the results it stored.
+    """
+    path = spool_path()
+    if not path.exists():
+        return []
+
+    events = pending()
+    results = []
+    settled = set()
+
+    # Projects can point at different servers; replay each server's events in order
+    for server_url in dict.fromkeys(e.get('server_url') for e in events):
+        server_events = [e for e in events if e.get('server_url') == server_url]
+        for i in range(0, len(server_events), REPLAY_BATCH_SIZE):
+            batch_results = send(server_url, server_events[i:i + REPLAY_BATCH_SIZE])
+            if batch_results is None:
+                break
+            results.extend(batch_results)
+            settled.update(r['id'] for r in batch_results if r['status'] < 500)
+
+    if not settled:
+        return results
+    # Re-read, keeping events appended (or left by another flush) since the snapshot
+    with _locked(path, 'r+') as f:
+        remaining = [e for e in _parse(f) if e['id'] not in settled]
+        f.seek(0)
+        f.truncate()
+        for event in remaining:
+            f.write(json.dumps(event) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+    return results
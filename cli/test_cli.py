@@ -5,6 +5,13 @@ import yaml
 from click.testing import CliRunner
 from tt import cli
 
+
+@pytest.fixture(autouse=True)
+def cache_home(tmp_path, monkeypatch):
+    """Keep the spool and config cache out of the real user cache dir"""
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    return tmp_path / 'cache'
+
 @pytest.fixture
 def runner():
     """Create a Click test runner"""
@@ -142,4 +149,283 @@ def test_cli_report_no_server(runner):
     with runner.isolated_filesystem():
         result = runner.invoke(cli, ['report', 'today'])
         # This should fail because no .timecfg is found
-        assert result.exit_code != 0  # Expected to fail without config 
\ No newline at end of file
+        assert result.exit_code != 0  # Expected to fail without config
+
+
+def test_cli_report_range_options(runner):
+    """Test that report accepts custom range and grouping options"""
+    result = runner.invoke(cli, ['report', '--help'])
+    assert result.exit_code == 0
+    assert '--from' in result.output
+    assert '--to' in result.output
+    assert '--group-by' in result.output
+
+
+def test_cli_import_commits_help(runner):
+    """Test import-commits command help"""
+    result = runner.invoke(cli, ['import-commits', '--help'])
+    assert result.exit_code == 0
+    assert '--since' in result.output
+    assert '--batch-size' in result.output
+
+
+def test_spool_flush_keeps_undelivered_events(tmp_path, monkeypatch):
+    """Test that spooled events survive until the server settles them"""
+    import spool
+    monkeypatch.setenv('TIME_TRACKER_SPOOL', str(tmp_path / 'spool.jsonl'))
+    first = spool.make_event(
+        'start', 'http://server/api/v1', {'project': 'P', 'description': 'Work'}
+    )
+    second = spool.make_event('stop', 'http://server/api/v1', {'project': 'P'})
+    spool.append(first)
+    spool.append(second)
+    
+    # Server unreachable: nothing is dropped
+    assert spool.flush(lambda server_url, events: None) == []
+    assert [e['id'] for e in spool.pending()] == [first['id'], second['id']]
+    
+    # Server error on the second event: only the first is removed
+    def send(server_url, events):
+        return [
+            {
+                'id': e['id'],
+                'type': e['type'],
+                'status': 200 if e is events[0] else 503,
+                'body': {},
+            }
+            for e in events
+        ]
+    assert len(spool.flush(send)) == 2
+    assert [e['id'] for e in spool.pending()] == [second['id']]
+
+
+def test_spool_append_not_blocked_by_flush(tmp_path, monkeypatch):
+    """Test events can be spooled while a flush is sending, and are kept after it"""
+    import threading
+    import spool
+    monkeypatch.setenv('TIME_TRACKER_SPOOL', str(tmp_path / 'spool.jsonl'))
+    sent = spool.make_event('stop', 'http://server/api/v1', {'project': 'P'})
+    spool.append(sent)
+    late = spool.make_event('start', 'http://server/api/v1', {'project': 'P'})
+    
+    def send(server_url, events):
+        # Another tt command spools an event while this batch is on the wire
+        writer = threading.Thread(target=spool.append, args=(late,))
+        writer.start()
+        writer.join(5)
+        assert not writer.is_alive()
+        return [
+            {'id': e['id'], 'type': e['type'], 'status': 200, 'body': {}}
+            for e in events
+        ]
+    
+    assert [r['id'] for r in spool.flush(send)] == [sent['id']]
+    assert [e['id'] for e in spool.pending()] == [late['id']]
+
+
+def test_cli_sync_without_config(runner, tmp_path, monkeypatch):
+    """Test that sync runs outside a project and with an empty spool"""
+    monkeypatch.setenv('TIME_TRACKER_SPOOL', str(tmp_path / 'spool.jsonl'))
+    with runner.isolated_filesystem():
+        result = runner.invoke(cli, ['sync'])
+        assert result.exit_code == 0
+        assert 'Nothing to sync' in result.output
+
+
+def test_cli_startup_skips_heavy_imports():
+    """Test that importing the CLI and showing help doesn't load requests or yaml"""
+    import subprocess
+    import sys
+    code = (
+        "import sys, tt\n"
+        "try:\n    tt.cli(['--help'])\nexcept SystemExit:\n    pass\n"
+        "print(sorted(m for m in ('requests', 'yaml', 'subprocess')"
+        " if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', code],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        check=True,
+    )
+    assert result.stdout.strip().splitlines()[-1] == '[]'
+
+
+def test_project_config_cache_invalidation(temp_project, monkeypatch):
+    """Test that the cached config follows edits and new nearer .timecfg files"""
+    from tt import ProjectConfig
+    subdir = os.path.join(temp_project, 'src')
+    os.mkdir(subdir)
+    monkeypatch.chdir(subdir)
+    
+    assert ProjectConfig().get_project_name() == 'Test Project'
+    # Second load is served from the cache
+    cached = ProjectConfig()
+    assert not hasattr(cached, '_searched')
+    assert cached.get_project_name() == 'Test Project'
+    
+    with open(os.path.join(temp_project, '.timecfg'), 'w') as f:
+        yaml.dump({'project': {'name': 'Renamed'}}, f)
+    assert ProjectConfig().get_project_name() == 'Renamed'
+    
+    with open(os.path.join(subdir, '.timecfg'), 'w') as f:
+        yaml.dump({'project': {'name': 'Nested'}}, f)
+    assert ProjectConfig().get_project_name() == 'Nested'
+
+
+def test_agent_forwards_requests_and_caches_status(tmp_path, monkeypatch):
+    """Test the agent socket fast path and its short-lived status cache"""
+    import threading
+    import agent
+    socket_file = tmp_path / 'agent.sock'
+    monkeypatch.setenv('TIME_TRACKER_AGENT_SOCKET', str(socket_file))
+    status_url = 'http://server/api/v1/sessions/status'
+    
+    # No agent running: callers fall back to direct mode
+    assert agent.request('GET', status_url) is None
+    
+    class FakeResponse:
+        status_code = 200
+        text = '{"active_session": null}'
+        headers = {'Content-Type': 'application/json'}
+    
+    calls = []
+    state = agent.Agent()
+    monkeypatch.setattr(
+        state.http,
+        'request',
+        lambda method, url, **kwargs: calls.append(method) or FakeResponse(),
+    )
+    server = agent.AgentServer(str(socket_file), agent.AgentHandler)
+    server.agent = state
+    state.server = server
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        for _ in range(3):
+            response = agent.request('GET', status_url, params={'project': 'P'})
+        assert response.status_code == 200
+        assert response.json() == {'active_session': None}
+        assert calls == ['GET']
+        
+        # Writes invalidate the cached status
+        agent.request(
+            'POST', 'http://server/api/v1/sessions/stop', json={'project': 'P'}
+        )
+        agent.request('GET', status_url, params={'project': 'P'})
+        assert calls == ['GET', 'POST', 'GET']
+        assert agent.ping()['requests_served'] == 5
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_agent_serves_status_while_a_write_is_in_flight(tmp_path, monkeypatch):
+    """Test a slow write doesn't hold up status calls, which aren't cached across it"""
+    import threading
+    import agent
+    socket_file = tmp_path / 'agent.sock'
+    monkeypatch.setenv('TIME_TRACKER_AGENT_SOCKET', str(socket_file))
+    status_url = 'http://server/api/v1/sessions/status'
+    
+    class FakeResponse:
+        status_code = 200
+        text = '{}'
+        headers = {}
+    
+    calls = []
+    write_started = threading.Event()
+    release_write = threading.Event()
+    
+    def fake_request(method, url, **kwargs):
+        calls.append(method)
+        if method == 'POST':
+            write_started.set()
+            release_write.wait(5)
+        return FakeResponse()
+    
+    state = agent.Agent()
+    monkeypatch.setattr(state.http, 'request', fake_request)
+    server = agent.AgentServer(str(socket_file), agent.AgentHandler)
+    server.agent = state
+    state.server = server
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        write = threading.Thread(
+            target=agent.request,
+            args=('POST', 'http://server/api/v1/sessions/stop'),
+            kwargs={'json': {'project': 'P'}},
+        )
+        write.start()
+        assert write_started.wait(5)
+        
+        # Answered while the write is still waiting on the server
+        assert agent.request('GET', status_url, timeout=2).status_code == 200
+        assert write.is_alive()
+        release_write.set()
+        write.join(5)
+        
+        # The status fetched during the write may predate it, so it wasn't kept
+        agent.request('GET', status_url)
+        assert calls == ['POST', 'GET', 'GET']
+    finally:
+        release_write.set()
+        server.shutdown()
+        server.server_close()
+
+
+def test_request_headers_send_timezone(monkeypatch):
+    """Test the timezone header comes from the env, then .timecfg, skipping bad zones"""
+    import click
+    from tt import request_headers
+    
+    class Config:
+        def get_timezone(self):
+            return 'Asia/Tokyo'
+    
+    monkeypatch.delenv('TIME_TRACKER_TIMEZONE', raising=False)
+    monkeypatch.setenv('TZ', 'Not/AZone')
+    with click.Context(cli, obj={'config': Config()}):
+        assert request_headers()['X-Time-Tracker-Timezone'] == 'Asia/Tokyo'
+        monkeypatch.setenv('TIME_TRACKER_TIMEZONE', 'Europe/Berlin')
+        assert request_headers()['X-Time-Tracker-Timezone'] == 'Europe/Berlin'
+    with click.Context(cli, obj={}):
+        monkeypatch.setenv('TIME_TRACKER_TIMEZONE', 'Not/AZone')
+        assert 'X-Time-Tracker-Timezone' not in request_headers()
+
+
+def test_projects_pages_through_list(runner, monkeypatch):
+    """Test tt projects follows X-Next-Cursor until the list (or --limit) runs out"""
+    import tt
+    
+    class Page:
+        status_code = 200
+
+        def __init__(self, names, cursor):
+            self.names = names
+            self.headers = {'X-Next-Cursor': cursor} if cursor else {}
+
+        def json(self):
+            return [
+                {'name': name, 'type': 'development', 'last_activity': None}
+                for name in self.names
+            ]
+    
+    pages = {None: Page(['alpha', 'beta'], 'c1'), 'c1': Page(['gamma'], None)}
+    requests_made = []
+
+    def fake_request(method, url, params=None, **kwargs):
+        requests_made.append(dict(params))
+        return pages[params.get('cursor')]
+
+    monkeypatch.setattr(tt, 'make_request', fake_request)
+    
+    result = runner.invoke(cli, ['projects', '--search', 'a'])
+    assert result.exit_code == 0
+    assert 'Tracked Projects (3)' in result.output and 'gamma' in result.output
+    assert requests_made[0] == {'sort': 'name', 'prefix': 'a', 'limit': 500}
+    
+    requests_made.clear()
+    result = runner.invoke(cli, ['projects', '--recent', '--limit', '2'])
+    assert 'Tracked Projects (2+)' in result.output and 'gamma' not in result.output
+    assert requests_made == [{'sort': 'last_activity', 'limit': 2}]
@@ -4,27 +4,105 @@ Universal Time Tracker CLI
 Command line client for time tracking with .timecfg support
 """
 
+# requests, yaml and subprocess are imported where they are used: `tt` runs
+# from shell prompts and git hooks, where every millisecond of startup shows
 import click
-import requests
-import yaml
+import json
 import os
-import subprocess
 import sys
 from pathlib import Path
 from datetime import datetime, timedelta
 
+import agent
+import spool
+
+# Seconds to wait for the server to accept a connection before queueing events
+CONNECT_TIMEOUT = 2
+
+# Working directories remembered in the parsed config cache
+MAX_CACHED_CONFIGS = 200
+
+
+def _stat_stamp(path):
+    """Identify a file or directory version by mtime, inode and size"""
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_ino, st.st_size]
+
+
 class ProjectConfig:
     """Handle .timecfg file parsing and project configuration"""
     
     def __init__(self):
-        self.config_file = self._find_config_file()
-        self.config = self._load_config() if self.config_file else None
+        self._cwd = str(Path.cwd())
+        cached = self._load_cached()
+        if cached:
+            config_file, self.config = cached
+            self.config_file = Path(config_file) if config_file else None
+        else:
+            self.config_file = self._find_config_file()
+            self.config = self._load_config() if self.config_file else None
+            self._store_cached()
+    
+    def _load_cached(self):
+        """Return (config_file, config) from the cache if nothing it depends on changed
+        
+        An entry records the stamp of the .timecfg it was parsed from and of every
+        directory searched on the way up, so editing the file or creating a new
+        .timecfg closer to the working directory invalidates it.
+        """
+        try:
+            with open(spool.cache_dir() / 'config-cache.json', encoding='utf-8') as f:
+                entry = json.load(f)['entries'][self._cwd]
+            for path, stamp in entry['stamps'].items():
+                if _stat_stamp(path) != stamp:
+                    return None
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return entry['config_file'], entry['config']
+    
+    def _store_cached(self):
+        """Remember the resolved config for this working directory (best effort)"""
+        # The directory holding .timecfg is covered by the file's own stamp; its
+        # mtime changes with every file created next to it, so leave it out
+        searched = self._searched[:-1] if self.config_file else self._searched
+        stamps = {}
+        try:
+            for directory in searched:
+                stamps[str(directory)] = _stat_stamp(directory)
+            if self.config_file:
+                stamps[str(self.config_file)] = _stat_stamp(self.config_file)
+            
+            cache_file = spool.cache_dir() / 'config-cache.json'
+            try:
+                with open(cache_file, encoding='utf-8') as f:
+                    entries = json.load(f)['entries']
+            except (OSError, ValueError, KeyError):
+                entries = {}
+            entries.pop(self._cwd, None)
+            entries[self._cwd] = {
+                'config_file': str(self.config_file) if self.config_file else None,
+                'stamps': stamps,
+                'config': self.config
+            }
+            # Oldest entries are dropped first (dicts keep insertion order)
+            entries = dict(list(entries.items())[-MAX_CACHED_CONFIGS:])
+            
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = cache_file.with_name(f'{cache_file.name}.{os.getpid()}.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'entries': entries}, f)
+            os.replace(tmp_file, cache_file)
+        except (OSError, TypeError, ValueError):
+            # YAML values JSON can't hold, read-only home, etc. - just skip caching
+            pass
     
     def _find_config_file(self):
         """Walk up directory tree to find .timecfg"""
         current = Path.cwd()
+        self._searched = []
         
         while current != current.parent:
+            self._searched.append(current)
             config_file = current / ".timecfg"
             if config_file.exists():
                 return config_file
@@ -36,7 +114,8 @@ class ProjectConfig:
         """Load and validate project configuration"""
         if not self.config_file:
             return None
-            
+        
+        import yaml
         with open(self.config_file, 'r') as f:
             config = yaml.safe_load(f)
         
@@ -96,9 +175,88 @@ class ProjectConfig:
         if not self.config:
             return {}
         return self.config.get('aliases', {})
+    
+    def get_timezone(self):
+        if not self.config:
+            return None
+        return (self.config.get('reporting') or {}).get('timezone')
+
+
+def local_timezone_name():
+    """IANA name of the system time zone (from TZ or /etc/localtime), or None"""
+    zone = os.environ.get('TZ', '').lstrip(':')
+    if not zone:
+        target = os.path.realpath('/etc/localtime')
+        zone = target.split('zoneinfo/', 1)[1] if 'zoneinfo/' in target else None
+    return zone or None
+
+
+def request_timezone():
+    """Time zone the server should use for our times and days
+    
+    TIME_TRACKER_TIMEZONE wins, then reporting.timezone in .timecfg, then the
+    system zone. Names Python doesn't know are not sent.
+    """
+    ctx = click.get_current_context(silent=True)
+    config = (
+        ctx.find_root().obj.get('config')
+        if ctx and isinstance(ctx.find_root().obj, dict)
+        else None
+    )
+    for zone in (
+        os.environ.get('TIME_TRACKER_TIMEZONE'),
+        config and config.get_timezone(),
+        local_timezone_name(),
+    ):
+        if not zone:
+            continue
+        try:
+            from zoneinfo import ZoneInfo
+            ZoneInfo(zone)
+            return zone
+        except (ImportError, ValueError, KeyError, OSError):
+            continue
+    return None
+
+
+def display_time(value):
+    """A timestamp from the server as a datetime in our time zone"""
+    timestamp = datetime.fromisoformat(value)
+    zone = request_timezone()
+    if zone:
+        from zoneinfo import ZoneInfo
+        return timestamp.astimezone(ZoneInfo(zone))
+    return timestamp.astimezone()
+
+
+def request_headers():
+    """Headers sent with every request"""
+    headers = {}
+    # Identify ourselves to shared servers so they record and scope by our user
+    user_id = os.environ.get('TIME_TRACKER_USER_ID')
+    if user_id:
+        headers['X-Time-Tracker-User'] = user_id
+    # Times without an offset, and day boundaries in reports, are in our zone
+    zone = request_timezone()
+    if zone:
+        headers['X-Time-Tracker-Timezone'] = zone
+    return headers
+
 
 def make_request(method, url, **kwargs):
     """Make HTTP request with error handling"""
+    kwargs['headers'] = {**request_headers(), **kwargs.get('headers', {})}
+    
+    # Fast path: reuse the local agent's open connection when it is running
+    try:
+        response = agent.request(method, url, **kwargs)
+    except agent.AgentError as e:
+        click.echo(f"❌ Request failed: {e}")
+        sys.exit(1)
+    if response is not None:
+        return response
+    
+    import requests
     try:
         response = requests.request(method, url, timeout=10, **kwargs)
         return response
@@ -113,14 +271,86 @@ def make_request(method, url, **kwargs):
         click.echo(f"❌ Request failed: {e}")
         sys.exit(1)
 
+
+def send_replay(server_url, events):
+    """Post a batch of spooled events
+
+    Returns the per-event results, or None if the server is unreachable.
+    """
+    try:
+        response = agent.request(
+            'POST',
+            f"{server_url}/sessions/replay",
+            json={'events': events},
+            headers=request_headers(),
+            timeout=(CONNECT_TIMEOUT, 10),
+        )
+    except agent.AgentError:
+        return None
+    if response is not None:
+        return response.json()['results'] if response.status_code == 200 else None
+    
+    import requests
+    try:
+        response = requests.post(
+            f"{server_url}/sessions/replay",
+            json={'events': events},
+            headers=request_headers(),
+            timeout=(CONNECT_TIMEOUT, 10),
+        )
+    except requests.exceptions.RequestException:
+        return None
+    if response.status_code != 200:
+        return None
+    return response.json()['results']
+
+
+def start_background_sync():
+    """Flush the spool in a detached process so the current command returns at once"""
+    import subprocess
+    subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), 'sync', '--quiet'],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def send_event(ctx, event_type, payload):
+    """Record a write event in the spool and try to deliver it
+
+    Every event is written to the local spool first, so nothing is lost if the
+    server is down or the connection drops mid-request. Returns the server's
+    (status, body) for the event, or None if it is queued for `tt sync`.
+    Set TIME_TRACKER_SPOOL_MODE=always to hand delivery to a background process.
+    """
+    event = spool.make_event(event_type, ctx.obj['server_url'], payload)
+    spool.append(event)
+    
+    if os.environ.get('TIME_TRACKER_SPOOL_MODE', 'auto') == 'always':
+        start_background_sync()
+        return None
+    
+    # Earlier queued events are replayed first, in the same request
+    for result in spool.flush(send_replay):
+        if result['id'] == event['id']:
+            return result['status'], result['body']
+    return None
+
+
+def echo_queued():
+    click.echo("📥 Server unreachable - event saved and will be sent with 'tt sync'")
+
+
 @click.group()
 @click.pass_context
 def cli(ctx):
     """Universal Time Tracker - Track time across all your projects"""
     ctx.ensure_object(dict)
     
-    # Skip config loading for init command
-    if ctx.invoked_subcommand == 'init':
+    # Skip config loading for commands that don't need a project
+    if ctx.invoked_subcommand in ('init', 'sync', 'agent'):
         return
     
     # Load project configuration
@@ -162,7 +392,6 @@ def init(name, type, server):
         language = 'javascript'
         if (cwd / 'package.json').exists():
             try:
-                import json
                 with open(cwd / 'package.json') as f:
                     pkg = json.load(f)
                     deps = {**pkg.get('dependencies', {}), **pkg.get('devDependencies', {})}
@@ -211,7 +440,7 @@ git:
   link_commits: true
 
 reporting:
-  timezone: "America/New_York"
+  timezone: "{local_timezone_name() or 'UTC'}"
   weekly_summary: true
   export_formats: ["json", "csv"]
 
@@ -349,16 +578,17 @@ def start(ctx, description, category):
         'category': category
     }
     
-    response = make_request('POST', f"{ctx.obj['server_url']}/sessions/start", json=payload)
+    result = send_event(ctx, 'start', payload)
     
-    if response.status_code == 200:
-        data = response.json()
+    if result is None or result[0] == 200:
         click.echo(f"⏰ Started: {description}")
         click.echo(f"📁 Project: {ctx.obj['project_name']}")
         click.echo(f"🏷️  Category: {category}")
         click.echo(f"🕐 Time: {datetime.now().strftime('%H:%M:%S')}")
+        if result is None:
+            echo_queued()
     else:
-        click.echo(f"❌ Error: {response.text}")
+        click.echo(f"❌ Error: {result[1].get('error')}")
 
 @cli.command()
 @click.pass_context  
@@ -366,10 +596,13 @@ def stop(ctx):
     """Stop tracking time"""
     payload = {'project': ctx.obj['project_name']}
     
-    response = make_request('POST', f"{ctx.obj['server_url']}/sessions/stop", json=payload)
+    result = send_event(ctx, 'stop', payload)
     
-    if response.status_code == 200:
-        data = response.json()
+    if result is None:
+        click.echo(f"⏹️  Stopped at {datetime.now().strftime('%H:%M:%S')}")
+        echo_queued()
+    elif result[0] == 200:
+        data = result[1]
         duration = data.get('duration_minutes', 0)
         hours = duration // 60
         minutes = duration % 60
@@ -378,7 +611,7 @@ def stop(ctx):
         click.echo(f"⏱️  Duration: {hours}h {minutes}m")
         click.echo(f"🕐 Time: {datetime.now().strftime('%H:%M:%S')}")
     else:
-        click.echo(f"❌ Error: {response.text}")
+        click.echo(f"❌ Error: {result[1].get('error')}")
 
 @cli.command()
 @click.argument('break_type', default='break')
@@ -390,10 +623,13 @@ def break_cmd(ctx, break_type):
         'break_type': break_type
     }
     
-    response = make_request('POST', f"{ctx.obj['server_url']}/sessions/break", json=payload)
+    result = send_event(ctx, 'break', payload)
     
-    if response.status_code == 200:
-        data = response.json()
+    if result is None:
+        click.echo(f"☕ Break toggled: {break_type}")
+        echo_queued()
+    elif result[0] == 200:
+        data = result[1]
         
         if data['action'] == 'started':
             click.echo(f"☕ Break started: {break_type}")
@@ -402,7 +638,7 @@ def break_cmd(ctx, break_type):
             duration = data.get('duration_minutes', 0)
             click.echo(f"▶️  Resumed from {data['break_type']} ({duration} minutes)")
     else:
-        click.echo(f"❌ Error: {response.text}")
+        click.echo(f"❌ Error: {result[1].get('error')}")
 
 # Add alias for break command
 @cli.command()
@@ -427,7 +663,7 @@ def status(ctx):
         
         if data.get('active_session'):
             session = data['active_session']
-            start_time = datetime.fromisoformat(session['start_time']).strftime('%H:%M:%S')
+            start_time = display_time(session['start_time']).strftime('%H:%M:%S')
             
             click.echo(f"🟢 Active: {session['description']}")
             click.echo(f"   Started: {start_time}")
@@ -435,7 +671,9 @@ def status(ctx):
             
             if data.get('active_break'):
                 break_info = data['active_break']
-                break_start = datetime.fromisoformat(break_info['start_time']).strftime('%H:%M:%S')
+                break_start = display_time(break_info['start_time']).strftime(
+                    '%H:%M:%S'
+                )
                 click.echo(f"   ☕ On {break_info['type']} since {break_start}")
         else:
             click.echo("⭕ No active session")
@@ -447,19 +685,51 @@ def status(ctx):
     else:
         click.echo(f"❌ Error: {response.text}")
 
+
 @cli.command()
 @click.argument('period', default='today')
 @click.option('--format', '-f', default='table', help='Output format: table, json')
+@click.option('--from', 'date_from', help='Start date (YYYY-MM-DD) for a custom range')
+@click.option(
+    '--to', 'date_to', help='End date (YYYY-MM-DD, inclusive) for a custom range'
+)
+@click.option(
+    '--group-by',
+    '-g',
+    help=(
+        'Comma-separated grouping: day, week, iso_week, month, hour, project, '
+        'category, user'
+    ),
+)
 @click.pass_context
-def report(ctx, period, format):
-    """Generate time tracking reports (today, week, month)"""
+def report(ctx, period, format, date_from, date_to, group_by):
+    """Generate time tracking reports (today, week, month, quarter, year)"""
     
-    if period not in ['today', 'week', 'month']:
-        click.echo("❌ Invalid period. Use: today, week, month")
+    if period not in ['today', 'week', 'month', 'quarter', 'year']:
+        click.echo("❌ Invalid period. Use: today, week, month, quarter, year")
+        return
+    
+    if date_to and not date_from:
+        click.echo("❌ --to requires --from")
         return
     
     params = {'project': ctx.obj['project_name'], 'format': format}
-    response = make_request('GET', f"{ctx.obj['server_url']}/reports/{period}", params=params)
+    if date_from or group_by:
+        # Custom ranges and groupings are aggregated server-side
+        params['group_by'] = group_by or ''
+        if date_from:
+            params['from'] = date_from
+            if date_to:
+                params['to'] = date_to
+        else:
+            params['period'] = period
+        response = make_request(
+            'GET', f"{ctx.obj['server_url']}/reports", params=params
+        )
+    else:
+        response = make_request(
+            'GET', f"{ctx.obj['server_url']}/reports/{period}", params=params
+        )
     
     if response.status_code == 200:
         data = response.json()
@@ -470,7 +740,12 @@ def report(ctx, period, format):
             return
         
         # Table format
-        click.echo(f"\n📊 {period.title()} Report for {ctx.obj['project_name']}")
+        title = (
+            f"{data['start_date']} → {data['end_date']}"
+            if date_from
+            else period.title()
+        )
+        click.echo(f"\n📊 {title} Report for {ctx.obj['project_name']}")
         click.echo("=" * 60)
         click.echo(f"Period: {data['start_date']} to {data['end_date']}")
         click.echo(f"Total Hours: {data['total_hours']:.1f}")
@@ -481,10 +756,18 @@ def report(ctx, period, format):
             for category, hours in data['category_breakdown'].items():
                 click.echo(f"   {category:15}: {hours:5.1f}h")
         
+        if data.get('groups'):
+            keys = data['group_by']
+            click.echo(f"\n📅 By {', '.join(keys)}:")
+            for group in data['groups']:
+                label = ' / '.join(str(group[key]) for key in keys)
+                hours, sessions = group['hours'], group['sessions']
+                click.echo(f"   {label:40}: {hours:6.1f}h ({sessions} sessions)")
+        
         if len(data.get('sessions', [])) > 0:
             click.echo(f"\n📝 Recent Sessions:")
             for session in data['sessions'][-5:]:  # Show last 5
-                start = datetime.fromisoformat(session['start_time']).strftime('%m/%d %H:%M')
+                start = display_time(session['start_time']).strftime('%m/%d %H:%M')
                 duration = session['duration_minutes']
                 hours = duration // 60
                 minutes = duration % 60
@@ -496,6 +779,7 @@ def report(ctx, period, format):
 @click.pass_context
 def commit(ctx):
     """Link current git commit to active session"""
+    import subprocess
     
     # Check if git is available and we're in a repo
     try:
@@ -521,41 +805,221 @@ def commit(ctx):
             'commit_message': commit_message
         }
         
-        response = make_request('POST', f"{ctx.obj['server_url']}/sessions/commit", json=payload)
+        result = send_event(ctx, 'commit', payload)
         
-        if response.status_code == 200:
-            data = response.json()
+        if result is None:
+            click.echo(f"📝 Commit {commit_hash[:8]} recorded")
+            echo_queued()
+        elif result[0] == 200:
+            data = result[1]
             click.echo(f"📝 Linked commit {data['commit_hash']}: {commit_message.split()[0] if commit_message else 'No message'}")
         else:
-            click.echo(f"❌ Error: {response.text}")
+            click.echo(f"❌ Error: {result[1].get('error')}")
             
     except subprocess.CalledProcessError:
         click.echo("❌ Error getting git commit information")
 
+
+@cli.command('import-commits')
+@click.option(
+    '--since',
+    help='Only import commits after this date (anything git log --since accepts)',
+)
+@click.option(
+    '--batch-size', default=500, show_default=True, help='Commits sent per request'
+)
+@click.pass_context
+def import_commits(ctx, since, batch_size):
+    """Import git history and attribute commits to recorded sessions"""
+    import subprocess
+
+    args = ['git', 'log', '--pretty=format:%H%x1f%aI%x1f%an%x1f%s']
+    if since:
+        args.append(f'--since={since}')
+    try:
+        result = subprocess.run(args, capture_output=True, text=True, check=True)
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        click.echo("❌ Not in a git repository or git not available")
+        return
+
+    commits = []
+    for line in result.stdout.splitlines():
+        fields = line.split('\x1f')
+        if len(fields) == 4:
+            commit_hash, timestamp, author, message = fields
+            commits.append(
+                {
+                    'hash': commit_hash,
+                    'timestamp': timestamp,
+                    'author': author,
+                    'message': message,
+                }
+            )
+
+    if not commits:
+        click.echo("📭 No commits to import")
+        return
+
+    inserted = matched = 0
+    for i in range(0, len(commits), batch_size):
+        payload = {
+            'project': ctx.obj['project_name'],
+            'commits': commits[i : i + batch_size],
+        }
+        response = make_request(
+            'POST', f"{ctx.obj['server_url']}/commits/bulk", json=payload
+        )
+        if response.status_code != 200:
+            click.echo(f"❌ Error: {response.text}")
+            return
+        data = response.json()
+        inserted += data['inserted']
+        matched += data['matched']
+
+    click.echo(
+        f"📝 Imported {inserted} new commits ({len(commits) - inserted} already known), "
+        f"{matched} matched to sessions"
+    )
+
 @cli.command()
+@click.option('--quiet', '-q', is_flag=True, help='Only report errors')
+def sync(quiet):
+    """Send events recorded while the server was unreachable"""
+    queued = len(spool.pending())
+    if not queued:
+        if not quiet:
+            click.echo("✅ Nothing to sync")
+        return
+    
+    results = spool.flush(send_replay)
+    for result in results:
+        if result['status'] >= 400:
+            click.echo(
+                f"⚠️  {result['type']} event rejected: {result['body'].get('error')}"
+            )
+    
+    remaining = len(spool.pending())
+    if not quiet:
+        click.echo(f"📤 Sent {len(results)} of {queued} queued events")
+        if remaining:
+            click.echo(f"📥 {remaining} events still queued - is the server running?")
+
+
+@cli.group('agent')
+def agent_cmd():
+    """Manage the local agent that speeds up tt commands"""
+
+
+@agent_cmd.command('start')
+def agent_start():
+    """Start the agent in the background"""
+    import subprocess
+    import time
+    
+    if agent.ping(timeout=1) is not None:
+        click.echo("✅ Agent already running")
+        return
+    
+    subprocess.Popen(
+        [sys.executable, os.path.abspath(agent.__file__)],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    
+    # Wait for the socket to come up
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        info = agent.ping(timeout=1)
+        if info is not None:
+            click.echo(f"✅ Agent started (pid {info['pid']}) on {agent.socket_path()}")
+            return
+        time.sleep(0.05)
+    click.echo("❌ Agent did not start; run 'python cli/agent.py' to see why")
+
+
+@agent_cmd.command('stop')
+def agent_stop():
+    """Stop the background agent"""
+    try:
+        stopped = agent.call({'op': 'stop'}, timeout=2) is not None
+    except agent.AgentError:
+        stopped = False
+    if not stopped:
+        click.echo("💤 Agent is not running")
+    else:
+        click.echo("⏹️  Agent stopped")
+
+
+@agent_cmd.command('status')
+def agent_status():
+    """Show whether the agent is running"""
+    info = agent.ping()
+    if info is None:
+        click.echo("💤 Agent is not running (commands talk to the server directly)")
+        return
+    click.echo(f"✅ Agent running (pid {info['pid']}) on {agent.socket_path()}")
+    uptime, served = info['uptime_seconds'], info['requests_served']
+    click.echo(f"⏱️  Uptime: {uptime}s, {served} requests served")
+
+
+# Projects fetched per request while paging through the list
+PROJECTS_PAGE_SIZE = 500
+
+
+@cli.command()
+@click.option('--search', help='Only projects whose name starts with this')
+@click.option('--type', 'project_type', help='Only projects of this type')
+@click.option('--recent', is_flag=True, help='Most recently active first')
+@click.option('--limit', type=int, help='Show at most this many projects')
 @click.pass_context
-def projects(ctx):
+def projects(ctx, search, project_type, recent, limit):
     """List all tracked projects"""
-    response = make_request('GET', f"{ctx.obj['server_url']}/projects")
+    params = {'sort': 'last_activity' if recent else 'name'}
+    if search:
+        params['prefix'] = search
+    if project_type:
+        params['type'] = project_type
     
-    if response.status_code == 200:
-        projects = response.json()
-        
-        if not projects:
-            click.echo("📭 No projects found")
+    # Page through the list instead of asking for all of it at once
+    projects = []
+    while limit is None or len(projects) < limit:
+        params['limit'] = (
+            PROJECTS_PAGE_SIZE
+            if limit is None
+            else min(PROJECTS_PAGE_SIZE, limit - len(projects))
+        )
+        response = make_request(
+            'GET', f"{ctx.obj['server_url']}/projects", params=params
+        )
+        if response.status_code != 200:
+            click.echo(f"❌ Error: {response.text}")
             return
+        projects.extend(response.json())
+        params['cursor'] = response.headers.get('X-Next-Cursor')
+        if not params['cursor']:
+            break
+    
+    if not projects:
+        click.echo("📭 No projects found")
+        return
+    
+    click.echo(
+        f"\n📁 Tracked Projects ({len(projects)}{'+' if params.get('cursor') else ''})"
+    )
+    click.echo("=" * 60)
+    
+    for project in projects:
+        last_activity = "Never"
+        if project.get('last_activity'):
+            last_activity = display_time(project['last_activity']).strftime(
+                '%Y-%m-%d %H:%M'
+            )
         
-        click.echo(f"\n📁 Tracked Projects ({len(projects)})")
-        click.echo("=" * 60)
-        
-        for project in projects:
-            last_activity = "Never"
-            if project.get('last_activity'):
-                last_activity = datetime.fromisoformat(project['last_activity']).strftime('%Y-%m-%d %H:%M')
-            
-            click.echo(f"{project['name']:30} {project.get('type', 'unknown'):12} {last_activity}")
-    else:
-        click.echo(f"❌ Error: {response.text}")
+        click.echo(
+            f"{project['name']:30} {project.get('type', 'unknown'):12} {last_activity}"
+        )
 
 if __name__ == '__main__':
     # Add break as an alias since it's a Python keyword
@@ -12,7 +12,18 @@ from datetime import datetime, timedelta
 from tabulate import tabulate
 import argparse
 
+# Backup and maintenance helpers live with the server code
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'server', 'src')
+)
+import backup  # noqa: E402
+import maintenance  # noqa: E402
+import stale_sessions  # noqa: E402
+
 DATABASE_PATH = os.environ.get('DATABASE_PATH', 'data/timetracker.db')
+BACKUP_DIR = os.environ.get(
+    'BACKUP_DIR', os.path.join(os.path.dirname(DATABASE_PATH) or '.', 'backups')
+)
 
 def get_db_connection():
     """Get database connection"""
@@ -257,15 +268,205 @@ def show_project_details(project_id):
         headers = ['ID', 'Description', 'Category', 'Date', 'Duration', 'Breaks']
         print(tabulate(table_data, headers=headers, tablefmt='grid'))
 
+
+def create_backup(backup_dir, keep, compress):
+    """Take an online, verified snapshot of the database"""
+    def progress(status, remaining, total):
+        print(f"\rCopied {total - remaining}/{total} pages", end='', flush=True)
+    
+    try:
+        path = backup.backup_database(
+            DATABASE_PATH, backup_dir, keep=keep, compress=compress, progress=progress
+        )
+    except backup.BackupError as e:
+        print(f"\n{e}")
+        sys.exit(1)
+    size_kb = os.path.getsize(path) / 1024
+    print(f"\nBackup written to {path} ({size_kb:.0f} KB, integrity ok)")
+
+
+def show_backups(backup_dir):
+    """List snapshots, newest first"""
+    paths = backup.list_backups(backup_dir)
+    if not paths:
+        print(f"No backups found in {backup_dir}")
+        return
+    table_data = [
+        [
+            os.path.basename(path),
+            f"{os.path.getsize(path) / 1024:.0f} KB",
+            datetime.fromtimestamp(os.path.getmtime(path)).strftime('%Y-%m-%d %H:%M'),
+        ]
+        for path in paths
+    ]
+    print(tabulate(table_data, headers=['Backup', 'Size', 'Created'], tablefmt='grid'))
+
+
+def verify_backup_file(path):
+    """Run an integrity check on a snapshot"""
+    problems = backup.verify_backup(path)
+    if problems:
+        print(f"{path} is damaged:")
+        for problem in problems[:20]:
+            print(f"  {problem}")
+        sys.exit(1)
+    print(f"{path}: integrity ok")
+
+
+def restore_from_backup(path):
+    """Restore the database from a snapshot"""
+    try:
+        backup.restore_backup(path, DATABASE_PATH)
+    except backup.BackupError as e:
+        print(e)
+        sys.exit(1)
+    print(f"Restored {DATABASE_PATH} from {path}")
+
+
+def maintain_database(vacuum_pages, fix, full_analyze, enable_incremental):
+    """Optimize, vacuum, checkpoint and audit the database"""
+    report = maintenance.run_maintenance(
+        DATABASE_PATH,
+        vacuum_pages=vacuum_pages,
+        full_analyze=full_analyze,
+        fix=fix,
+        enable_incremental=enable_incremental,
+    )
+    
+    print("=== Database Maintenance ===")
+    before_kb, after_kb = report['size_before'] / 1024, report['size_after'] / 1024
+    print(f"Size: {before_kb:.0f} KB -> {after_kb:.0f} KB")
+    print(f"Auto-vacuum: {report['auto_vacuum']}")
+    if report['auto_vacuum'] != 'incremental':
+        print(
+            "  (run with --enable-incremental-vacuum once to let maintenance "
+            "return free pages)"
+        )
+    print(f"Pages freed: {report['pages_freed']} ({report['free_pages']} still free)")
+    print(f"WAL checkpoint: {report['checkpoint'][2]} pages")
+    print()
+    
+    if not report['issues']:
+        print("Consistency audit: no issues found")
+        return
+    
+    print("=== Consistency Audit ===")
+    table_data = [
+        [
+            name,
+            len(ids),
+            ', '.join(str(i) for i in ids[:10]) + (' ...' if len(ids) > 10 else ''),
+        ]
+        for name, ids in report['issues'].items()
+    ]
+    print(tabulate(table_data, headers=['Check', 'Rows', 'IDs'], tablefmt='grid'))
+    if fix:
+        repaired = ', '.join(f'{k} ({v} rows)' for k, v in report['repaired'].items())
+        print(f"\nRepaired: {repaired}")
+        if report['remaining_issues']:
+            print(f"Still failing: {', '.join(report['remaining_issues'])}")
+    else:
+        print("\nRun with --repair to fix these")
+
+
+def close_stale(idle_hours, grace_minutes):
+    """Close sessions left running with no recent activity"""
+    closed = stale_sessions.run_stale_session_check(
+        DATABASE_PATH, idle_minutes=idle_hours * 60, grace_minutes=grace_minutes
+    )
+    if not closed:
+        print(f"No sessions idle for more than {idle_hours:g} hours")
+        return
+    table_data = [
+        [
+            event['session_id'],
+            event['userid'],
+            event['start_time'][:16],
+            event['last_activity'][:16],
+            event['end_time'][:16],
+            event['breaks_closed'],
+        ]
+        for event in closed
+    ]
+    print(
+        tabulate(
+            table_data,
+            headers=[
+                'Session',
+                'User',
+                'Started',
+                'Last Activity',
+                'Closed At',
+                'Breaks',
+            ],
+            tablefmt='grid',
+        )
+    )
+
+
 def main():
     parser = argparse.ArgumentParser(description='Database Manager for Universal Time Tracker')
-    parser.add_argument('command', choices=['stats', 'projects', 'sessions', 'search', 'export', 'project'], 
-                       help='Command to execute')
+    parser.add_argument(
+        'command',
+        choices=[
+            'stats',
+            'projects',
+            'sessions',
+            'search',
+            'export',
+            'project',
+            'backup',
+            'backups',
+            'verify',
+            'restore',
+            'maintain',
+            'close-stale',
+        ],
+        help='Command to execute',
+    )
     parser.add_argument('--limit', type=int, default=20, help='Limit number of results (for sessions)')
     parser.add_argument('--project', type=str, help='Filter by project name')
     parser.add_argument('--query', type=str, help='Search query')
     parser.add_argument('--output', type=str, help='Output file for export')
     parser.add_argument('--id', type=int, help='Project ID for detailed view')
+    parser.add_argument(
+        '--backup-dir', type=str, default=BACKUP_DIR, help='Directory for backups'
+    )
+    parser.add_argument(
+        '--keep', type=int, default=24, help='Number of backups to keep'
+    )
+    parser.add_argument('--compress', action='store_true', help='Gzip the backup')
+    parser.add_argument('--file', type=str, help='Backup file (for verify/restore)')
+    parser.add_argument(
+        '--vacuum-pages',
+        type=int,
+        default=maintenance.DEFAULT_VACUUM_PAGES,
+        help='Free pages to release per maintenance run',
+    )
+    parser.add_argument(
+        '--repair',
+        action='store_true',
+        help='Fix problems found by the consistency audit',
+    )
+    parser.add_argument(
+        '--analyze',
+        action='store_true',
+        help='Run a full ANALYZE instead of PRAGMA optimize alone',
+    )
+    parser.add_argument('--enable-incremental-vacuum', action='store_true',
+                        help='Switch to incremental auto-vacuum (one-time full VACUUM)')
+    parser.add_argument(
+        '--idle-hours',
+        type=float,
+        default=12,
+        help='Close open sessions idle for this many hours (for close-stale)',
+    )
+    parser.add_argument(
+        '--grace-minutes',
+        type=float,
+        default=stale_sessions.DEFAULT_GRACE_MINUTES,
+        help='Minutes of work assumed after the last activity (for close-stale)',
+    )
     
     args = parser.parse_args()
     
@@ -291,6 +492,24 @@ def main():
             print("Please provide a project ID with --id")
             sys.exit(1)
         show_project_details(args.id)
+    elif args.command == 'backup':
+        create_backup(args.backup_dir, args.keep, args.compress)
+    elif args.command == 'backups':
+        show_backups(args.backup_dir)
+    elif args.command in ('verify', 'restore'):
+        if not args.file:
+            print("Please provide a backup file with --file")
+            sys.exit(1)
+        if args.command == 'verify':
+            verify_backup_file(args.file)
+        else:
+            restore_from_backup(args.file)
+    elif args.command == 'maintain':
+        maintain_database(
+            args.vacuum_pages, args.repair, args.analyze, args.enable_incremental_vacuum
+        )
+    elif args.command == 'close-stale':
+        close_stale(args.idle_hours, args.grace_minutes)
 
 if __name__ == '__main__':
     main() 
\ No newline at end of file
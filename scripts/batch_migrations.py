@@ -0,0 +1,571 @@
+#!/usr/bin/env python3
+"""
+Set-based batch data migrations for Universal Time Tracker
+Declarative operations (recategorize, move sessions, shift or set session
+times, reparent projects) are applied as chunked UPDATE statements, each chunk
+in its own short write transaction, so the server is never locked out for
+long. Every run can be previewed with a dry run. Times are stored in UTC;
+date bounds match the local date recorded on each session.
+
+Example:
+    python scripts/batch_migrations.py recategorize --map design=development --dry-run
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+DATABASE_PATH = os.environ.get('DATABASE_PATH', 'data/timetracker.db')
+
+# Zone of sessions that don't record one, as the server assumes
+DEFAULT_TIMEZONE = os.environ.get('TIME_TRACKER_TIMEZONE') or 'UTC'
+
+# Rows updated per write transaction
+DEFAULT_CHUNK_SIZE = 500
+
+# Whole minutes between two timestamps, as the API computes them
+MINUTES_SQL = (
+    "CAST(ROUND((julianday({end}) - julianday({start})) * 86400000) AS INTEGER) / 60000"
+)
+
+# Timestamp format written by the server (fractional seconds are optional)
+SHIFTED_SQL = "strftime('%Y-%m-%d %H:%M:%f', {column}, ?)"
+
+
+class MigrationError(Exception):
+    """An operation can't be applied to this database"""
+
+
+class Operation:
+    """A bulk change to rows of one table
+
+    Subclasses pick their target rows with `where()` and change them with
+    `statements()`, which run once per chunk of row ids, followed by
+    `after_chunk()` in the same transaction. `finish()` runs once at the end
+    to refresh values derived from the changed rows.
+    """
+
+    table = 'sessions'
+
+    def prepare(self, conn):
+        """Resolve names to ids; raise MigrationError if something is missing"""
+
+    def where(self):
+        """SQL condition and parameters selecting the rows to change"""
+        raise NotImplementedError
+
+    def statements(self):
+        """(sql, params) pairs run per chunk; {ids} in sql is the chunk's id list"""
+        raise NotImplementedError
+
+    def after_chunk(self, conn, ids):
+        """Python-side updates for a chunk, e.g. values SQLite can't compute"""
+
+    def finish(self, conn):
+        """Refresh rollups after all chunks are applied"""
+
+    def describe(self):
+        return self.__class__.__name__
+
+
+def _project_id(conn, name):
+    row = conn.execute('SELECT id FROM projects WHERE name = ?', (name,)).fetchone()
+    if not row:
+        raise MigrationError(f"Project not found: {name}")
+    return row[0]
+
+
+def _has_column(conn, table, column):
+    return column in [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+
+
+def category_name_sql(conn):
+    """SQL for a session's category name, as the server's reports show it
+
+    On databases with a categories table, names live there (names written to
+    sessions.category are moved by the server's trigger) and aliases resolve
+    to the category they were merged into.
+    """
+    if not _has_column(conn, 'sessions', 'category_id'):
+        return 'category'
+    return (
+        'COALESCE(category, (SELECT COALESCE(canon.name, c.name) FROM categories c '
+        'LEFT JOIN categories canon ON canon.id = c.canonical_id '
+        'WHERE c.id = sessions.category_id))'
+    )
+
+
+def _date_filter(start_date, end_date, local_dates=False):
+    """Inclusive YYYY-MM-DD bounds on sessions' local dates
+
+    Older databases without local dates are filtered on their start times' dates.
+    """
+    column = 'local_date' if local_dates else 'date(start_time)'
+    clauses, params = [], []
+    if start_date:
+        clauses.append(f'{column} >= ?')
+        params.append(start_date)
+    if end_date:
+        clauses.append(f'{column} <= ?')
+        params.append(end_date)
+    return clauses, params
+
+
+def _to_utc(value, zone):
+    """A 'YYYY-MM-DD HH:MM:SS' local time in `zone` as a stored UTC timestamp"""
+    local = datetime.fromisoformat(value)
+    if local.tzinfo is None:
+        local = local.replace(tzinfo=ZoneInfo(zone))
+    return local.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+def _refresh_local_fields(conn, ids):
+    """Recompute sessions' local date, hour and ISO week after start times change"""
+    if not _has_column(conn, 'sessions', 'local_date'):
+        return
+    updates = []
+    placeholders = ', '.join('?' * len(ids))
+    for session_id, start_time, zone in conn.execute(
+        f'SELECT id, start_time, timezone FROM sessions WHERE id IN ({placeholders})',
+        ids,
+    ):
+        local = (
+            datetime.fromisoformat(start_time)
+            .replace(tzinfo=timezone.utc)
+            .astimezone(ZoneInfo(zone or DEFAULT_TIMEZONE))
+        )
+        year, week, _ = local.isocalendar()
+        updates.append(
+            (local.date().isoformat(), local.hour, f'{year}-W{week:02d}', session_id)
+        )
+    conn.executemany(
+        'UPDATE sessions SET local_date = ?, local_hour = ?, iso_week = ? WHERE id = ?',
+        updates,
+    )
+
+
+def _refresh_last_activity(conn, project_ids):
+    """Bring projects' last_activity up to their newest session"""
+    for project_id in project_ids:
+        conn.execute(
+            '''
+            UPDATE projects SET last_activity = (
+                SELECT MAX(COALESCE(end_time, start_time)) FROM sessions
+                WHERE project_id = ?
+            )
+            WHERE id = ? AND EXISTS (SELECT 1 FROM sessions WHERE project_id = ?)
+        ''',
+            (project_id, project_id, project_id),
+        )
+
+
+class Recategorize(Operation):
+    """Rename session categories
+
+    With `default`, any category not in `keep` becomes `default`. Sessions are
+    matched on the name reports show, so an alias matches as the category it
+    was merged into. To rename or merge a category everywhere, the server's
+    categories API does it without touching sessions; this is for per-session
+    rewrites.
+    """
+
+    def __init__(self, mapping, default=None, keep=(), project=None):
+        self.mapping = dict(mapping)
+        self.default = default
+        self.keep = set(keep)
+        self.project = project
+        self.project_id = None
+        self.name = 'category'
+
+    def prepare(self, conn):
+        if self.project:
+            self.project_id = _project_id(conn, self.project)
+        self.name = category_name_sql(conn)
+
+    def where(self):
+        if self.default:
+            keep = sorted(self.keep | {self.default})
+            clause = f"{self.name} NOT IN ({', '.join('?' * len(keep))})"
+            params = keep
+        else:
+            clause = f"{self.name} IN ({', '.join('?' * len(self.mapping))})"
+            params = list(self.mapping)
+        if self.project_id:
+            clause += ' AND project_id = ?'
+            params = params + [self.project_id]
+        return clause, params
+
+    def statements(self):
+        cases = ' '.join('WHEN ? THEN ?' for _ in self.mapping)
+        params = [value for pair in self.mapping.items() for value in pair]
+        fallback = '?' if self.default else self.name
+        if self.default:
+            params.append(self.default)
+        expression = (
+            f'CASE {self.name} {cases} ELSE {fallback} END'
+            if self.mapping
+            else fallback
+        )
+        return [
+            (
+                f'UPDATE sessions SET category = {expression} WHERE id IN ({{ids}})',
+                params,
+            )
+        ]
+
+    def describe(self):
+        target = f" in {self.project}" if self.project else ''
+        return f"Recategorize {self.mapping}{target}" + (
+            f", others -> {self.default}" if self.default else ''
+        )
+
+
+class MoveSessions(Operation):
+    """Move sessions (with their commits) from one project to another"""
+
+    def __init__(self, from_project, to_project, start_date=None, end_date=None):
+        self.from_project = from_project
+        self.to_project = to_project
+        self.start_date = start_date
+        self.end_date = end_date
+
+    def prepare(self, conn):
+        self.from_id = _project_id(conn, self.from_project)
+        self.to_id = _project_id(conn, self.to_project)
+        self.has_commits = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'commits'"
+        ).fetchone() is not None
+        self.local_dates = _has_column(conn, 'sessions', 'local_date')
+
+    def where(self):
+        clauses, params = _date_filter(self.start_date, self.end_date, self.local_dates)
+        return ' AND '.join(['project_id = ?'] + clauses), [self.from_id] + params
+
+    def statements(self):
+        statements = [
+            ('UPDATE sessions SET project_id = ? WHERE id IN ({ids})', [self.to_id])
+        ]
+        if self.has_commits:
+            # A commit already recorded in the target project keeps that row
+            statements.append(
+                (
+                    'UPDATE OR IGNORE commits SET project_id = ? '
+                    'WHERE session_id IN ({ids})',
+                    [self.to_id],
+                )
+            )
+        return statements
+
+    def finish(self, conn):
+        _refresh_last_activity(conn, [self.to_id])
+
+    def describe(self):
+        return f"Move sessions from {self.from_project} to {self.to_project}"
+
+
+class ShiftTimestamps(Operation):
+    """Shift sessions and their breaks by a number of minutes"""
+
+    def __init__(
+        self, minutes, project=None, session_ids=None, start_date=None, end_date=None
+    ):
+        self.minutes = minutes
+        self.project = project
+        self.session_ids = list(session_ids or [])
+        self.start_date = start_date
+        self.end_date = end_date
+        self.project_id = None
+
+    def prepare(self, conn):
+        if self.project:
+            self.project_id = _project_id(conn, self.project)
+        self.local_dates = _has_column(conn, 'sessions', 'local_date')
+
+    def where(self):
+        clauses, params = _date_filter(self.start_date, self.end_date, self.local_dates)
+        if self.project_id:
+            clauses.append('project_id = ?')
+            params.append(self.project_id)
+        if self.session_ids:
+            clauses.append(f"id IN ({', '.join('?' * len(self.session_ids))})")
+            params.extend(self.session_ids)
+        return ' AND '.join(clauses) or '1', params
+
+    def statements(self):
+        modifier = f'{self.minutes:+d} minutes'
+        shift = {
+            column: SHIFTED_SQL.format(column=column)
+            for column in ('start_time', 'end_time')
+        }
+        return [
+            (
+                f"UPDATE sessions SET start_time = {shift['start_time']}, "
+                f"end_time = {shift['end_time']} WHERE id IN ({{ids}})",
+                [modifier, modifier],
+            ),
+            (
+                f"UPDATE breaks SET start_time = {shift['start_time']}, "
+                f"end_time = {shift['end_time']} WHERE session_id IN ({{ids}})",
+                [modifier, modifier],
+            ),
+        ]
+
+    def after_chunk(self, conn, ids):
+        _refresh_local_fields(conn, ids)
+
+    def describe(self):
+        return f"Shift sessions by {self.minutes:+d} minutes"
+
+
+class SetSessionTimes(Operation):
+    """Set exact start/end times for sessions and recompute their durations"""
+
+    def __init__(self, times, zone='UTC'):
+        # {session_id: (start_time, end_time)} with times as
+        # 'YYYY-MM-DD HH:MM:SS' local time in `zone`
+        self.times = {
+            int(session_id): (_to_utc(str(start), zone), _to_utc(str(end), zone))
+            for session_id, (start, end) in times.items()
+        }
+
+    def where(self):
+        return f"id IN ({', '.join('?' * len(self.times))})", list(self.times)
+
+    def statements(self):
+        start_cases = ' '.join('WHEN ? THEN ?' for _ in self.times)
+        start_params = [
+            value
+            for session_id, (start, _) in self.times.items()
+            for value in (session_id, start)
+        ]
+        end_params = [
+            value
+            for session_id, (_, end) in self.times.items()
+            for value in (session_id, end)
+        ]
+        minutes = MINUTES_SQL.format(start='start_time', end='end_time')
+        break_minutes = (
+            'COALESCE((SELECT SUM(COALESCE(duration_minutes, 0)) FROM breaks '
+            'WHERE breaks.session_id = sessions.id AND breaks.end_time IS NOT NULL), 0)'
+        )
+        return [
+            (
+                f'UPDATE sessions SET start_time = CASE id {start_cases} END, '
+                f'end_time = CASE id {start_cases} END WHERE id IN ({{ids}})',
+                start_params + end_params,
+            ),
+            (
+                f'UPDATE sessions SET duration_minutes = MAX(0, {minutes} '
+                f'- {break_minutes}) WHERE id IN ({{ids}})',
+                [],
+            ),
+        ]
+
+    def after_chunk(self, conn, ids):
+        _refresh_local_fields(conn, ids)
+
+    def describe(self):
+        return f"Set times for {len(self.times)} sessions"
+
+
+class Reparent(Operation):
+    """Make projects subprojects of `parent` (top-level projects if parent is None)"""
+
+    table = 'projects'
+
+    def __init__(self, projects, parent=None):
+        self.projects = list(projects)
+        self.parent = parent
+        self.parent_id = None
+
+    def prepare(self, conn):
+        if self.parent:
+            if self.parent in self.projects:
+                raise MigrationError(f"{self.parent} can't be its own parent")
+            self.parent_id = _project_id(conn, self.parent)
+        for name in self.projects:
+            _project_id(conn, name)
+
+    def where(self):
+        return f"name IN ({', '.join('?' * len(self.projects))})", self.projects
+
+    def statements(self):
+        return [
+            ('UPDATE projects SET parent_id = ? WHERE id IN ({ids})', [self.parent_id])
+        ]
+
+    def describe(self):
+        return (
+            f"Reparent {', '.join(self.projects)} under {self.parent or '(top level)'}"
+        )
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def run(conn, operations, dry_run=False, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Apply operations in order, returning [(operation, rows)] counts
+
+    Each chunk of up to `chunk_size` rows is written in its own BEGIN
+    IMMEDIATE transaction, so other writers only wait for one chunk. A
+    failure stops the run and rolls back the current chunk only; earlier
+    chunks stay applied, so check a dry run first.
+    `progress(operation, done, total)` is called after every chunk.
+    """
+    conn.isolation_level = None  # explicit transactions below
+    results = []
+    for operation in operations:
+        operation.prepare(conn)
+        clause, params = operation.where()
+        ids = [row[0] for row in conn.execute(
+            f'SELECT id FROM {operation.table} WHERE {clause} ORDER BY id', params)]
+        results.append((operation, len(ids)))
+        if dry_run or not ids:
+            continue
+
+        done = 0
+        for chunk in _chunks(ids, chunk_size):
+            id_list = ', '.join(str(int(row_id)) for row_id in chunk)
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                for sql, sql_params in operation.statements():
+                    conn.execute(sql.format(ids=id_list), sql_params)
+                operation.after_chunk(conn, chunk)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            done += len(chunk)
+            if progress:
+                progress(operation, done, len(ids))
+
+        conn.execute('BEGIN IMMEDIATE')
+        operation.finish(conn)
+        conn.execute('COMMIT')
+    return results
+
+
+def connect(db_path=DATABASE_PATH):
+    if not os.path.exists(db_path):
+        raise MigrationError(f"Database not found at {db_path}")
+    return sqlite3.connect(db_path, timeout=30)
+
+
+def print_progress(operation, done, total):
+    print(
+        f"\r  {operation.describe()}: {done}/{total} rows",
+        end='' if done < total else '\n',
+        flush=True,
+    )
+
+
+def apply(
+    operations, db_path=DATABASE_PATH, dry_run=False, chunk_size=DEFAULT_CHUNK_SIZE
+):
+    """Run operations with console output; used by the scripts in this directory"""
+    conn = connect(db_path)
+    try:
+        results = run(conn, operations, dry_run=dry_run, chunk_size=chunk_size,
+                      progress=None if dry_run else print_progress)
+    finally:
+        conn.close()
+    for operation, rows in results:
+        verb = 'Would update' if dry_run else 'Updated'
+        print(f'{verb} {rows} rows: {operation.describe()}')
+    return results
+
+
+def _pairs(values):
+    mapping = {}
+    for value in values:
+        old, sep, new = value.partition('=')
+        if not sep:
+            raise argparse.ArgumentTypeError(f"Expected OLD=NEW, got {value}")
+        mapping[old] = new
+    return mapping
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Batch data migrations for Universal Time Tracker'
+    )
+    parser.add_argument('--db', default=DATABASE_PATH, help='Database path')
+    parser.add_argument(
+        '--dry-run', action='store_true', help='Only count the rows that would change'
+    )
+    parser.add_argument(
+        '--chunk-size',
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help='Rows per transaction',
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    recategorize = commands.add_parser('recategorize', help='Rename session categories')
+    recategorize.add_argument(
+        '--map', nargs='+', default=[], metavar='OLD=NEW', help='Category renames'
+    )
+    recategorize.add_argument('--default', help='Category for anything not in --keep')
+    recategorize.add_argument(
+        '--keep', nargs='*', default=[], help='Categories left alone with --default'
+    )
+    recategorize.add_argument('--project', help='Only this project')
+
+    move = commands.add_parser('move-sessions', help='Move sessions to another project')
+    move.add_argument('--from', dest='from_project', required=True)
+    move.add_argument('--to', dest='to_project', required=True)
+    move.add_argument('--start-date', help='First day (YYYY-MM-DD)')
+    move.add_argument('--end-date', help='Last day (YYYY-MM-DD)')
+
+    shift = commands.add_parser('shift', help='Shift session and break times')
+    shift.add_argument('--minutes', type=int, required=True)
+    shift.add_argument('--project')
+    shift.add_argument('--ids', type=int, nargs='+')
+    shift.add_argument('--start-date')
+    shift.add_argument('--end-date')
+
+    reparent = commands.add_parser('reparent', help='Change the parent of projects')
+    reparent.add_argument('projects', nargs='+')
+    reparent.add_argument('--parent', help='Parent project (omit for top level)')
+
+    args = parser.parse_args()
+    if args.command == 'recategorize':
+        if not args.map and not args.default:
+            parser.error('recategorize needs --map and/or --default')
+        operation = Recategorize(
+            _pairs(args.map), default=args.default, keep=args.keep, project=args.project
+        )
+    elif args.command == 'move-sessions':
+        operation = MoveSessions(
+            args.from_project, args.to_project, args.start_date, args.end_date
+        )
+    elif args.command == 'shift':
+        operation = ShiftTimestamps(
+            args.minutes,
+            project=args.project,
+            session_ids=args.ids,
+            start_date=args.start_date,
+            end_date=args.end_date,
+        )
+    else:
+        operation = Reparent(args.projects, parent=args.parent)
+
+    try:
+        apply(
+            [operation],
+            db_path=args.db,
+            dry_run=args.dry_run,
+            chunk_size=args.chunk_size,
+        )
+    except MigrationError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
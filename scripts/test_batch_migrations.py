@@ -0,0 +1,176 @@
+import sqlite3
+
+import pytest
+
+from scripts.batch_migrations import (
+    MigrationError,
+    MoveSessions,
+    Recategorize,
+    Reparent,
+    SetSessionTimes,
+    ShiftTimestamps,
+    category_name_sql,
+    run,
+)
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / 'timetracker.db')
+    conn.executescript('''
+        CREATE TABLE projects (id INTEGER PRIMARY KEY, name TEXT UNIQUE,
+                               parent_id INTEGER, last_activity DATETIME);
+        CREATE TABLE sessions (id INTEGER PRIMARY KEY, project_id INTEGER,
+                               start_time DATETIME, end_time DATETIME,
+                               duration_minutes INTEGER, category TEXT);
+        CREATE TABLE breaks (id INTEGER PRIMARY KEY, session_id INTEGER,
+                             start_time DATETIME, end_time DATETIME,
+                             duration_minutes INTEGER);
+        CREATE TABLE commits (id INTEGER PRIMARY KEY, project_id INTEGER,
+                              session_id INTEGER, hash TEXT,
+                              UNIQUE (project_id, hash));
+        INSERT INTO projects (id, name) VALUES (1, 'Research'), (2, 'Development');
+        INSERT INTO sessions VALUES
+            (1, 1, '2025-06-19 08:00:00', '2025-06-19 10:00:00', 120, 'Design'),
+            (2, 1, '2025-06-19 10:00:00', '2025-06-19 11:00:00', 60, 'research'),
+            (3, 1, '2025-06-20 09:00:00', '2025-06-20 10:00:00', 60, 'frontend'),
+            (4, 2, '2025-06-18 09:00:00', '2025-06-18 10:00:00', 60, 'misc');
+        INSERT INTO breaks VALUES
+            (1, 1, '2025-06-19 09:00:00', '2025-06-19 09:15:00', 15);
+        INSERT INTO commits VALUES (1, 1, 1, 'abc'), (2, 2, NULL, 'abc');
+    ''')
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_dry_run_counts_without_changing_rows(conn):
+    operations = [
+        Recategorize(
+            {'Design': 'development'}, default='development', keep={'research'}
+        ),
+        MoveSessions(
+            'Research', 'Development', start_date='2025-06-19', end_date='2025-06-19'
+        ),
+    ]
+    results = run(conn, operations, dry_run=True)
+
+    assert [rows for _, rows in results] == [3, 2]
+    assert (
+        conn.execute("SELECT category FROM sessions WHERE id = 1").fetchone()[0]
+        == 'Design'
+    )
+    assert (
+        conn.execute("SELECT COUNT(*) FROM sessions WHERE project_id = 1").fetchone()[0]
+        == 3
+    )
+
+
+def test_operations_apply_in_chunks(conn):
+    progress = []
+    run(
+        conn,
+        [
+            Recategorize(
+                {'Design': 'development'}, default='development', keep={'research'}
+            ),
+            MoveSessions(
+                'Research',
+                'Development',
+                start_date='2025-06-19',
+                end_date='2025-06-19',
+            ),
+            ShiftTimestamps(30, session_ids=[1]),
+            SetSessionTimes({2: ('2025-06-19 11:00:00', '2025-06-19 12:30:00')}),
+            Reparent(['Research'], parent='Development'),
+        ],
+        chunk_size=1,
+        progress=lambda op, done, total: progress.append(
+            (type(op).__name__, done, total)
+        ),
+    )
+
+    assert ('MoveSessions', 1, 2) in progress and ('MoveSessions', 2, 2) in progress
+    assert conn.execute("SELECT category FROM sessions ORDER BY id").fetchall() == [
+        ('development',), ('research',), ('development',), ('development',)]
+    assert conn.execute("SELECT project_id FROM sessions ORDER BY id").fetchall() == [
+        (2,),
+        (2,),
+        (1,),
+        (2,),
+    ]
+    # The moved commit collides with one already in the target project, so it stays put
+    assert (
+        conn.execute("SELECT project_id FROM commits WHERE id = 1").fetchone()[0] == 1
+    )
+    assert (
+        conn.execute("SELECT start_time FROM sessions WHERE id = 1")
+        .fetchone()[0]
+        .startswith('2025-06-19 08:30:00')
+    )
+    assert (
+        conn.execute("SELECT start_time FROM breaks WHERE id = 1")
+        .fetchone()[0]
+        .startswith('2025-06-19 09:30:00')
+    )
+    assert (
+        conn.execute("SELECT duration_minutes FROM sessions WHERE id = 2").fetchone()[0]
+        == 90
+    )
+    assert (
+        conn.execute("SELECT last_activity FROM projects WHERE id = 2").fetchone()[0]
+        == '2025-06-19 11:00:00'
+    )
+    assert (
+        conn.execute("SELECT parent_id FROM projects WHERE id = 1").fetchone()[0] == 2
+    )
+
+
+def test_unknown_project_is_rejected(conn):
+    with pytest.raises(MigrationError):
+        run(conn, [MoveSessions('Research', 'Nope')])
+    with pytest.raises(MigrationError):
+        run(conn, [Reparent(['Research'], parent='Research')])
+
+
+def test_recategorize_normalized_categories(conn):
+    # Upgraded databases keep names in the categories table, with aliases pointing
+    # at the category they were merged into; the server's trigger moves names
+    # written to sessions.category there
+    conn.executescript('''
+        CREATE TABLE categories (id INTEGER PRIMARY KEY, name TEXT UNIQUE,
+                                 canonical_id INTEGER, created_at DATETIME);
+        ALTER TABLE sessions ADD COLUMN category_id INTEGER;
+        INSERT INTO categories (id, name, canonical_id) VALUES
+            (1, 'development', NULL), (2, 'research', NULL),
+            (3, 'design', 1), (4, 'frontend', NULL), (5, 'misc', NULL);
+        UPDATE sessions SET category_id = CASE id
+            WHEN 1 THEN 3 WHEN 2 THEN 2 WHEN 3 THEN 4 ELSE 5 END, category = NULL;
+        CREATE TRIGGER trg_sessions_update_category_name
+        AFTER UPDATE OF category ON sessions
+        WHEN NEW.category IS NOT NULL
+        BEGIN
+            INSERT OR IGNORE INTO categories (name, created_at)
+            VALUES (NEW.category, strftime('%Y-%m-%d %H:%M:%f', 'now'));
+            UPDATE sessions SET category = NULL,
+                category_id = (SELECT id FROM categories WHERE name = NEW.category)
+            WHERE id = NEW.id;
+        END;
+    ''')
+    conn.commit()
+    operation = Recategorize(
+        {'frontend': 'development'},
+        default='development',
+        keep={'development', 'research'},
+    )
+
+    # The design alias already counts as development, as in the server's reports
+    name = category_name_sql(conn)
+    assert conn.execute(
+        f'SELECT {name} AS name, COUNT(*) FROM sessions GROUP BY name ORDER BY name'
+    ).fetchall() == [('development', 1), ('frontend', 1), ('misc', 1), ('research', 1)]
+    assert run(conn, [operation], dry_run=True) == [(operation, 2)]
+    run(conn, [operation])
+    assert conn.execute(
+        'SELECT id, category, category_id FROM sessions ORDER BY id'
+    ).fetchall() == [(1, None, 3), (2, None, 2), (3, None, 1), (4, None, 1)]
@@ -4,24 +4,79 @@ Universal Time Tracker Server
 Flask API for centralized time tracking across projects
 """
 
-from flask import Flask, request, jsonify, render_template
+from flask import (
+    Flask,
+    Response,
+    request,
+    jsonify,
+    render_template,
+    current_app,
+    g,
+    has_request_context,
+)
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime, timedelta
+from sqlalchemy import bindparam, case, func, literal, or_, select, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import aliased
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from datetime import datetime, time, timedelta, timezone
+from time import sleep
+import atexit
+import base64
 import os
+import json
 import logging
 from collections import defaultdict
+from functools import lru_cache, wraps
+import hashlib
 from dateutil import parser
 import sqlite3
 import yaml
 from openai import OpenAI
 
+from backup import backup_database
+from commits import (
+    DEFAULT_MATCH_GRACE,
+    match_commits_to_sessions,
+    parse_commit_timestamp,
+)
+from heartbeats import HeartbeatAggregator
+from maintenance import run_idempotency_key_expiry, run_maintenance
+from overlaps import OVERLAP_POLICIES, clip_interval, find_overlaps
+from responses import columnar, init_responses, serialize_rows, wants_columnar
+from scheduler import Scheduler
+from session_store import SessionStore, StoredSession
+from stale_sessions import run_stale_session_check
+from schema import upgrade_schema
+from timezones import (
+    TIMEZONE_HEADER,
+    local_time,
+    local_today,
+    server_timezone_name,
+    to_utc,
+    utcnow,
+    valid_timezone,
+)
+from write_queue import WriteQueue, WriteQueueFull
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def get_user_id():
-    """Safely get user ID, with fallbacks for Docker containers"""
+# Request header used by shared servers to identify the calling user
+USER_HEADER = 'X-Time-Tracker-User'
+
+# Client-generated key that makes retrying a write safe (see idempotent() in create_app)
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+
+@lru_cache(maxsize=None)
+def resolve_process_user_id():
+    """Safely get the server process's user ID, with fallbacks for Docker containers
+    
+    The lookups (getlogin, pwd, hostname) are only done once per process.
+    """
     # First check for explicit user ID in environment
     explicit_user = os.environ.get('TIME_TRACKER_USER_ID')
     if explicit_user:
@@ -59,17 +114,354 @@ def get_user_id():
     # Last resort fallback
     return 'unknown'
 
+
+def get_user_id():
+    """Get the user ID for the current request
+    
+    Shared servers identify users with the X-Time-Tracker-User header; otherwise
+    the (cached) identity of the server process is used.
+    """
+    if has_request_context():
+        header_user = request.headers.get(USER_HEADER, '').strip()
+        if header_user:
+            return header_user[:100]
+    return resolve_process_user_id()
+
+
+def get_timezone():
+    """IANA time zone of the caller
+
+    The X-Time-Tracker-Timezone header if sent, else the server's zone.
+    """
+    if has_request_context():
+        zone = request.headers.get(TIMEZONE_HEADER, '').strip()
+        if zone and valid_timezone(zone):
+            return zone
+        return current_app.config['TIMEZONE']
+    return server_timezone_name()
+
+
+def get_user_scope():
+    """Return the user ID read queries should be limited to, or None for all users"""
+    user = request.args.get('user') or request.headers.get(USER_HEADER, '').strip()
+    if user:
+        return user[:100]
+    if current_app.config.get('SCOPE_QUERIES_TO_USER'):
+        return resolve_process_user_id()
+    return None
+
+
 # Initialize database
 db = SQLAlchemy()
 
+# Bulk ingestion limits
+MAX_BULK_COMMITS = 10000
+BULK_INSERT_CHUNK = 500
+MAX_REPLAY_EVENTS = 500
+MAX_BATCH_OPERATIONS = 500
+MAX_BATCH_STATUS_PROJECTS = 500
+MAX_OVERLAP_CHECK_SESSIONS = 10000
+MAX_HEARTBEATS = 1000
+
+# Writes that lose a race (locked database, a concurrent start) are retried
+WRITE_RETRIES = 3
+WRITE_RETRY_DELAY = 0.05  # seconds, doubled on each attempt
+RETRYABLE_UNIQUE_COLUMNS = (
+    'sessions.project_id',
+    'sessions.userid',
+    'projects.name',
+    'categories.name',
+)
+
+# Project list paging; pages follow a keyset cursor on the sort key
+MAX_PROJECTS_LIMIT = 1000
+PROJECT_SORTS = (
+    'id',
+    'name',
+    'last_activity',
+)  # last_activity lists the most recent first
+
+# Change feed paging
+DEFAULT_CHANGES_LIMIT = 500
+MAX_CHANGES_LIMIT = 5000
+
+REPORT_PERIODS = ('today', 'week', 'month', 'quarter', 'year')
+REPORT_GROUP_KEYS = (
+    'day',
+    'week',
+    'iso_week',
+    'month',
+    'hour',
+    'project',
+    'category',
+    'user',
+)
+
+# Field order for the columnar (?format=columnar) encodings
+PROJECT_FIELDS = [
+    'id',
+    'name',
+    'type',
+    'language',
+    'framework',
+    'created_at',
+    'last_activity',
+]
+REPORT_SESSION_FIELDS = [
+    'id',
+    'project',
+    'description',
+    'category',
+    'start_time',
+    'end_time',
+    'duration_minutes',
+]
+HEATMAP_FIELDS = ['date', 'hours', 'level', 'day_of_week', 'month', 'in_year']
+CATEGORY_BREAKDOWN_FIELDS = [
+    'category',
+    'hours',
+    'sessions',
+    'percentage',
+    'avg_session_duration',
+    'trend',
+    'daily_breakdown',
+]
+DAILY_BREAKDOWN_FIELDS = ['date', 'hours', 'sessions', 'categories']
+
 # Global variables to store models
 Project = None
 Session = None
+Category = None
 Break = None
+Commit = None
+IdempotencyKey = None
+Change = None
+
+
+def retryable_write_error(error):
+    """Whether a failed write lost a race with a concurrent writer and can be retried"""
+    message = str(error.orig)
+    if isinstance(error, OperationalError):
+        return 'locked' in message or 'busy' in message
+    return message.startswith('UNIQUE constraint failed') and any(
+        column in message for column in RETRYABLE_UNIQUE_COLUMNS)
+
+
+def event_time(data):
+    """When an event happened (in UTC)
+
+    The client's timestamp if it sent one, otherwise now.
+    """
+    timestamp = data.get('timestamp')
+    if not timestamp:
+        return utcnow()
+    try:
+        return parse_commit_timestamp(timestamp, get_timezone())
+    except (TypeError, ValueError):
+        raise ValueError('Invalid timestamp format. Use ISO 8601')
+
+
+def encode_cursor(values):
+    """An opaque page cursor holding the sort key of the last row returned"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """The values of a cursor made by encode_cursor"""
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (TypeError, ValueError):
+        raise ValueError('Invalid cursor')
+
+
+def heartbeat_time(value):
+    """When a heartbeat happened (in UTC)
+
+    Accepts epoch seconds, as editor plugins send them, or ISO 8601.
+    """
+    if value is None:
+        return utcnow()
+    try:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return datetime.fromtimestamp(value, timezone.utc)
+        return parse_commit_timestamp(value, get_timezone())
+    except (TypeError, ValueError, OverflowError, OSError):
+        raise ValueError('Invalid heartbeat timestamp. Use epoch seconds or ISO 8601')
+
+
+def period_range(period, today):
+    """Return the [start, end) dates for a named report period, or None"""
+    if period == 'today':
+        start_date = today
+        end_date = start_date + timedelta(days=1)
+    elif period == 'week':
+        start_date = today - timedelta(days=today.weekday())
+        end_date = start_date + timedelta(days=7)
+    elif period == 'month':
+        start_date = today.replace(day=1)
+        end_date = (start_date + timedelta(days=32)).replace(day=1)
+    elif period == 'quarter':
+        start_date = today.replace(month=3 * ((today.month - 1) // 3) + 1, day=1)
+        end_date = (start_date + timedelta(days=93)).replace(day=1)
+    elif period == 'year':
+        start_date = today.replace(month=1, day=1)
+        end_date = start_date.replace(year=start_date.year + 1)
+    else:
+        return None
+    return start_date, end_date
+
+
+def parse_date_range(from_str, to_str, today=None):
+    """Parse from/to query values (YYYY-MM-DD, inclusive) into [start, end) dates"""
+    if not from_str:
+        raise ValueError("'from' is required (YYYY-MM-DD)")
+    try:
+        start_date = parser.isoparse(from_str).date()
+        end_date = (
+            parser.isoparse(to_str).date()
+            if to_str
+            else (today or datetime.now().date())
+        )
+    except ValueError:
+        raise ValueError('Invalid date format. Use YYYY-MM-DD')
+    if end_date < start_date:
+        raise ValueError("'to' must not be before 'from'")
+    return start_date, end_date + timedelta(days=1)
+
+
+def init_database(app):
+    """Create missing tables, columns and indexes for the app's database"""
+    with app.app_context():
+        # Ensure the database directory exists
+        database_path = db.engine.url.database
+        db_dir = os.path.dirname(database_path) if database_path else None
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+        
+        upgrade_schema(
+            db, open_session_scope=app.config.get('ACTIVE_SESSION_SCOPE', 'project')
+        )
+        logger.info("Database tables created/verified")
+        
+        # WAL lets readers (reports, backups) run alongside writers
+        if database_path and app.config.get('DATABASE_WAL', True):
+            with db.engine.connect() as conn:
+                conn.exec_driver_sql('PRAGMA journal_mode=WAL')
+
+
+def flush_heartbeats(app):
+    """Write the sessions built from heartbeats taken in since the last flush"""
+    with app.app_context():
+        app.extensions['heartbeats'].flush(utcnow())
+
+
+def sync_session_store(app):
+    """The app's session store, loaded and brought up to date
+
+    It is loaded from its snapshot when there is one.
+    """
+    store = app.extensions['session_store']
+    if store.cursor is None:
+        database_path = db.engine.url.database
+        if (
+            database_path
+            and database_path != ':memory:'
+            and app.config['SESSION_STORE_SNAPSHOT']
+        ):
+            store.load_snapshot(app.config['SESSION_STORE_SNAPSHOT'], database_path)
+    store.sync(db.session.connection())
+    return store
+
+
+def save_session_store(app):
+    """Bring the session store up to date and write its snapshot"""
+    with app.app_context():
+        sync_session_store(app).save_snapshot(
+            app.config['SESSION_STORE_SNAPSHOT'], db.engine.url.database
+        )
+
+
+def start_background_jobs(app, use_reloader=False):
+    """Start the scheduler for periodic jobs configured on the app"""
+    # With the debug reloader only the child process serves requests
+    if use_reloader and os.environ.get('WERKZEUG_RUN_MAIN') != 'true':
+        return None
+    
+    scheduler = Scheduler()
+    with app.app_context():
+        database_path = db.engine.url.database
+    
+    backup_hours = app.config.get('BACKUP_INTERVAL_HOURS', 0)
+    if backup_hours and database_path:
+        scheduler.add_job('backup', backup_hours * 3600, lambda: backup_database(
+            database_path,
+            app.config['BACKUP_DIR'],
+            keep=app.config['BACKUP_KEEP'],
+            compress=app.config['BACKUP_COMPRESS']
+        ))
+    
+    maintenance_hours = app.config.get('MAINTENANCE_INTERVAL_HOURS', 0)
+    if maintenance_hours and database_path:
+        scheduler.add_job(
+            'maintenance',
+            maintenance_hours * 3600,
+            lambda: run_maintenance(
+                database_path,
+                vacuum_pages=app.config['MAINTENANCE_VACUUM_PAGES'],
+                fix=app.config['MAINTENANCE_REPAIR'],
+            ),
+        )
+    
+    # Heartbeats are held in memory until flushed, including on shutdown
+    scheduler.add_job(
+        'heartbeats',
+        app.config['HEARTBEAT_FLUSH_SECONDS'],
+        lambda: flush_heartbeats(app),
+    )
+    atexit.register(flush_heartbeats, app)
+    
+    if database_path:
+        scheduler.add_job('idempotency_keys', 3600, lambda: run_idempotency_key_expiry(
+            database_path,
+            ttl_hours=app.config['IDEMPOTENCY_KEY_TTL_HOURS'],
+            max_keys=app.config['IDEMPOTENCY_KEY_MAX']
+        ))
+    
+    # Loaded at startup rather than by the first analytics request, and
+    # snapshotted for the next one
+    if (
+        app.extensions.get('session_store') is not None
+        and database_path
+        and app.config['SESSION_STORE_SNAPSHOT']
+    ):
+        scheduler.add_job(
+            'session_store',
+            app.config['SESSION_STORE_SNAPSHOT_MINUTES'] * 60,
+            lambda: save_session_store(app),
+            run_immediately=True,
+        )
+        atexit.register(save_session_store, app)
+    
+    stale_hours = app.config.get('STALE_SESSION_HOURS', 0)
+    if stale_hours and database_path:
+        scheduler.add_job(
+            'stale_sessions',
+            app.config['STALE_SESSION_CHECK_MINUTES'] * 60,
+            lambda: run_stale_session_check(
+                database_path,
+                idle_minutes=stale_hours * 60,
+                grace_minutes=app.config['STALE_SESSION_GRACE_MINUTES'],
+            ),
+            run_immediately=True,
+        )
+    
+    scheduler.start()
+    return scheduler
+
 
 def create_app(config=None):
     """Application factory pattern"""
-    global Project, Session, Break
+    global Project, Session, Category, Break, Commit, IdempotencyKey, Change
     
     # Initialize Flask app
     app = Flask(__name__)
@@ -82,6 +474,123 @@ def create_app(config=None):
     DATABASE_PATH = os.environ.get('DATABASE_PATH', 'data/timetracker.db')
     app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{DATABASE_PATH}'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Wait for a busy database instead of failing while a backup step or
+    # another writer holds the lock
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'connect_args': {'timeout': float(os.environ.get('DATABASE_BUSY_TIMEOUT', 15))}
+    }
+    app.config['DATABASE_WAL'] = (
+        os.environ.get('DATABASE_WAL', 'true').lower() != 'false'
+    )
+
+    # Scheduled online backups (BACKUP_INTERVAL_HOURS=0 disables them)
+    app.config['BACKUP_INTERVAL_HOURS'] = float(
+        os.environ.get('BACKUP_INTERVAL_HOURS', 0)
+    )
+    app.config['BACKUP_DIR'] = os.environ.get(
+        'BACKUP_DIR', os.path.join(os.path.dirname(DATABASE_PATH) or '.', 'backups')
+    )
+    app.config['BACKUP_KEEP'] = int(os.environ.get('BACKUP_KEEP', 24))
+    app.config['BACKUP_COMPRESS'] = (
+        os.environ.get('BACKUP_COMPRESS', 'false').lower() == 'true'
+    )
+
+    # Scheduled ANALYZE, incremental vacuum, WAL checkpoint and consistency audit
+    app.config['MAINTENANCE_INTERVAL_HOURS'] = float(
+        os.environ.get('MAINTENANCE_INTERVAL_HOURS', 0)
+    )
+    app.config['MAINTENANCE_VACUUM_PAGES'] = int(
+        os.environ.get('MAINTENANCE_VACUUM_PAGES', 1000)
+    )
+    app.config['MAINTENANCE_REPAIR'] = (
+        os.environ.get('MAINTENANCE_REPAIR', 'false').lower() == 'true'
+    )
+
+    # Close sessions with no activity (start, break, commit) for
+    # STALE_SESSION_HOURS (0 disables)
+    app.config['STALE_SESSION_HOURS'] = float(os.environ.get('STALE_SESSION_HOURS', 0))
+    app.config['STALE_SESSION_CHECK_MINUTES'] = float(
+        os.environ.get('STALE_SESSION_CHECK_MINUTES', 15)
+    )
+    app.config['STALE_SESSION_GRACE_MINUTES'] = float(
+        os.environ.get('STALE_SESSION_GRACE_MINUTES', 15)
+    )
+
+    # Limit status/report/analytics queries to the caller's own sessions
+    app.config['SCOPE_QUERIES_TO_USER'] = (
+        os.environ.get('TIME_TRACKER_SCOPE_TO_USER', 'false').lower() == 'true'
+    )
+
+    # Zone for callers that don't send X-Time-Tracker-Timezone
+    # (TIME_TRACKER_TIMEZONE, then TZ, then UTC)
+    app.config['TIMEZONE'] = server_timezone_name()
+
+    # Editor heartbeats: a pause longer than the gap ends a session; sessions
+    # are written every HEARTBEAT_FLUSH_SECONDS or once HEARTBEAT_FLUSH_SIZE
+    # heartbeats are waiting
+    app.config['HEARTBEAT_GAP_MINUTES'] = float(
+        os.environ.get('HEARTBEAT_GAP_MINUTES', 15)
+    )
+    app.config['HEARTBEAT_FLUSH_SECONDS'] = float(
+        os.environ.get('HEARTBEAT_FLUSH_SECONDS', 5)
+    )
+    app.config['HEARTBEAT_FLUSH_SIZE'] = int(
+        os.environ.get('HEARTBEAT_FLUSH_SIZE', 1000)
+    )
+
+    # One open session per 'project' (starting one stops the project's previous
+    # session) or per 'user' (starting one stops the user's session in any project)
+    app.config['ACTIVE_SESSION_SCOPE'] = os.environ.get(
+        'ACTIVE_SESSION_SCOPE', 'project'
+    )
+
+    # Historical sessions overlapping the user's other sessions are rejected,
+    # clipped or only reported
+    app.config['SESSION_OVERLAP_POLICY'] = os.environ.get(
+        'SESSION_OVERLAP_POLICY', 'reject'
+    )
+
+    # Stored responses for Idempotency-Key headers (and replayed offline events) expire
+    # after a TTL, and only the newest IDEMPOTENCY_KEY_MAX are kept
+    app.config['IDEMPOTENCY_KEY_TTL_HOURS'] = float(
+        os.environ.get('IDEMPOTENCY_KEY_TTL_HOURS', 168)
+    )
+    app.config['IDEMPOTENCY_KEY_MAX'] = int(
+        os.environ.get('IDEMPOTENCY_KEY_MAX', 100000)
+    )
+
+    # Group commit: write events from all request threads are committed
+    # together by one writer thread
+    app.config['WRITE_QUEUE'] = os.environ.get('WRITE_QUEUE', 'false').lower() == 'true'
+    app.config['WRITE_QUEUE_WINDOW_MS'] = float(
+        os.environ.get('WRITE_QUEUE_WINDOW_MS', 2)
+    )
+    app.config['WRITE_QUEUE_BATCH_SIZE'] = int(
+        os.environ.get('WRITE_QUEUE_BATCH_SIZE', 100)
+    )
+    app.config['WRITE_QUEUE_MAX_PENDING'] = int(
+        os.environ.get('WRITE_QUEUE_MAX_PENDING', 1000)
+    )
+
+    # Analytics read sessions from an in-memory columnar copy, kept current from the
+    # change feed and snapshotted to SESSION_STORE_SNAPSHOT every
+    # SESSION_STORE_SNAPSHOT_MINUTES
+    app.config['SESSION_STORE'] = (
+        os.environ.get('SESSION_STORE', 'false').lower() == 'true'
+    )
+    app.config['SESSION_STORE_SNAPSHOT'] = os.environ.get(
+        'SESSION_STORE_SNAPSHOT', f'{DATABASE_PATH}.sessions'
+    )
+    app.config['SESSION_STORE_SNAPSHOT_MINUTES'] = float(
+        os.environ.get('SESSION_STORE_SNAPSHOT_MINUTES', 10)
+    )
+
+    # Response compression (bodies smaller than COMPRESS_MIN_SIZE bytes are sent as-is)
+    app.config['COMPRESS_RESPONSES'] = (
+        os.environ.get('COMPRESS_RESPONSES', 'true').lower() != 'false'
+    )
+    app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+    app.config['COMPRESS_LEVEL'] = int(os.environ.get('COMPRESS_LEVEL', 6))
 
     # Override config if provided (for testing)
     if config:
@@ -90,10 +599,33 @@ def create_app(config=None):
     # Initialize database with app
     db.init_app(app)
 
+    # Compact JSON encoding and gzip/brotli compression for large payloads
+    init_responses(app)
+
     # Import and create models only once
     if Project is None:
         from models import create_models
-        Project, Session, Break = create_models(db)
+        Project, Session, Category, Break, Commit, IdempotencyKey, Change = (
+            create_models(db)
+        )
+    
+    # Sessions point at a category or one of its aliases; reports use the canonical name
+    CanonicalCategory = aliased(Category)
+    category_name = func.coalesce(CanonicalCategory.name, Category.name)
+
+    write_queue = None
+    if app.config['WRITE_QUEUE']:
+        write_queue = WriteQueue(
+            app, db,
+            batch_size=app.config['WRITE_QUEUE_BATCH_SIZE'],
+            window_ms=app.config['WRITE_QUEUE_WINDOW_MS'],
+            max_pending=app.config['WRITE_QUEUE_MAX_PENDING'],
+            retryable=retryable_write_error,
+            retries=WRITE_RETRIES
+        )
+
+    session_store = SessionStore() if app.config['SESSION_STORE'] else None
+    app.extensions['session_store'] = session_store
 
     # Import database browser
     from db_browser import db_browser
@@ -101,209 +633,605 @@ def create_app(config=None):
     # Register blueprints
     app.register_blueprint(db_browser)
 
-    def init_database():
-        """Initialize the database tables"""
-        with app.app_context():
-            # Ensure the database directory exists
-            db_dir = os.path.dirname(DATABASE_PATH)
-            if db_dir and not os.path.exists(db_dir):
-                os.makedirs(db_dir, exist_ok=True)
-            
-            db.create_all()
-            logger.info("Database tables created/verified")
+    @app.errorhandler(WriteQueueFull)
+    def write_queue_full(error):
+        response = jsonify({'error': 'Server is busy, try again shortly'})
+        response.headers['Retry-After'] = '1'
+        return response, 503
 
-    # Only create tables if we're not in testing mode
-    # if not app.config.get('TESTING', False):
-    #     init_database()
+    @app.before_request
+    def check_timezone_header():
+        zone = request.headers.get(TIMEZONE_HEADER, '').strip()
+        if zone and not valid_timezone(zone):
+            return (
+                jsonify({'error': f'Unknown time zone in {TIMEZONE_HEADER}: {zone}'}),
+                400,
+            )
 
     @app.route('/health', methods=['GET'])
     def health_check():
         """Health check endpoint"""
         return jsonify({
             'status': 'healthy',
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': utcnow().isoformat(),
             'version': '1.0.0',
             'database': 'connected' if db.engine.dialect.has_table(db.engine.connect(), 'projects') else 'disconnected'
         })
 
+    def stored_response(key, request_hash):
+        """The stored response for an idempotency key
+
+        Returns an error if it can't be reused, or None if there is none.
+        """
+        row = db.session.get(IdempotencyKey, key)
+        if row is None:
+            return None
+        if row.created_at < utcnow() - timedelta(
+            hours=app.config['IDEMPOTENCY_KEY_TTL_HOURS']
+        ):
+            db.session.delete(row)
+            db.session.commit()
+            return None
+        if row.request_hash != request_hash:
+            return (
+                jsonify(
+                    {
+                        'error': f'{IDEMPOTENCY_HEADER} was already used '
+                        'for a different request'
+                    }
+                ),
+                422,
+            )
+        response = Response(
+            row.response_body, status=row.status_code, mimetype='application/json'
+        )
+        response.headers['Idempotent-Replayed'] = 'true'
+        return response
+
+    def idempotent(view):
+        """Honor an Idempotency-Key header on a write endpoint
+
+        The first request with a key runs and its response is stored (with the
+        write itself, for endpoints using apply_event). Repeats of the same
+        request get the stored response without running again, until the key
+        expires after IDEMPOTENCY_KEY_TTL_HOURS.
+        """
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER, '').strip()
+            if not key:
+                return view(*args, **kwargs)
+            if len(key) > 64:
+                return (
+                    jsonify(
+                        {'error': f'{IDEMPOTENCY_HEADER} must be at most 64 characters'}
+                    ),
+                    400,
+                )
+            # Stored per user and endpoint, apart from the event ids of replays
+            key = f'request:{get_user_id()}:{request.method} {request.path}:{key}'
+            request_hash = hashlib.sha256(
+                f'{request.method} {request.path}\n{get_user_id()}\n'.encode()
+                + request.get_data(cache=True)
+            ).hexdigest()
+            
+            replay = stored_response(key, request_hash)
+            if replay is not None:
+                return replay
+            
+            g.idempotency = {'key': key, 'hash': request_hash, 'stored': False}
+            try:
+                response = app.make_response(view(*args, **kwargs))
+            except IntegrityError as e:
+                # A concurrent request with the same key stored its outcome first
+                db.session.rollback()
+                if 'idempotency_keys' not in str(e.orig):
+                    raise
+                return stored_response(key, request_hash)
+            
+            if not g.idempotency['stored'] and response.status_code < 500:
+                db.session.add(IdempotencyKey(
+                    key=key,
+                    endpoint=f'{request.method} {request.path}',
+                    status_code=response.status_code,
+                    response_body=response.get_data(as_text=True),
+                    request_hash=request_hash,
+                    created_at=utcnow()
+                ))
+                try:
+                    db.session.commit()
+                except IntegrityError:
+                    db.session.rollback()
+            return response
+        return wrapper
+
     @app.route('/api/v1/projects', methods=['GET'])
     def get_projects():
-        """Get all projects"""
-        projects = Project.query.all()
-        return jsonify([{
-            'id': p.id,
-            'name': p.name,
-            'type': p.type,
-            'language': p.language,
-            'framework': p.framework,
-            'created_at': p.created_at.isoformat(),
-            'last_activity': p.last_activity.isoformat() if p.last_activity else None
-        } for p in projects])
+        """List projects, filtered, sorted and paged on the server
 
-    @app.route('/api/v1/projects', methods=['POST'])
-    def create_or_update_project():
+        Pages are keyset based: X-Next-Cursor holds the sort key of the last
+        project sent, so every page is a range scan of an index, however deep.
+        Without a limit all matching projects are returned.
+        """
+        sort = request.args.get('sort', 'id')
+        prefix = request.args.get('prefix', '')
+        cursor = request.args.get('cursor')
+        try:
+            limit = int(request.args['limit']) if request.args.get('limit') else None
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
+        if limit is not None and not 1 <= limit <= MAX_PROJECTS_LIMIT:
+            return (
+                jsonify({'error': f'limit must be between 1 and {MAX_PROJECTS_LIMIT}'}),
+                400,
+            )
+        if sort not in PROJECT_SORTS:
+            return (
+                jsonify({'error': f"sort must be one of {', '.join(PROJECT_SORTS)}"}),
+                400,
+            )
+        after = None
+        if cursor:
+            try:
+                after = decode_cursor(cursor)
+                if not isinstance(after, list) or len(after) != 2:
+                    raise ValueError('Invalid cursor')
+                if sort == 'last_activity':
+                    after[0] = datetime.fromisoformat(after[0])
+            except (TypeError, ValueError):
+                return jsonify({'error': 'Invalid cursor'}), 400
+        
+        filters = []
+        if prefix:
+            # A range on the unique name index; SQLite can't use the index for LIKE
+            filters += [Project.name >= prefix, Project.name < prefix + '\U0010ffff']
+        if request.args.get('type'):
+            filters.append(Project.type == request.args['type'])
+        if request.args.get('user'):
+            filters.append(Project.userid == request.args['user'])
+        if request.args.get('parent'):
+            Parent = aliased(Project)
+            filters.append(Project.parent_id == select(Parent.id).where(
+                Parent.name == request.args['parent']).scalar_subquery())
+        
+        # last_activity sorts on Project.activity_at, which stands in for missing values
+        sort_column = (
+            Project.activity_at if sort == 'last_activity' else getattr(Project, sort)
+        )
+        descending = sort == 'last_activity'
+        query = select(*(getattr(Project, field) for field in PROJECT_FIELDS),
+                       sort_column.label('sort_value')).where(*filters)
+        if after is not None:
+            # Spelled out rather than as a row value so SQLite seeks the index
+            # to the cursor
+            value, last_id = after
+            if descending:
+                query = query.where(
+                    sort_column <= value, or_(sort_column < value, Project.id < last_id)
+                )
+            else:
+                query = query.where(
+                    sort_column >= value, or_(sort_column > value, Project.id > last_id)
+                )
+        order = [sort_column, Project.id]
+        query = query.order_by(
+            *(column.desc() for column in order) if descending else order
+        )
+        if limit is not None:
+            query = query.limit(
+                limit + 1
+            )  # One extra row tells whether another page follows
+        
+        fields = list(PROJECT_FIELDS)
+        if request.args.get('counts', 'false').lower() == 'true':
+            # Session counts and hours for just this page, in one aggregate join
+            page = query.subquery()
+            query = select(
+                *(page.c[field] for field in PROJECT_FIELDS),
+                func.count(Session.id),
+                func.round(func.coalesce(func.sum(Session.net_minutes), 0) / 60.0, 2),
+                page.c.sort_value
+            ).outerjoin(Session, Session.project_id == page.c.id).group_by(page.c.id)
+            order = [page.c.sort_value, page.c.id]
+            query = query.order_by(
+                *(column.desc() for column in order) if descending else order
+            )
+            fields += ['sessions', 'total_hours']
+        rows = db.session.execute(query).all()
+        
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            sort_value = last.sort_value.isoformat() if descending else last.sort_value
+            next_cursor = encode_cursor([sort_value, last.id])
+        
+        response = jsonify(serialize_rows(rows, fields, wants_columnar()))
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        if request.args.get('total', 'false').lower() == 'true':
+            response.headers['X-Total-Count'] = str(
+                db.session.execute(
+                    select(func.count(Project.id)).where(*filters)
+                ).scalar()
+            )
+        return response
+
+    def save_project_event(data):
         """Create or update a project"""
-        data = request.get_json()
-        
         project_name = data.get('name')
         if not project_name:
-            return jsonify({'error': 'Project name is required'}), 400
+            return {'error': 'Project name is required'}, 400
         
-        # Check if project exists
-        project = Project.query.filter_by(name=project_name).first()
+        # Fields sent replace the stored ones; the rest are kept
+        fields = {
+            key: data[key]
+            for key in ('type', 'language', 'framework', 'path', 'git_remote')
+            if key in data
+        }
+        project_id, created = upsert_project(
+            project_name, fields, update=list(fields) + ['userid']
+        )
+        logger.info(f"Project {'created' if created else 'updated'}: {project_name}")
+        
+        return {
+            'id': project_id,
+            'name': project_name,
+            'message': (
+                'Project created successfully'
+                if created
+                else 'Project updated successfully'
+            ),
+        }, 200
+
+    @app.route('/api/v1/projects', methods=['POST'])
+    @idempotent
+    def create_or_update_project():
+        """Create or update a project"""
+        body, status = apply_event(save_project_event, request.get_json() or {})
+        return jsonify(body), status
+
+    def upsert_project(name, fields=None, update=(), userid=None):
+        """Create a project or touch the existing one in a single statement
+
+        Returns (id, created). The existing project's last_activity is bumped
+        and the columns named in `update` take the new values. Concurrent calls
+        can't create duplicates.
+        """
+        now = utcnow()
+        statement = sqlite_insert(Project).values(
+            name=name,
+            created_at=now,
+            last_activity=now,
+            userid=userid or get_user_id(),
+            **(fields or {}),
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[Project.name],
+            set_={
+                column: statement.excluded[column]
+                for column in ['last_activity', *update]
+            },
+        ).returning(Project.id, Project.created_at)
+        row = db.session.execute(statement).one()
+        return row.id, row.created_at == now
+
+    def run_event(
+        handler, data, idempotency_key=None, endpoint=None, request_hash=None
+    ):
+        """Run a write handler in a savepoint, without committing
+
+        Returns (body, status). Failed writes are rolled back to the savepoint,
+        leaving other writes in the same transaction alone. When an idempotency
+        key is given the outcome is stored alongside, so a retried event is
+        answered from the stored result instead of being applied twice.
+        """
+        savepoint = db.session.begin_nested()
+        try:
+            body, status = handler(data)
+        except ValueError as e:
+            body, status = {'error': str(e)}, 400
+        except Exception:
+            savepoint.rollback()
+            raise
         
-        if project:
-            # Update existing project
-            project.type = data.get('type', project.type)
-            project.language = data.get('language', project.language)
-            project.framework = data.get('framework', project.framework)
-            project.path = data.get('path', project.path)
-            project.git_remote = data.get('git_remote', project.git_remote)
-            project.last_activity = datetime.now()
-            project.userid = get_user_id()
+        if status >= 400:
+            savepoint.rollback()
         else:
-            # Create new project
-            project = Project(
-                name=project_name,
-                type=data.get('type', 'development'),
-                language=data.get('language'),
-                framework=data.get('framework'),
-                path=data.get('path'),
-                git_remote=data.get('git_remote'),
-                created_at=datetime.now(),
-                last_activity=datetime.now(),
-                userid=get_user_id()
+            savepoint.commit()
+        if idempotency_key:
+            db.session.add(IdempotencyKey(
+                key=idempotency_key,
+                endpoint=endpoint,
+                status_code=status,
+                response_body=json.dumps(body),
+                request_hash=request_hash,
+                created_at=utcnow()
+            ))
+        return body, status
+
+    def apply_event(
+        handler, data, idempotency_key=None, endpoint=None, request_hash=None
+    ):
+        """Run a write handler and commit it, returning (body, status)
+
+        With WRITE_QUEUE on, the write joins others on the writer thread and
+        is committed together with them. Otherwise it gets its own
+        transaction; a write that loses a race (the database is locked, or a
+        concurrent start opened a session first) is rolled back and run again.
+        An Idempotency-Key sent with the request is stored in the same
+        transaction as the write.
+        """
+        if idempotency_key is None and g.get('idempotency'):
+            idempotency_key, request_hash = g.idempotency['key'], g.idempotency['hash']
+            endpoint = f'{request.method} {request.path}'
+            g.idempotency['stored'] = True
+        
+        if write_queue is not None:
+            return write_queue.submit(
+                lambda: run_event(
+                    handler, data, idempotency_key, endpoint, request_hash
+                )
             )
-            db.session.add(project)
-        
-        db.session.commit()
-        logger.info(f"Project {'updated' if project.id else 'created'}: {project_name}")
         
-        return jsonify({
-            'id': project.id,
-            'name': project.name,
-            'message': 'Project created successfully' if not project.id else 'Project updated successfully'
-        })
+        for attempt in range(WRITE_RETRIES):
+            try:
+                body, status = run_event(
+                    handler, data, idempotency_key, endpoint, request_hash
+                )
+                db.session.commit()
+                return body, status
+            except (IntegrityError, OperationalError) as e:
+                db.session.rollback()
+                if attempt + 1 == WRITE_RETRIES or not retryable_write_error(e):
+                    raise
+                logger.info(f"Retrying write that lost a race: {e.orig}")
+                sleep(WRITE_RETRY_DELAY * 2 ** attempt)
 
-    @app.route('/api/v1/sessions/start', methods=['POST'])
-    def start_session():
-        """Start a new tracking session"""
-        data = request.get_json()
+    def with_categories(query):
+        """Join a sessions query to the categories needed for category_name"""
+        return query.outerjoin(Category, Session.category_id == Category.id).outerjoin(
+            CanonicalCategory, Category.canonical_id == CanonicalCategory.id
+        )
+
+    def category_names():
+        """Canonical name of every category id"""
+        return dict(db.session.query(Category.id, category_name).outerjoin(
+            CanonicalCategory, Category.canonical_id == CanonicalCategory.id
+        ))
+
+    def analytics_sessions(project_id, start_date):
+        """Closed sessions of a project started since start_date, in the caller's scope
+
+        Either way they are rows of the StoredSession fields, not ORM objects:
+        from the session store with SESSION_STORE on, otherwise from a select
+        of just those columns.
+        """
+        user = get_user_scope()
+        if session_store is not None:
+            store = sync_session_store(app)
+            return store.sessions(
+                store.select(project_id, since=start_date, user=user), category_names()
+            )
         
+        columns = {field: getattr(Session, field) for field in StoredSession._fields}
+        columns['category'] = category_name
+        query = with_categories(
+            select(
+                *(column.label(field) for field, column in columns.items())
+            ).select_from(Session)
+        ).where(
+            Session.project_id == project_id,
+            Session.start_time >= start_date,
+            Session.end_time.isnot(None),
+        )
+        if user:
+            query = query.where(Session.userid == user)
+        return db.session.execute(query).all()
+
+    def resolve_category(name):
+        """The category row for a name, created on first use"""
+        name = (name or 'development').strip()[:50] or 'development'
+        category = Category.query.filter_by(name=name).first()
+        if not category:
+            db.session.execute(sqlite_insert(Category.__table__).values(
+                name=name, created_at=utcnow()
+            ).on_conflict_do_nothing())
+            category = Category.query.filter_by(name=name).one()
+        return category
+
+    def mark_seen(session, when):
+        """Note activity on an open session, which keeps it from being closed"""
+        if session.last_seen_at is None or when > session.last_seen_at:
+            session.last_seen_at = when
+
+    def overlap_info(row):
+        return {
+            'id': row.id,
+            'project': row.project,
+            'start_time': row.start_time.isoformat(),
+            'end_time': row.end_time.isoformat() if row.end_time else None
+        }
+
+    def overlapping_sessions(intervals, user, project_id=None, stored=True):
+        """Stored sessions of a user overlapping any of some (key, start, end) intervals
+
+        One range query (on the userid + end_time index) fetches every session
+        in the span of the whole batch; a sort-and-sweep pass then pairs them
+        up, so thousands of intervals are checked at once. Intervals are also
+        checked against each other. Returns {key: {'sessions': [session rows],
+        'proposed': [keys of other intervals]}} for intervals with overlaps.
+        """
+        intervals = list(intervals)
+        if not intervals:
+            return {}
+        span_start = min(start for _, start, _ in intervals)
+        ends = [end for _, _, end in intervals]
+        query = (
+            db.session.query(
+                Session.id,
+                Project.name.label('project'),
+                Session.start_time,
+                Session.end_time,
+            )
+            .join(Project, Session.project_id == Project.id)
+            .filter(
+                Session.userid == user,
+                or_(Session.end_time > span_start, Session.end_time.is_(None)),
+            )
+        )
+        if None not in ends:
+            query = query.filter(Session.start_time < max(ends))
+        if project_id is not None:
+            query = query.filter(Session.project_id == project_id)
+        rows = {row.id: row for row in query} if stored else {}
+        
+        conflicts = defaultdict(lambda: {'sessions': [], 'proposed': []})
+        candidates = [(('proposed', key), start, end) for key, start, end in intervals]
+        candidates += [
+            (('sessions', row.id), row.start_time, row.end_time)
+            for row in rows.values()
+        ]
+        for first, second, _, _ in find_overlaps(candidates):
+            for (kind, key), (other_kind, other) in ((first, second), (second, first)):
+                if kind == 'proposed':
+                    conflicts[key][other_kind].append(
+                        rows[other] if other_kind == 'sessions' else other
+                    )
+        return conflicts
+
+    def start_session_event(data):
+        """Start a new tracking session, stopping any active one
+
+        Runs as one short write transaction: the project upsert takes the
+        write lock first, so no read is left to race with another start. The
+        unique indexes on open sessions catch anything that slips through,
+        and apply_event then runs the start again.
+        """
+        now = event_time(data)
         project_name = data.get('project')
         description = data.get('description')
-        category = data.get('category', 'development')
         
         if not project_name or not description:
-            return jsonify({'error': 'Project name and description are required'}), 400
+            return {'error': 'Project name and description are required'}, 400
         
         # Get or create project
-        project = Project.query.filter_by(name=project_name).first()
-        if not project:
-            project = Project(
-                name=project_name,
-                type='development',
-                created_at=datetime.now(),
-                last_activity=datetime.now(),
-                userid=get_user_id()
+        project_id, _ = upsert_project(project_name)
+        
+        # Stop the active session for this project (or, per user, in any project)
+        active = Session.project_id == project_id
+        if app.config['ACTIVE_SESSION_SCOPE'] == 'user':
+            active = or_(active, Session.userid == get_user_id())
+        stopped = (
+            db.session.execute(
+                update(Session)
+                .where(Session.end_time.is_(None), active)
+                .values(
+                    end_time=case(
+                        (Session.start_time > now, Session.start_time),
+                        else_=literal(now, Session.start_time.type),
+                    )
+                )
+                .returning(Session.description)
+                .execution_options(synchronize_session=False)
             )
-            db.session.add(project)
-            db.session.flush()  # Get project.id
-        
-        # Stop any active sessions for this project
-        active_sessions = Session.query.filter_by(
-            project_id=project.id,
-            end_time=None
-        ).all()
-        
-        for session in active_sessions:
-            session.end_time = datetime.now()
-            session.duration_minutes = int((session.end_time - session.start_time).total_seconds() / 60)
-            logger.info(f"Auto-stopped session: {session.description}")
+            .scalars()
+            .all()
+        )
+        for stopped_description in stopped:
+            logger.info(f"Auto-stopped session: {stopped_description}")
         
         # Create new session
+        category = resolve_category(data.get('category'))
         session = Session(
-            project_id=project.id,
-            start_time=datetime.now(),
-            category=category,
+            project_id=project_id,
+            start_time=now,
+            last_seen_at=now,
+            category_id=category.id,
             description=description,
-            userid=get_user_id()
+            userid=get_user_id(),
+            timezone=get_timezone()
         )
         
         db.session.add(session)
-        project.last_activity = datetime.now()
-        db.session.commit()
+        db.session.flush()
         
         logger.info(f"Started session: {description} for project {project_name}")
         
-        return jsonify({
+        return {
             'session_id': session.id,
             'project': project_name,
             'description': description,
-            'category': category,
+            'category': category.display_name,
             'start_time': session.start_time.isoformat(),
             'message': 'Session started successfully'
-        })
+        }, 200
 
-    @app.route('/api/v1/sessions/stop', methods=['POST'])
-    def stop_session():
-        """Stop the active session for a project"""
-        data = request.get_json()
+    def stop_session_event(data):
+        """Stop the active session for a project
+
+        The write comes first, so concurrent stops can't interleave.
+        """
+        now = event_time(data)
         project_name = data.get('project')
         
         if not project_name:
-            return jsonify({'error': 'Project name is required'}), 400
-        
-        # Find project
-        project = Project.query.filter_by(name=project_name).first()
-        if not project:
-            return jsonify({'error': 'Project not found'}), 404
-        
-        # Find active session
-        session = Session.query.filter_by(
-            project_id=project.id,
-            end_time=None
-        ).first()
+            return {'error': 'Project name is required'}, 400
         
-        if not session:
-            return jsonify({'error': 'No active session found'}), 404
-        
-        # Stop session
-        session.end_time = datetime.now()
+        # Stop the active session; database triggers compute its net duration
+        project_id = (
+            db.session.query(Project.id)
+            .filter(Project.name == project_name)
+            .scalar_subquery()
+        )
+        session_id = db.session.execute(
+            update(Session)
+            .where(Session.project_id == project_id, Session.end_time.is_(None))
+            .values(
+                end_time=case(
+                    (Session.start_time > now, Session.start_time),
+                    else_=literal(now, Session.start_time.type),
+                )
+            )
+            .returning(Session.id)
+            .execution_options(synchronize_session=False)
+        ).scalar()
         
-        # Calculate duration (subtract break time)
-        total_minutes = int((session.end_time - session.start_time).total_seconds() / 60)
-        break_minutes = sum(b.duration_minutes or 0 for b in session.breaks if b.end_time)
-        session.duration_minutes = max(0, total_minutes - break_minutes)
+        if session_id is None:
+            if not db.session.query(
+                Project.query.filter_by(name=project_name).exists()
+            ).scalar():
+                return {'error': 'Project not found'}, 404
+            return {'error': 'No active session found'}, 404
         
-        project.last_activity = datetime.now()
-        db.session.commit()
+        session = db.session.get(Session, session_id, populate_existing=True)
+        session.project.last_activity = now
         
         logger.info(f"Stopped session: {session.description} ({session.duration_minutes} minutes)")
         
-        return jsonify({
+        return {
             'session_id': session.id,
             'description': session.description,
             'duration_minutes': session.duration_minutes,
+            'break_minutes': session.break_minutes or 0,
             'start_time': session.start_time.isoformat(),
             'end_time': session.end_time.isoformat(),
             'message': 'Session stopped successfully'
-        })
+        }, 200
 
-    @app.route('/api/v1/sessions/break', methods=['POST'])
-    def toggle_break():
+    def toggle_break_event(data):
         """Start or end a break for the active session"""
-        data = request.get_json()
+        now = event_time(data)
         project_name = data.get('project')
         break_type = data.get('break_type', 'break')
         
         if not project_name:
-            return jsonify({'error': 'Project name is required'}), 400
+            return {'error': 'Project name is required'}, 400
         
         # Find project and active session
         project = Project.query.filter_by(name=project_name).first()
         if not project:
-            return jsonify({'error': 'Project not found'}), 404
+            return {'error': 'Project not found'}, 404
         
         session = Session.query.filter_by(
             project_id=project.id,
@@ -311,44 +1239,124 @@ def create_app(config=None):
         ).first()
         
         if not session:
-            return jsonify({'error': 'No active session found'}), 404
+            return {'error': 'No active session found'}, 404
         
         # Check for active break
         active_break = Break.query.filter_by(
             session_id=session.id,
             end_time=None
         ).first()
+        mark_seen(session, now)
         
         if active_break:
             # End the active break
-            active_break.end_time = datetime.now()
+            active_break.end_time = max(now, active_break.start_time)
             active_break.duration_minutes = int((active_break.end_time - active_break.start_time).total_seconds() / 60)
             
-            db.session.commit()
-            
-            return jsonify({
+            return {
                 'action': 'ended',
                 'break_type': active_break.break_type,
                 'duration_minutes': active_break.duration_minutes,
                 'message': f'Break ended: {active_break.break_type}'
-            })
+            }, 200
         else:
             # Start a new break
             new_break = Break(
                 session_id=session.id,
-                start_time=datetime.now(),
+                start_time=now,
                 break_type=break_type
             )
             
             db.session.add(new_break)
-            db.session.commit()
+            db.session.flush()
             
-            return jsonify({
+            return {
                 'action': 'started',
                 'break_type': break_type,
                 'start_time': new_break.start_time.isoformat(),
                 'message': f'Break started: {break_type}'
+            }, 200
+
+    def project_statuses(project_names, projects, user=None):
+        """Active session, active break and today's totals for many projects
+
+        Uses the same three set-based queries however many projects are asked
+        for. Names without a matching project get an empty status.
+        """
+        project_ids = [project.id for project in projects]
+        active_sessions = {}
+        active_breaks = {}
+        daily_totals = {}
+        
+        if project_ids:
+            active_query = Session.query.filter(
+                Session.project_id.in_(project_ids),
+                Session.end_time.is_(None)
+            )
+            if user:
+                active_query = active_query.filter(Session.userid == user)
+            # Most recently started session wins if a project has several open
+            for session in active_query.order_by(Session.start_time.desc()):
+                active_sessions.setdefault(session.project_id, session)
+            
+            if active_sessions:
+                breaks = Break.query.filter(
+                    Break.session_id.in_(
+                        [session.id for session in active_sessions.values()]
+                    ),
+                    Break.end_time.is_(None),
+                )
+                active_breaks = {
+                    active_break.session_id: active_break for active_break in breaks
+                }
+            
+            today = local_today(get_timezone()).isoformat()
+            totals_query = db.session.query(
+                Session.project_id,
+                func.coalesce(func.sum(Session.net_minutes), 0),
+                func.count(Session.id)
+            ).filter(
+                Session.project_id.in_(project_ids),
+                Session.local_date == today
+            )
+            if user:
+                totals_query = totals_query.filter(Session.userid == user)
+            daily_totals = {
+                project_id: (total_minutes, session_count)
+                for project_id, total_minutes, session_count in totals_query.group_by(
+                    Session.project_id
+                )
+            }
+        
+        projects_by_name = {project.name: project for project in projects}
+        statuses = []
+        for name in project_names:
+            project = projects_by_name.get(name)
+            active_session = active_sessions.get(project.id) if project else None
+            active_break = (
+                active_breaks.get(active_session.id) if active_session else None
+            )
+            total_minutes, session_count = (
+                daily_totals.get(project.id, (0, 0)) if project else (0, 0)
+            )
+            statuses.append({
+                'project': name,
+                'active_session': {
+                    'id': active_session.id,
+                    'description': active_session.description,
+                    'category': active_session.category,
+                    'start_time': active_session.start_time.isoformat()
+                } if active_session else None,
+                'active_break': {
+                    'type': active_break.break_type,
+                    'start_time': active_break.start_time.isoformat()
+                } if active_break else None,
+                'daily_summary': {
+                    'total_hours': round(total_minutes / 60, 2),
+                    'sessions': session_count
+                }
             })
+        return statuses
 
     @app.route('/api/v1/sessions/status', methods=['GET'])
     def get_status():
@@ -358,73 +1366,67 @@ def create_app(config=None):
         if not project_name:
             return jsonify({'error': 'Project name is required'}), 400
         
-        # Find project
-        project = Project.query.filter_by(name=project_name).first()
-        if not project:
-            return jsonify({
-                'project': project_name,
-                'active_session': None,
-                'active_break': None,
-                'daily_summary': {'total_hours': 0, 'sessions': 0}
-            })
-        
-        # Get active session
-        active_session = Session.query.filter_by(
-            project_id=project.id,
-            end_time=None
-        ).first()
-        
-        # Get active break
-        active_break = None
-        if active_session:
-            active_break = Break.query.filter_by(
-                session_id=active_session.id,
-                end_time=None
-            ).first()
-        
-        # Calculate daily summary
-        today = datetime.now().date()
-        today_sessions = Session.query.filter(
-            Session.project_id == project.id,
-            Session.start_time >= today,
-            Session.start_time < today + timedelta(days=1)
-        ).all()
+        projects = Project.query.filter_by(name=project_name).all()
+        return jsonify(project_statuses([project_name], projects, get_user_scope())[0])
+
+    @app.route('/api/v1/sessions/status/batch', methods=['GET', 'POST'])
+    def get_status_batch():
+        """Get current status for many projects in one request
+        
+        Projects are named with ?projects=a,b,c (or a JSON body {"projects": [...]}
+        on POST for long lists). Without names, every project owned by the
+        calling user is returned.
+        """
+        if request.method == 'POST':
+            project_names = (request.get_json() or {}).get('projects')
+            if project_names is not None and not isinstance(project_names, list):
+                return jsonify({'error': 'projects must be a list of names'}), 400
+        else:
+            projects_param = request.args.get('projects')
+            project_names = (
+                [name.strip() for name in projects_param.split(',') if name.strip()]
+                if projects_param
+                else None
+            )
         
-        total_minutes = sum(s.duration_minutes or 0 for s in today_sessions if s.duration_minutes)
+        if project_names:
+            project_names = list(dict.fromkeys(str(name) for name in project_names))
+            if len(project_names) > MAX_BATCH_STATUS_PROJECTS:
+                return (
+                    jsonify(
+                        {
+                            'error': f'At most {MAX_BATCH_STATUS_PROJECTS} projects '
+                            'per request'
+                        }
+                    ),
+                    400,
+                )
+            projects = Project.query.filter(Project.name.in_(project_names)).all()
+        else:
+            owner = get_user_scope() or get_user_id()
+            projects = (
+                Project.query.filter_by(userid=owner).order_by(Project.name).all()
+            )
+            project_names = [project.name for project in projects]
         
-        return jsonify({
-            'project': project_name,
-            'active_session': {
-                'id': active_session.id,
-                'description': active_session.description,
-                'category': active_session.category,
-                'start_time': active_session.start_time.isoformat()
-            } if active_session else None,
-            'active_break': {
-                'type': active_break.break_type,
-                'start_time': active_break.start_time.isoformat()
-            } if active_break else None,
-            'daily_summary': {
-                'total_hours': round(total_minutes / 60, 2),
-                'sessions': len(today_sessions)
-            }
-        })
+        return jsonify(
+            {'statuses': project_statuses(project_names, projects, get_user_scope())}
+        )
 
-    @app.route('/api/v1/sessions/commit', methods=['POST'])
-    def add_commit():
+    def add_commit_event(data):
         """Add git commit to active session"""
-        data = request.get_json()
+        now = event_time(data)
         project_name = data.get('project')
         commit_hash = data.get('commit_hash')
         commit_message = data.get('commit_message')
         
         if not all([project_name, commit_hash, commit_message]):
-            return jsonify({'error': 'Project, commit hash, and message are required'}), 400
+            return {'error': 'Project, commit hash, and message are required'}, 400
         
         # Find project and active session
         project = Project.query.filter_by(name=project_name).first()
         if not project:
-            return jsonify({'error': 'Project not found'}), 404
+            return {'error': 'Project not found'}, 404
         
         session = Session.query.filter_by(
             project_id=project.id,
@@ -432,102 +1434,906 @@ def create_app(config=None):
         ).first()
         
         if not session:
-            return jsonify({'error': 'No active session found'}), 404
-        
-        # Add commit to session
-        if not session.git_commits:
-            session.git_commits = []
+            return {'error': 'No active session found'}, 404
         
-        session.git_commits.append({
-            'hash': commit_hash,
-            'message': commit_message,
-            'timestamp': datetime.now().isoformat()
-        })
-        
-        db.session.commit()
+        # Record the commit (re-linking it if it was imported before)
+        commit = Commit.query.filter_by(project_id=project.id, hash=commit_hash).first()
+        mark_seen(session, now)
+        if commit:
+            commit.session_id = session.id
+        else:
+            db.session.add(Commit(
+                hash=commit_hash,
+                project_id=project.id,
+                session_id=session.id,
+                timestamp=now,
+                message=commit_message
+            ))
         
-        return jsonify({
+        return {
             'message': 'Commit linked to session',
             'commit_hash': commit_hash[:8],
             'session_id': session.id
-        })
+        }, 200
 
-    @app.route('/api/v1/reports/<period>', methods=['GET'])
-    def get_report(period):
-        """Generate time tracking reports"""
+    # Write events the CLI can record offline and replay later
+    event_handlers = {
+        'start': start_session_event,
+        'stop': stop_session_event,
+        'break': toggle_break_event,
+        'commit': add_commit_event,
+    }
+
+    @app.route('/api/v1/sessions/start', methods=['POST'])
+    @idempotent
+    def start_session():
+        """Start a new tracking session"""
+        body, status = apply_event(start_session_event, request.get_json() or {})
+        return jsonify(body), status
+
+    @app.route('/api/v1/sessions/stop', methods=['POST'])
+    @idempotent
+    def stop_session():
+        """Stop the active session for a project"""
+        body, status = apply_event(stop_session_event, request.get_json() or {})
+        return jsonify(body), status
+
+    @app.route('/api/v1/sessions/break', methods=['POST'])
+    @idempotent
+    def toggle_break():
+        """Start or end a break for the active session"""
+        body, status = apply_event(toggle_break_event, request.get_json() or {})
+        return jsonify(body), status
+
+    @app.route('/api/v1/sessions/commit', methods=['POST'])
+    @idempotent
+    def add_commit():
+        """Add git commit to active session"""
+        body, status = apply_event(add_commit_event, request.get_json() or {})
+        return jsonify(body), status
+
+    @app.route('/api/v1/sessions/replay', methods=['POST'])
+    @idempotent
+    def replay_events():
+        """Apply a batch of events recorded offline, once each and in time order"""
+        data = request.get_json() or {}
+        events = data.get('events')
+        
+        if not isinstance(events, list):
+            return jsonify({'error': 'events must be a list'}), 400
+        if len(events) > MAX_REPLAY_EVENTS:
+            return (
+                jsonify({'error': f'At most {MAX_REPLAY_EVENTS} events per request'}),
+                413,
+            )
+        for event in events:
+            if (
+                not isinstance(event, dict)
+                or not event.get('id')
+                or event.get('type') not in event_handlers
+            ):
+                return (
+                    jsonify(
+                        {
+                            'error': 'Each event needs an id and a type of '
+                            'start, stop, break or commit'
+                        }
+                    ),
+                    400,
+                )
+            if len(str(event['id'])) > 64:
+                return (
+                    jsonify({'error': 'Event ids must be at most 64 characters'}),
+                    400,
+                )
+        
+        # Events already applied by an earlier (possibly interrupted) replay; event ids
+        # are kept per user, apart from Idempotency-Key headers
+        userid = get_user_id()
+        keys = {str(event['id']): f'event:{userid}:{event["id"]}' for event in events}
+        applied = {
+            row.key: (
+                row.status_code,
+                json.loads(row.response_body),
+                row.endpoint,
+                row.request_hash,
+            )
+            for row in IdempotencyKey.query.filter(
+                IdempotencyKey.key.in_(keys.values())
+            )
+        }
+        
+        def replay_order(event):
+            # The instant each event is applied at, so offsets and a trailing Z don't
+            # reorder them; an event with a bad timestamp sorts as now and fails when
+            # applied
+            try:
+                return event_time(event)
+            except ValueError:
+                return utcnow()
+        
+        results = []
+        for event in sorted(events, key=replay_order):
+            event_id = str(event['id'])
+            key, endpoint = keys[event_id], f"replay:{event['type']}"
+            event_hash = hashlib.sha256(json.dumps(
+                [event.get('timestamp'), event.get('payload')], sort_keys=True
+            ).encode()).hexdigest()
+            replayed = False
+            if key in applied:
+                status, body, stored_endpoint, stored_hash = applied[key]
+                replayed = (stored_endpoint, stored_hash) == (endpoint, event_hash)
+                if not replayed:
+                    status, body = 422, {
+                        'error': 'Event id was already used for a different event'
+                    }
+            else:
+                payload = dict(
+                    event.get('payload') or {}, timestamp=event.get('timestamp')
+                )
+                body, status = apply_event(
+                    event_handlers[event['type']],
+                    payload,
+                    idempotency_key=key,
+                    endpoint=endpoint,
+                    request_hash=event_hash,
+                )
+                applied[key] = (status, body, endpoint, event_hash)
+            results.append(
+                {
+                    'id': event_id,
+                    'type': event['type'],
+                    'status': status,
+                    'body': body,
+                    'replayed': replayed,
+                }
+            )
+        
+        return jsonify(
+            {
+                'received': len(events),
+                'applied': sum(
+                    1
+                    for result in results
+                    if not result['replayed'] and result['status'] < 400
+                ),
+                'results': results,
+            }
+        )
+
+    def store_heartbeat_span(span):
+        """Open or extend the session for a span of editor activity; returns its id
+
+        While the user has a tt session running in the project, the activity
+        only keeps that session from going stale.
+        """
+        project_id, _ = upsert_project(span['project'], userid=span['userid'])
+        start_time, end_time = span['start'], span['end']
+        
+        running = db.session.execute(
+            update(Session)
+            .where(
+                Session.project_id == project_id,
+                Session.userid == span['userid'],
+                Session.end_time.is_(None),
+            )
+            .values(
+                last_seen_at=case(
+                    (
+                        or_(
+                            Session.last_seen_at.is_(None),
+                            Session.last_seen_at < end_time,
+                        ),
+                        literal(end_time, Session.last_seen_at.type),
+                    ),
+                    else_=Session.last_seen_at,
+                )
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if running:
+            return None
+        
+        # The session written by an earlier flush, or by another worker for the same
+        # stretch of work
+        session = (
+            db.session.get(Session, span['session_id']) if span['session_id'] else None
+        )
+        if session is None:
+            gap = timedelta(minutes=app.config['HEARTBEAT_GAP_MINUTES'])
+            session = Session.query.filter(
+                Session.project_id == project_id,
+                Session.userid == span['userid'],
+                Session.source == 'heartbeat',
+                Session.end_time >= start_time - gap,
+                Session.start_time <= end_time + gap
+            ).order_by(Session.end_time.desc()).first()
+        if session is not None:
+            session.start_time = min(session.start_time, start_time)
+            session.end_time = max(session.end_time, end_time)
+            session.last_seen_at = session.end_time
+            return session.id
+        
+        # Don't count time again that a tt session stopped during the span
+        # already covers
+        tracked_until = db.session.query(func.max(Session.end_time)).filter(
+            Session.project_id == project_id,
+            Session.userid == span['userid'],
+            Session.end_time > start_time,
+            Session.end_time < end_time
+        ).scalar()
+        if tracked_until is not None:
+            start_time = tracked_until
+        
+        session = Session(
+            project_id=project_id,
+            start_time=start_time,
+            end_time=end_time,
+            last_seen_at=end_time,
+            category_id=resolve_category(None).id,
+            description=(
+                f"Editing on {span['branch']}" if span['branch'] else 'Editor activity'
+            ),
+            userid=span['userid'],
+            timezone=span['timezone'],
+            source='heartbeat',
+        )
+        db.session.add(session)
+        db.session.flush()
+        return session.id
+
+    def write_heartbeat_spans(spans):
+        """Store spans of editor activity in one transaction
+
+        Returns their session ids.
+        """
+        try:
+            session_ids = [store_heartbeat_span(span) for span in spans]
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        logger.info(f"Wrote {len(spans)} spans of editor activity")
+        return session_ids
+
+    app.extensions['heartbeats'] = HeartbeatAggregator(
+        write_heartbeat_spans,
+        gap_minutes=app.config['HEARTBEAT_GAP_MINUTES'],
+        flush_size=app.config['HEARTBEAT_FLUSH_SIZE']
+    )
+
+    @app.route('/api/v1/heartbeats', methods=['POST'])
+    def record_heartbeats():
+        """Take in editor heartbeats
+
+        They are folded into sessions and written in batches.
+        """
+        data = request.get_json() or {}
+        heartbeats = data.get('heartbeats') if isinstance(data, dict) else data
+        
+        if not isinstance(heartbeats, list):
+            return jsonify({'error': 'heartbeats must be a list'}), 400
+        if len(heartbeats) > MAX_HEARTBEATS:
+            return (
+                jsonify({'error': f'At most {MAX_HEARTBEATS} heartbeats per request'}),
+                413,
+            )
+        
+        parsed = []
+        for heartbeat in heartbeats:
+            if not isinstance(heartbeat, dict) or not heartbeat.get('project'):
+                return jsonify({'error': 'Each heartbeat needs a project'}), 400
+            try:
+                timestamp = heartbeat_time(heartbeat.get('timestamp'))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            branch = heartbeat.get('branch')
+            parsed.append(
+                (
+                    str(heartbeat['project'])[:200],
+                    str(branch)[:100] if branch else None,
+                    timestamp,
+                )
+            )
+        
+        aggregator = app.extensions['heartbeats']
+        if aggregator.add(get_user_id(), get_timezone(), parsed):
+            aggregator.flush(utcnow())
+        
+        return jsonify({'accepted': len(parsed)}), 202
+
+    def import_commits_event(data):
+        """Ingest many git commits at once and attribute them to sessions"""
+        project_name = data.get('project')
+        commits = data.get('commits')
+        
+        if not project_name or not isinstance(commits, list):
+            return {'error': 'Project and a list of commits are required'}, 400
+        if len(commits) > MAX_BULK_COMMITS:
+            return {'error': f'At most {MAX_BULK_COMMITS} commits per request'}, 413
+        
+        rows = {}
+        zone = get_timezone()
+        try:
+            for commit in commits:
+                rows[commit['hash']] = {
+                    'hash': commit['hash'][:40],
+                    'timestamp': parse_commit_timestamp(commit['timestamp'], zone),
+                    'message': commit.get('message'),
+                    'author': commit.get('author')
+                }
+        except (KeyError, TypeError, ValueError) as e:
+            return {'error': f'Invalid commit: {e}'}, 400
+        
+        # Get or create project
+        project_id, _ = upsert_project(project_name)
+        
+        matches = {}
+        if rows:
+            # One range query for candidate sessions, then a sorted merge
+            first = min(row['timestamp'] for row in rows.values())
+            last = max(row['timestamp'] for row in rows.values())
+            sessions = (
+                db.session.query(Session.id, Session.start_time, Session.end_time)
+                .filter(
+                    Session.project_id == project_id,
+                    Session.start_time <= last,
+                    or_(
+                        Session.end_time.is_(None),
+                        Session.end_time >= first - DEFAULT_MATCH_GRACE,
+                    ),
+                )
+                .all()
+            )
+            matches = match_commits_to_sessions(
+                [(commit_hash, row['timestamp']) for commit_hash, row in rows.items()],
+                sessions
+            )
+        
+        values = [
+            dict(row, project_id=project_id, session_id=matches.get(commit_hash))
+            for commit_hash, row in rows.items()
+        ]
+        # The hashes an insert returns are the new commits; ones already imported
+        # are skipped
+        inserted_hashes = set()
+        for offset in range(0, len(values), BULK_INSERT_CHUNK):
+            statement = sqlite_insert(Commit).values(
+                values[offset : offset + BULK_INSERT_CHUNK]
+            )
+            statement = statement.on_conflict_do_nothing(
+                index_elements=['project_id', 'hash']
+            )
+            inserted_hashes.update(
+                db.session.execute(statement.returning(Commit.hash)).scalars()
+            )
+        inserted = len(inserted_hashes)
+        
+        # Re-imports keep existing links but fill in ones that were missing
+        links = [
+            {'commit_hash': value['hash'], 'link': value['session_id']}
+            for value in values
+            if value['session_id'] is not None and value['hash'] not in inserted_hashes
+        ]
+        if links:
+            table = Commit.__table__
+            db.session.execute(update(table).where(
+                table.c.project_id == project_id,
+                table.c.hash == bindparam('commit_hash'),
+                table.c.session_id.is_(None)
+            ).values(session_id=bindparam('link')), links)
+        
+        logger.info(f"Imported {inserted} commits for project {project_name}")
+        
+        return {
+            'project': project_name,
+            'received': len(commits),
+            'inserted': inserted,
+            'duplicates': len(rows) - inserted,
+            'matched': len(matches),
+            'message': 'Commits imported successfully'
+        }, 200
+
+    @app.route('/api/v1/commits/bulk', methods=['POST'])
+    @idempotent
+    def bulk_add_commits():
+        """Ingest many git commits at once and attribute them to sessions"""
+        body, status = apply_event(import_commits_event, request.get_json() or {})
+        return jsonify(body), status
+
+    @app.route('/api/v1/commits', methods=['GET'])
+    def get_commits():
+        """List commits for a project with the session time attributed to each"""
         project_name = request.args.get('project')
-        format_type = request.args.get('format', 'json')
-        
-        # Date range calculation
-        now = datetime.now()
-        if period == 'today':
-            start_date = now.date()
-            end_date = start_date + timedelta(days=1)
-        elif period == 'week':
-            start_date = now.date() - timedelta(days=now.weekday())
-            end_date = start_date + timedelta(days=7)
-        elif period == 'month':
-            start_date = now.date().replace(day=1)
-            next_month = start_date.replace(month=start_date.month + 1) if start_date.month < 12 else start_date.replace(year=start_date.year + 1, month=1)
-            end_date = next_month
-        else:
-            return jsonify({'error': 'Invalid period. Use: today, week, month'}), 400
+        limit = request.args.get('limit', 100, type=int)
+        offset = request.args.get('offset', 0, type=int)
         
-        # Build query
-        query = Session.query.filter(
-            Session.start_time >= start_date,
-            Session.start_time < end_date,
-            Session.duration_minutes.isnot(None)
+        if not project_name:
+            return jsonify({'error': 'Project parameter required'}), 400
+        
+        project = Project.query.filter_by(name=project_name).first()
+        if not project:
+            return jsonify({'error': 'Project not found'}), 404
+        
+        filters = [Commit.project_id == project.id]
+        try:
+            if request.args.get('from') or request.args.get('to'):
+                zone = get_timezone()
+                start_date, end_date = parse_date_range(
+                    request.args.get('from'), request.args.get('to'), local_today(zone)
+                )
+                # Local midnights in the caller's zone
+                filters += [
+                    Commit.timestamp
+                    >= to_utc(datetime.combine(start_date, time.min), zone),
+                    Commit.timestamp
+                    < to_utc(datetime.combine(end_date, time.min), zone),
+                ]
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # A session's time is split evenly between the commits made in it
+        commit_counts = db.session.query(
+            Commit.session_id,
+            func.count(Commit.id).label('commit_count')
+        ).filter(
+            Commit.project_id == project.id,
+            Commit.session_id.isnot(None)
+        ).group_by(Commit.session_id).subquery()
+        
+        total_commits, matched_commits = db.session.query(
+            func.count(Commit.id),
+            func.count(Commit.session_id)
+        ).filter(*filters).one()
+        
+        rows = (
+            db.session.query(
+                Commit.hash,
+                Commit.timestamp,
+                Commit.message,
+                Commit.author,
+                Commit.session_id,
+                Session.net_minutes,
+                commit_counts.c.commit_count,
+            )
+            .outerjoin(Session, Commit.session_id == Session.id)
+            .outerjoin(commit_counts, commit_counts.c.session_id == Commit.session_id)
+            .filter(*filters)
+            .order_by(Commit.timestamp.desc())
+            .limit(limit)
+            .offset(offset)
         )
         
-        if project_name:
-            project = Project.query.filter_by(name=project_name).first()
-            if project:
-                query = query.filter(Session.project_id == project.id)
+        return jsonify(
+            {
+                'project': project_name,
+                'total_commits': total_commits,
+                'matched_commits': matched_commits,
+                'commits': [
+                    {
+                        'hash': commit_hash,
+                        'timestamp': timestamp.isoformat(),
+                        'message': message,
+                        'author': author,
+                        'session_id': session_id,
+                        'minutes': (
+                            round(duration / commit_count, 1)
+                            if duration is not None and commit_count
+                            else None
+                        ),
+                    }
+                    for (
+                        commit_hash,
+                        timestamp,
+                        message,
+                        author,
+                        session_id,
+                        duration,
+                        commit_count,
+                    ) in rows
+                ],
+            }
+        )
+
+    @app.route('/api/v1/changes', methods=['GET'])
+    def get_changes():
+        """Changes to projects, sessions, breaks and commits after a cursor
         
-        sessions = query.all()
+        Each change carries the row's current state (null once deleted), so a
+        mirror can apply a batch and resume from next_cursor.
+        """
+        try:
+            since = int(request.args.get('since', 0))
+            limit = int(request.args.get('limit', DEFAULT_CHANGES_LIMIT))
+        except ValueError:
+            return jsonify({'error': 'since and limit must be integers'}), 400
+        if since < 0 or not 1 <= limit <= MAX_CHANGES_LIMIT:
+            return (
+                jsonify(
+                    {
+                        'error': 'since must be >= 0 and limit between 1 and '
+                        f'{MAX_CHANGES_LIMIT}'
+                    }
+                ),
+                400,
+            )
         
-        # Calculate summary
-        total_minutes = sum(s.duration_minutes for s in sessions)
-        category_breakdown = {}
-        project_breakdown = {}
+        # Fetch one extra row to know whether another page follows
+        changes = (
+            Change.query.filter(Change.id > since)
+            .order_by(Change.id)
+            .limit(limit + 1)
+            .all()
+        )
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        
+        # Current state of the changed rows, one query per table
+        rows = {}
+        row_ids = defaultdict(set)
+        for change in changes:
+            row_ids[change.table_name].add(change.row_id)
+        for table_name, ids in row_ids.items():
+            table = db.metadata.tables[table_name]
+            for row in db.session.execute(table.select().where(table.c.id.in_(ids))):
+                rows[(table_name, row.id)] = {
+                    key: value.isoformat() if isinstance(value, datetime) else value
+                    for key, value in row._mapping.items()
+                }
         
-        for session in sessions:
-            # Category breakdown
-            cat = session.category
-            category_breakdown[cat] = category_breakdown.get(cat, 0) + session.duration_minutes
-            
-            # Project breakdown
-            proj_name = session.project.name
-            project_breakdown[proj_name] = project_breakdown.get(proj_name, 0) + session.duration_minutes
+        return jsonify({
+            'changes': [{
+                'cursor': change.id,
+                'table': change.table_name,
+                'id': change.row_id,
+                'operation': change.operation,
+                'changed_at': change.changed_at.isoformat(),
+                'data': rows.get((change.table_name, change.row_id))
+            } for change in changes],
+            'next_cursor': changes[-1].id if changes else since,
+            'has_more': has_more
+        })
+
+    @app.route('/api/v1/categories', methods=['GET'])
+    def get_categories():
+        """List categories with their aliases and session counts"""
+        categories = Category.query.order_by(Category.name).all()
+        session_counts = dict(
+            db.session.query(Session.category_id, func.count(Session.id))
+            .group_by(Session.category_id)
+            .all()
+        )
+        
+        result = {}
+        for category in categories:
+            if category.canonical_id is None:
+                result[category.id] = {
+                    'id': category.id,
+                    'name': category.name,
+                    'aliases': [],
+                    'sessions': 0,
+                }
+        for category in categories:
+            entry = result[category.canonical_id or category.id]
+            if category.canonical_id is not None:
+                entry['aliases'].append(category.name)
+            entry['sessions'] += session_counts.get(category.id, 0)
+        
+        return jsonify(sorted(result.values(), key=lambda entry: entry['name']))
+
+    @app.route('/api/v1/categories', methods=['POST'])
+    @idempotent
+    def create_category():
+        """Create a category, optionally with aliases"""
+        data = request.get_json() or {}
+        name = (data.get('name') or '').strip()
+        aliases = data.get('aliases') or []
+        if not name or len(name) > 50:
+            return (
+                jsonify({'error': 'Category name is required (up to 50 characters)'}),
+                400,
+            )
+        if not isinstance(aliases, list) or not all(
+            isinstance(alias, str) and alias.strip() for alias in aliases
+        ):
+            return jsonify({'error': 'aliases must be a list of names'}), 400
+        
+        names = [name] + [alias.strip()[:50] for alias in aliases]
+        existing = [row.name for row in Category.query.filter(Category.name.in_(names))]
+        if existing:
+            return (
+                jsonify(
+                    {
+                        'error': f"Categories already exist: {', '.join(existing)}. "
+                        "Merge them instead."
+                    }
+                ),
+                409,
+            )
+        
+        category = Category(name=name, created_at=utcnow())
+        db.session.add(category)
+        db.session.flush()
+        for alias in names[1:]:
+            db.session.add(
+                Category(name=alias, canonical_id=category.id, created_at=utcnow())
+            )
+        db.session.commit()
+        
+        return (
+            jsonify({'id': category.id, 'name': category.name, 'aliases': names[1:]}),
+            201,
+        )
+
+    @app.route('/api/v1/categories/<name>', methods=['PUT'])
+    @idempotent
+    def rename_category(name):
+        """Rename a category; its sessions follow without being rewritten"""
+        data = request.get_json() or {}
+        new_name = (data.get('name') or '').strip()
+        if not new_name or len(new_name) > 50:
+            return (
+                jsonify(
+                    {'error': 'New category name is required (up to 50 characters)'}
+                ),
+                400,
+            )
+        
+        category = Category.query.filter_by(name=name).first()
+        if not category:
+            return jsonify({'error': 'Category not found'}), 404
+        if new_name != name and Category.query.filter_by(name=new_name).first():
+            return (
+                jsonify(
+                    {
+                        'error': f'Category {new_name} already exists. '
+                        'Merge into it instead.'
+                    }
+                ),
+                409,
+            )
+        
+        category.name = new_name
+        db.session.commit()
+        return jsonify({'id': category.id, 'name': new_name, 'previous_name': name})
+
+    @app.route('/api/v1/categories/<name>/merge', methods=['POST'])
+    @idempotent
+    def merge_category(name):
+        """Merge a category (and its aliases) into another one
+        
+        Only category rows change: the merged names become aliases of the
+        target, so their sessions are reported under it from now on.
+        """
+        data = request.get_json() or {}
+        source = Category.query.filter_by(name=name).first()
+        target = Category.query.filter_by(name=data.get('into') or '').first()
+        if not source or not target:
+            return jsonify({'error': 'Category not found'}), 404
+        
+        target_id = target.canonical_id or target.id
+        if target_id in (source.id, source.canonical_id):
+            return (
+                jsonify({'error': f'{name} is already part of {target.display_name}'}),
+                400,
+            )
+        
+        updated = Category.query.filter(
+            or_(Category.id == source.id, Category.canonical_id == source.id)
+        ).update({'canonical_id': target_id}, synchronize_session=False)
+        db.session.commit()
+        
+        return jsonify(
+            {'merged': name, 'into': target.display_name, 'categories_updated': updated}
+        )
+
+    def report_group_columns():
+        """SQL expressions used for each supported report grouping
+
+        Time groupings use the local date and hour stored on each session, so
+        days follow the time zone of the user who tracked them.
+        """
+        return {
+            'day': Session.local_date,
+            'week': func.date(
+                Session.local_date, 'weekday 0', '-6 days'
+            ),  # Monday of the week
+            'iso_week': Session.iso_week,
+            'month': func.substr(Session.local_date, 1, 7),
+            'hour': Session.local_hour,
+            'project': Project.name,
+            'category': category_name,
+            'user': Session.userid,
+        }
+
+    def build_report(start_date, end_date, project_name=None, group_by=(),
+                     include_sessions=True, limit=None, offset=0):
+        """Aggregate completed sessions with local dates in [start_date, end_date)
+
+        The aggregation runs in SQL with GROUP BY.
+        """
+        filters = [
+            Session.local_date >= start_date.isoformat(),
+            Session.local_date < end_date.isoformat(),
+            Session.net_minutes.isnot(None)
+        ]
+        if project_name:
+            filters.append(Project.name == project_name)
+        user = get_user_scope()
+        if user:
+            filters.append(Session.userid == user)
+        
+        def aggregate(*columns, categories=False):
+            query = db.session.query(
+                *columns,
+                func.count(Session.id),
+                func.coalesce(func.sum(Session.net_minutes), 0)
+            ).select_from(Session).join(Project, Session.project_id == Project.id)
+            if categories:
+                query = with_categories(query)
+            return query.filter(*filters)
+        
+        total_sessions, total_minutes = aggregate().one()
+        category_breakdown = {
+            category: round(minutes / 60, 2)
+            for category, _, minutes in aggregate(
+                category_name, categories=True
+            ).group_by(category_name)
+        }
+        project_breakdown = {
+            name: round(minutes / 60, 2)
+            for name, _, minutes in aggregate(Project.name).group_by(Project.name)
+        }
         
         report_data = {
-            'period': period,
             'start_date': start_date.isoformat(),
             'end_date': (end_date - timedelta(days=1)).isoformat(),
             'total_hours': round(total_minutes / 60, 2),
-            'total_sessions': len(sessions),
-            'category_breakdown': {k: round(v / 60, 2) for k, v in category_breakdown.items()},
-            'project_breakdown': {k: round(v / 60, 2) for k, v in project_breakdown.items()},
-            'sessions': [{
-                'id': s.id,
-                'project': s.project.name,
-                'description': s.description,
-                'category': s.category,
-                'start_time': s.start_time.isoformat(),
-                'end_time': s.end_time.isoformat() if s.end_time else None,
-                'duration_minutes': s.duration_minutes
-            } for s in sessions]
+            'total_sessions': total_sessions,
+            'category_breakdown': category_breakdown,
+            'project_breakdown': project_breakdown
+        }
+        
+        if group_by:
+            group_columns = report_group_columns()
+            columns = [group_columns[key].label(key) for key in group_by]
+            rows = (
+                aggregate(*columns, categories='category' in group_by)
+                .group_by(*columns)
+                .order_by(*columns)
+                .all()
+            )
+            report_data['group_by'] = list(group_by)
+            report_data['groups'] = [
+                dict(zip(group_by, row[:len(group_by)]),
+                     hours=round(row[-1] / 60, 2),
+                     sessions=row[-2])
+                for row in rows
+            ]
+        
+        if include_sessions:
+            # Columns in REPORT_SESSION_FIELDS order, serialized straight from the rows
+            query = with_categories(select(
+                Session.id, Project.name, Session.description, category_name,
+                Session.start_time, Session.end_time, Session.net_minutes
+            ).select_from(Session).join(Project, Session.project_id == Project.id)) \
+                .where(*filters).order_by(Session.start_time, Session.id)
+            if limit is not None:
+                query = query.limit(limit).offset(offset)
+                report_data['pagination'] = {
+                    'limit': limit,
+                    'offset': offset,
+                    'total': total_sessions,
+                }
+            report_data['sessions'] = serialize_rows(
+                db.session.execute(query), REPORT_SESSION_FIELDS, wants_columnar()
+            )
+        
+        if wants_columnar():
+            report_data['format'] = 'columnar'
+            if 'groups' in report_data:
+                report_data['groups'] = columnar(
+                    report_data['groups'], list(group_by) + ['hours', 'sessions']
+                )
+        
+        return report_data
+
+    def report_options():
+        """Parse the shared report query parameters (group_by, sessions, paging)"""
+        group_by = [
+            key.strip()
+            for key in request.args.get('group_by', '').split(',')
+            if key.strip()
+        ]
+        invalid = [key for key in group_by if key not in REPORT_GROUP_KEYS]
+        if invalid:
+            raise ValueError(
+                f"Invalid group_by: {', '.join(invalid)}. Use: "
+                f"{', '.join(REPORT_GROUP_KEYS)}"
+            )
+        limit = request.args.get('limit', type=int)
+        offset = request.args.get('offset', 0, type=int)
+        if (limit is not None and limit < 0) or offset < 0:
+            raise ValueError('limit and offset must be non-negative')
+        return {
+            'group_by': group_by,
+            'include_sessions': request.args.get('include_sessions', 'true').lower()
+            != 'false',
+            'limit': limit,
+            'offset': offset,
         }
+
+    @app.route('/api/v1/reports/<period>', methods=['GET'])
+    def get_report(period):
+        """Generate time tracking reports"""
+        project_name = request.args.get('project')
+        
+        date_range = period_range(period, local_today(get_timezone()))
+        if not date_range:
+            return (
+                jsonify({'error': f"Invalid period. Use: {', '.join(REPORT_PERIODS)}"}),
+                400,
+            )
+        
+        try:
+            options = report_options()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        report_data = build_report(*date_range, project_name=project_name, **options)
+        report_data['period'] = period
+        return jsonify(report_data)
+
+    @app.route('/api/v1/reports', methods=['GET'])
+    def get_range_report():
+        """Generate a report for an arbitrary date range, grouped in SQL"""
+        project_name = request.args.get('project')
+        period = request.args.get('period')
+        
+        try:
+            if period:
+                date_range = period_range(period, local_today(get_timezone()))
+                if not date_range:
+                    raise ValueError(
+                        f"Invalid period. Use: {', '.join(REPORT_PERIODS)}"
+                    )
+            else:
+                date_range = parse_date_range(
+                    request.args.get('from'),
+                    request.args.get('to'),
+                    local_today(get_timezone()),
+                )
+            options = report_options()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
+        # Raw sessions are opt-in here - long ranges are usually wanted as groups only
+        options['include_sessions'] = (
+            request.args.get('include_sessions', 'false').lower() == 'true'
+        )
+        report_data = build_report(*date_range, project_name=project_name, **options)
+        if period:
+            report_data['period'] = period
         return jsonify(report_data)
 
     # Analytics and Visualization Endpoints
+    def finished_breaks(sessions):
+        """Type and length of the finished breaks of some sessions, in one query"""
+        session_ids = [session.id for session in sessions]
+        breaks = db.session.query(Break.break_type, Break.duration_minutes).filter(
+            Break.session_id.in_(session_ids),
+            Break.end_time.isnot(None)
+        )
+        return [
+            {'type': break_type, 'duration_minutes': duration or 0}
+            for break_type, duration in breaks
+        ]
+
     @app.route('/api/v1/analytics/heatmap', methods=['GET'])
     def get_activity_heatmap():
         """Get GitHub-style activity heatmap data"""
         project = request.args.get('project')
-        year = request.args.get('year', datetime.now().year, type=int)
+        year = request.args.get('year', local_today(get_timezone()).year, type=int)
         
         if not project:
             return jsonify({'error': 'Project parameter required'}), 400
@@ -538,23 +2344,44 @@ def create_app(config=None):
             end_date = datetime(year, 12, 31, 23, 59, 59)
             
             # Query sessions for the year
-            project_obj = Project.query.filter_by(name=project).first()
-            if not project_obj:
+            project_id = db.session.execute(
+                select(Project.id).where(Project.name == project)
+            ).scalar()
+            if not project_id:
                 return jsonify({'error': 'Project not found'}), 404
             
-            sessions = Session.query.filter(
-                Session.project_id == project_obj.id,
-                Session.start_time >= start_date,
-                Session.end_time <= end_date,
-                Session.end_time.isnot(None)
-            ).all()
-            
-            # Group sessions by date and calculate daily hours
-            daily_hours = defaultdict(float)
-            for session in sessions:
-                date_key = session.start_time.strftime('%Y-%m-%d')
-                duration = (session.end_time - session.start_time).total_seconds() / 3600
-                daily_hours[date_key] += duration
+            # Daily hours, grouped on the sessions' local dates
+            user = get_user_scope()
+            if session_store is not None:
+                store = sync_session_store(app)
+                rows = store.totals(
+                    store.select(
+                        project_id,
+                        user=user,
+                        from_date=start_date.date(),
+                        to_date=end_date.date(),
+                    ),
+                    'local_day',
+                )
+                daily_hours = defaultdict(
+                    float,
+                    {day: minutes / 60.0 for (day,), (_, minutes) in rows.items()},
+                )
+            else:
+                query = db.session.query(
+                    Session.local_date,
+                    func.sum(Session.net_minutes) / 60.0
+                ).filter(
+                    Session.project_id == project_id,
+                    Session.local_date >= start_date.date().isoformat(),
+                    Session.local_date <= end_date.date().isoformat(),
+                    Session.end_time.isnot(None)
+                )
+                if user:
+                    query = query.filter(Session.userid == user)
+                daily_hours = defaultdict(
+                    float, query.group_by(Session.local_date).all()
+                )
             
             # Generate complete year grid (52-53 weeks)
             heatmap_data = []
@@ -613,6 +2440,13 @@ def create_app(config=None):
             active_days = len([h for h in daily_hours.values() if h > 0]);
             avg_hours_per_active_day = total_hours / active_days if active_days > 0 else 0;
             
+            if wants_columnar():
+                # Flatten the week grid into parallel arrays, 7 days per week
+                heatmap_data = columnar(
+                    [day for week in heatmap_data for day in week], HEATMAP_FIELDS
+                )
+                heatmap_data['shape'] = [53, 7]
+            
             return jsonify({
                 'year': year,
                 'project': project,
@@ -639,7 +2473,7 @@ def create_app(config=None):
         
         try:
             # Calculate date range based on period
-            now = datetime.now()
+            now = utcnow()
             if period == 'week':
                 start_date = now - timedelta(days=7)
             elif period == 'month':
@@ -651,24 +2485,54 @@ def create_app(config=None):
             else:
                 start_date = now - timedelta(days=30)
             
-            project_obj = Project.query.filter_by(name=project).first()
-            if not project_obj:
+            project_id = db.session.execute(
+                select(Project.id).where(Project.name == project)
+            ).scalar()
+            if not project_id:
                 return jsonify({'error': 'Project not found'}), 404
             
-            sessions = Session.query.filter(
-                Session.project_id == project_obj.id,
-                Session.start_time >= start_date,
-                Session.end_time.isnot(None)
-            ).all()
+            # Hours per category and local day
+            user = get_user_scope()
+            if session_store is not None:
+                store = sync_session_store(app)
+                names = category_names()
+                grouped = defaultdict(lambda: [0, 0])
+                for (category_id, day), (session_count, minutes) in store.totals(
+                    store.select(project_id, since=start_date, user=user),
+                    'category_id',
+                    'local_day',
+                ).items():
+                    # Aliases of a category are counted under its canonical name
+                    totals = grouped[(names.get(category_id), day)]
+                    totals[0] += session_count
+                    totals[1] += minutes
+                rows = sorted(
+                    (
+                        (category, day, session_count, minutes / 60.0)
+                        for (category, day), (session_count, minutes) in grouped.items()
+                    ),
+                    key=lambda row: row[1],
+                )
+            else:
+                date_key = Session.local_date
+                query = with_categories(db.session.query(
+                    category_name,
+                    date_key,
+                    func.count(Session.id),
+                    func.coalesce(func.sum(Session.net_minutes), 0) / 60.0
+                ).select_from(Session)).filter(
+                    Session.project_id == project_id,
+                    Session.start_time >= start_date,
+                    Session.end_time.isnot(None)
+                )
+                if user:
+                    query = query.filter(Session.userid == user)
+                rows = query.group_by(category_name, date_key).order_by(date_key).all()
             
             # Calculate category totals and trends
             category_data = {}
             
-            for session in sessions:
-                category = session.category
-                duration = (session.end_time - session.start_time).total_seconds() / 3600
-                date_key = session.start_time.strftime('%Y-%m-%d')
-                
+            for category, day, session_count, hours in rows:
                 if category not in category_data:
                     category_data[category] = {
                         'hours': 0.0,
@@ -676,12 +2540,9 @@ def create_app(config=None):
                         'daily_breakdown': {}
                     }
                 
-                category_data[category]['hours'] += duration
-                category_data[category]['sessions'] += 1
-                
-                if date_key not in category_data[category]['daily_breakdown']:
-                    category_data[category]['daily_breakdown'][date_key] = 0.0
-                category_data[category]['daily_breakdown'][date_key] += duration
+                category_data[category]['hours'] += hours
+                category_data[category]['sessions'] += session_count
+                category_data[category]['daily_breakdown'][day] = hours
             
             # Format response
             breakdown = []
@@ -714,6 +2575,9 @@ def create_app(config=None):
             # Sort by hours descending
             breakdown.sort(key=lambda x: x['hours'], reverse=True)
             
+            if wants_columnar():
+                breakdown = columnar(breakdown, CATEGORY_BREAKDOWN_FIELDS)
+            
             return jsonify({
                 'period': period,
                 'project': project,
@@ -734,17 +2598,15 @@ def create_app(config=None):
             return jsonify({'error': 'Project parameter required'}), 400
         
         try:
-            start_date = datetime.now() - timedelta(days=days)
+            start_date = utcnow() - timedelta(days=days)
             
-            project_obj = Project.query.filter_by(name=project).first()
-            if not project_obj:
+            project_id = db.session.execute(
+                select(Project.id).where(Project.name == project)
+            ).scalar()
+            if not project_id:
                 return jsonify({'error': 'Project not found'}), 400
             
-            sessions = Session.query.filter(
-                Session.project_id == project_obj.id,
-                Session.start_time >= start_date,
-                Session.end_time.isnot(None)
-            ).all()
+            sessions = analytics_sessions(project_id, start_date)
             
             # Daily productivity data
             daily_data = {}
@@ -753,10 +2615,10 @@ def create_app(config=None):
             weekday_daily_variation = defaultdict(list)  # Daily variation for box plots
             
             for session in sessions:
-                date_key = session.start_time.strftime('%Y-%m-%d')
-                weekday_key = session.start_time.strftime('%A')
+                date_key = session.local_date
+                weekday_key = datetime.strptime(date_key, '%Y-%m-%d').strftime('%A')
                 
-                duration = (session.end_time - session.start_time).total_seconds() / 3600
+                duration = (session.net_minutes or 0) / 60
                 
                 if date_key not in daily_data:
                     daily_data[date_key] = {
@@ -769,15 +2631,20 @@ def create_app(config=None):
                 daily_data[date_key]['sessions'] += 1
                 daily_data[date_key]['categories'].add(session.category)
                 
-                # Distribute session time across actual hours spanned
-                current_time = session.start_time
+                # Distribute session time across the local hours spanned
+                current_time = local_time(session.start_time, session.timezone).replace(
+                    tzinfo=None
+                )
+                end_time = local_time(session.end_time, session.timezone).replace(
+                    tzinfo=None
+                )
                 remaining_duration = duration
                 
-                while remaining_duration > 0 and current_time < session.end_time:
+                while remaining_duration > 0 and current_time < end_time:
                     # Calculate how much time to attribute to this hour
                     hour_end = current_time.replace(minute=59, second=59, microsecond=999999)
-                    if hour_end > session.end_time:
-                        hour_end = session.end_time
+                    if hour_end > end_time:
+                        hour_end = end_time
                     
                     time_in_hour = (hour_end - current_time).total_seconds() / 3600
                     time_to_use = min(time_in_hour, remaining_duration)
@@ -847,16 +2714,26 @@ def create_app(config=None):
             if best_weekday[1] > 0:
                 insights.append(f"Most productive on {best_weekday[0]}s")
             
+            daily_breakdown = {
+                date: {
+                    'hours': round(data['hours'], 2),
+                    'sessions': data['sessions'],
+                    'categories': list(data['categories'])
+                } for date, data in daily_data.items()
+            }
+            if wants_columnar():
+                daily_breakdown = columnar(
+                    [
+                        dict(values, date=date)
+                        for date, values in sorted(daily_breakdown.items())
+                    ],
+                    DAILY_BREAKDOWN_FIELDS,
+                )
+            
             return jsonify({
                 'project': project,
                 'period_days': days,
-                'daily_breakdown': {
-                    date: {
-                        'hours': round(data['hours'], 2),
-                        'sessions': data['sessions'],
-                        'categories': list(data['categories'])
-                    } for date, data in daily_data.items()
-                },
+                'daily_breakdown': daily_breakdown,
                 'hourly_breakdown': {str(hour): round(hours, 2) for hour, hours in hourly_data.items()},
                 'weekday_breakdown': {day: round(hours, 2) for day, hours in weekday_data.items()},
                 'weekday_box_plots': weekday_box_plots,
@@ -882,17 +2759,15 @@ def create_app(config=None):
             return jsonify({'error': 'Project parameter required'}), 400
         
         try:
-            start_date = datetime.now() - timedelta(days=days)
+            start_date = utcnow() - timedelta(days=days)
             
-            project_obj = Project.query.filter_by(name=project).first()
-            if not project_obj:
+            project_id = db.session.execute(
+                select(Project.id).where(Project.name == project)
+            ).scalar()
+            if not project_id:
                 return jsonify({'error': 'Project not found'}), 400
             
-            sessions = Session.query.filter(
-                Session.project_id == project_obj.id,
-                Session.start_time >= start_date,
-                Session.end_time.isnot(None)
-            ).all()
+            sessions = analytics_sessions(project_id, start_date)
             
             if not sessions:
                 return jsonify({
@@ -902,23 +2777,11 @@ def create_app(config=None):
                     'recommendations': ['Start tracking sessions to see patterns!']
                 })
             
-            # Analyze session lengths
-            session_durations = []
-            break_data = []
-            
-            for session in sessions:
-                duration_hours = (session.end_time - session.start_time).total_seconds() / 3600
-                session_durations.append(duration_hours)
-                
-                # Get breaks for this session
-                breaks = Break.query.filter_by(session_id=session.id).all()
-                for break_obj in breaks:
-                    if break_obj.end_time:
-                        break_duration = (break_obj.end_time - break_obj.start_time).total_seconds() / 60
-                        break_data.append({
-                            'type': break_obj.break_type,
-                            'duration_minutes': break_duration
-                        })
+            # Analyze session lengths (net of breaks)
+            session_durations = [
+                (session.net_minutes or 0) / 60 for session in sessions
+            ]
+            break_data = finished_breaks(sessions)
             
             # Calculate statistics
             avg_session_length = sum(session_durations) / len(session_durations)
@@ -1012,18 +2875,16 @@ def create_app(config=None):
             }), 200
         
         try:
-            start_date = datetime.now() - timedelta(days=days)
+            start_date = utcnow() - timedelta(days=days)
             
-            project_obj = Project.query.filter_by(name=project).first()
-            if not project_obj:
+            project_id = db.session.execute(
+                select(Project.id).where(Project.name == project)
+            ).scalar()
+            if not project_id:
                 return jsonify({'error': 'Project not found'}), 404
             
             # Get comprehensive data for analysis
-            sessions = Session.query.filter(
-                Session.project_id == project_obj.id,
-                Session.start_time >= start_date,
-                Session.end_time.isnot(None)
-            ).all()
+            sessions = analytics_sessions(project_id, start_date)
             
             if not sessions:
                 return jsonify({
@@ -1049,12 +2910,12 @@ def create_app(config=None):
             
             # Analyze sessions
             for session in sessions:
-                duration_hours = (session.end_time - session.start_time).total_seconds() / 3600
+                duration_hours = (session.net_minutes or 0) / 60
                 analytics_data['total_hours'] += duration_hours
                 analytics_data['session_lengths'].append(duration_hours)
                 
                 # Daily patterns
-                date_key = session.start_time.strftime('%Y-%m-%d')
+                date_key = session.local_date
                 if date_key not in analytics_data['daily_patterns']:
                     analytics_data['daily_patterns'][date_key] = {
                         'hours': 0,
@@ -1066,21 +2927,12 @@ def create_app(config=None):
                 analytics_data['daily_patterns'][date_key]['categories'].add(session.category)
                 
                 # Hourly patterns
-                hour_key = session.start_time.hour
+                hour_key = session.local_hour
                 analytics_data['hourly_patterns'][hour_key] += duration_hours
                 
                 # Category breakdown
                 analytics_data['category_breakdown'][session.category] += duration_hours
-                
-                # Get breaks for this session
-                breaks = Break.query.filter_by(session_id=session.id).all()
-                for break_obj in breaks:
-                    if break_obj.end_time:
-                        break_duration = (break_obj.end_time - break_obj.start_time).total_seconds() / 60
-                        analytics_data['break_data'].append({
-                            'type': break_obj.break_type,
-                            'duration_minutes': break_duration
-                        })
+            analytics_data['break_data'] = finished_breaks(sessions)
             
             # Calculate additional metrics
             daily_hours = [data['hours'] for data in analytics_data['daily_patterns'].values()]
@@ -1149,9 +3001,10 @@ Format as a JSON array of recommendation strings, each recommendation should be
             # Weekly patterns
             weekday_data = defaultdict(float)
             for session in sessions:
-                weekday = session.start_time.strftime('%A')
-                duration_hours = (session.end_time - session.start_time).total_seconds() / 3600
-                weekday_data[weekday] += duration_hours
+                weekday = datetime.strptime(session.local_date, '%Y-%m-%d').strftime(
+                    '%A'
+                )
+                weekday_data[weekday] += (session.net_minutes or 0) / 60
             
             weekly_patterns = '\n'.join([f"- {day}: {hours:.1f} hours" for day, hours in weekday_data.items()])
             category_breakdown = '\n'.join([f"- {cat}: {hours:.1f} hours" for cat, hours in analytics_data['category_breakdown'].items()])
@@ -1254,6 +3107,7 @@ Format as a JSON array of recommendation strings, each recommendation should be
             return jsonify({'error': str(e)}), 500
 
     @app.route('/api/v1/prompts/ai-recommendations', methods=['POST'])
+    @idempotent
     def update_ai_prompt():
         """Update the AI recommendations prompt"""
         try:
@@ -1271,6 +3125,7 @@ Format as a JSON array of recommendation strings, each recommendation should be
             return jsonify({'error': str(e)}), 500
 
     @app.route('/api/v1/prompts/ai-recommendations/reset', methods=['POST'])
+    @idempotent
     def reset_ai_prompt():
         """Reset the AI recommendations prompt to default"""
         try:
@@ -1338,78 +3193,379 @@ Provide 5-7 specific, actionable recommendations based on this data:\n\nPROJECT:
     def landing_page():
         return render_template('index.html', year=datetime.now().year)
 
-    @app.route('/api/v1/sessions/create', methods=['POST'])
-    def create_session():
+    def create_session_event(data):
         """Create a historical session with custom start and end times"""
-        data = request.get_json()
-        
         project_name = data.get('project')
         description = data.get('description')
-        category = data.get('category', 'development')
         start_time_str = data.get('start_time')
         end_time_str = data.get('end_time')
         
         if not all([project_name, description, start_time_str]):
-            return jsonify({'error': 'Project name, description, and start_time are required'}), 400
+            return {
+                'error': 'Project name, description, and start_time are required'
+            }, 400
         
+        zone = get_timezone()
         try:
-            # Parse datetime strings
-            start_time = datetime.fromisoformat(start_time_str.replace('Z', '+00:00'))
+            # Parse datetime strings; times without an offset are in the caller's zone
+            start_time = to_utc(
+                datetime.fromisoformat(start_time_str.replace('Z', '+00:00')), zone
+            )
             end_time = None
             if end_time_str:
-                end_time = datetime.fromisoformat(end_time_str.replace('Z', '+00:00'))
+                end_time = to_utc(
+                    datetime.fromisoformat(end_time_str.replace('Z', '+00:00')), zone
+                )
         except ValueError as e:
-            return jsonify({'error': f'Invalid datetime format: {e}'}), 400
-        
-        # Get or create project
-        project = Project.query.filter_by(name=project_name).first()
-        if not project:
-            project = Project(
-                name=project_name,
-                type='development',
-                created_at=datetime.now(),
-                last_activity=datetime.now(),
-                userid=get_user_id()
+            return {'error': f'Invalid datetime format: {e}'}, 400
+        
+        if end_time and end_time <= start_time:
+            return {'error': 'End time must be after start time'}, 400
+        
+        policy = data.get('on_overlap') or current_app.config['SESSION_OVERLAP_POLICY']
+        scope = data.get('overlap_scope', 'user')
+        if policy not in OVERLAP_POLICIES or scope not in ('user', 'project'):
+            return {'error': f"on_overlap must be one of {', '.join(OVERLAP_POLICIES)} "
+                             "and overlap_scope user or project"}, 400
+        
+        # Get or create project first, so the event holds the write lock from its first
+        # statement; a rejected session rolls the new project back with it
+        project_id, _ = upsert_project(project_name)
+        
+        # Other sessions of the same user, in any project unless scoped to this one
+        overlaps = overlapping_sessions([(0, start_time, end_time)], get_user_id(),
+                                        project_id if scope == 'project' else None)
+        overlaps = overlaps[0]['sessions'] if overlaps else []
+        if overlaps and policy == 'reject':
+            return {'error': 'Session overlaps existing sessions',
+                    'overlaps': [overlap_info(row) for row in overlaps]}, 409
+        clipped = False
+        if overlaps and policy == 'clip':
+            free = clip_interval(
+                start_time,
+                end_time,
+                [(row.start_time, row.end_time) for row in overlaps],
             )
-            db.session.add(project)
-            db.session.flush()  # Get project.id
+            if not free:
+                return {
+                    'error': 'No free time at the start of the session to clip it to',
+                    'overlaps': [overlap_info(row) for row in overlaps],
+                }, 409
+            clipped = free != (start_time, end_time)
+            start_time, end_time = free
         
         # Calculate duration if end_time is provided
         duration_minutes = None
         if start_time and end_time:
-            if end_time <= start_time:
-                return jsonify({'error': 'End time must be after start time'}), 400
             duration_seconds = (end_time - start_time).total_seconds()
             duration_minutes = int(duration_seconds / 60)
         
         # Create session
+        category = resolve_category(data.get('category'))
         session = Session(
-            project_id=project.id,
+            project_id=project_id,
             start_time=start_time,
             end_time=end_time,
             duration_minutes=duration_minutes,
-            category=category,
+            category_id=category.id,
             description=description,
-            userid=get_user_id()
+            userid=get_user_id(),
+            timezone=zone
         )
         
         db.session.add(session)
-        project.last_activity = datetime.now()
-        db.session.commit()
+        try:
+            db.session.flush()  # Get session.id
+        except IntegrityError:
+            return {
+                'error': 'Only one session can be open at a time; '
+                'stop the active session first'
+            }, 409
+        
+        # Attribute previously imported, unmatched commits that fall in this session
+        if end_time:
+            Commit.query.filter(
+                Commit.project_id == project_id,
+                Commit.session_id.is_(None),
+                Commit.timestamp >= start_time,
+                Commit.timestamp <= end_time + DEFAULT_MATCH_GRACE
+            ).update({'session_id': session.id}, synchronize_session=False)
         
         logger.info(f"Created historical session: {description} for project {project_name} ({start_time} to {end_time})")
         
-        return jsonify({
+        response = {
             'session_id': session.id,
             'project': project_name,
             'description': description,
-            'category': category,
+            'category': category.display_name,
             'start_time': session.start_time.isoformat(),
             'end_time': session.end_time.isoformat() if session.end_time else None,
             'duration_minutes': session.duration_minutes,
             'message': 'Historical session created successfully'
+        }
+        if overlaps:
+            response['overlaps'] = [overlap_info(row) for row in overlaps]
+            response['clipped'] = clipped
+        return response, 200
+
+    @app.route('/api/v1/sessions/create', methods=['POST'])
+    @idempotent
+    def create_session():
+        """Create a historical session with custom start and end times"""
+        body, status = apply_event(create_session_event, request.get_json() or {})
+        return jsonify(body), status
+
+    # Write endpoints a batch can call, by their path under /api/v1
+    batch_operations = {
+        '/projects': save_project_event,
+        '/sessions/start': start_session_event,
+        '/sessions/stop': stop_session_event,
+        '/sessions/break': toggle_break_event,
+        '/sessions/commit': add_commit_event,
+        '/sessions/create': create_session_event,
+        '/commits/bulk': import_commits_event,
+    }
+
+    def resolve_refs(value, results):
+        """Resolve {"$ref": "<op id>.<field>..."} values
+
+        Each is replaced with a field of an earlier operation's response.
+        """
+        if isinstance(value, list):
+            return [resolve_refs(item, results) for item in value]
+        if not isinstance(value, dict):
+            return value
+        if set(value) != {'$ref'}:
+            return {key: resolve_refs(item, results) for key, item in value.items()}
+        
+        op_id, *fields = str(value['$ref']).split('.')
+        if op_id not in results:
+            raise ValueError(f"$ref {value['$ref']} names no earlier operation")
+        status, resolved = results[op_id]
+        if status >= 400:
+            raise ValueError(f"$ref {value['$ref']} names an operation that failed")
+        for field in fields:
+            try:
+                resolved = resolved[int(field) if isinstance(resolved, list) else field]
+            except (KeyError, IndexError, TypeError, ValueError):
+                raise ValueError(
+                    f"$ref {value['$ref']} names no field of the operation's response"
+                )
+        return resolved
+
+    def run_batch_event(data):
+        """Run a list of write operations in order, in one transaction
+
+        Each operation runs in its own savepoint. Atomic batches stop at the
+        first failing operation and return its status, so the whole batch is
+        rolled back; otherwise failed operations are rolled back on their own
+        and the rest are kept.
+        """
+        operations = data.get('operations')
+        atomic = data.get('atomic', True)
+        if not isinstance(operations, list) or not isinstance(atomic, bool):
+            return {'error': 'operations must be a list and atomic true or false'}, 400
+        if len(operations) > MAX_BATCH_OPERATIONS:
+            return {
+                'error': f'At most {MAX_BATCH_OPERATIONS} operations per request'
+            }, 413
+        
+        ids = []
+        for index, operation in enumerate(operations):
+            if (
+                not isinstance(operation, dict)
+                or operation.get('path') not in batch_operations
+            ):
+                return {
+                    'error': f"Operation {index} needs a path of "
+                    f"{', '.join(batch_operations)}"
+                }, 400
+            if not isinstance(operation.get('body', {}), dict):
+                return {'error': f'Operation {index} body must be an object'}, 400
+            op_id = str(operation.get('id', index))
+            if '.' in op_id or op_id in ids:
+                return {
+                    'error': 'Operation ids must be unique and must not contain '
+                    f'dots: {op_id}'
+                }, 400
+            ids.append(op_id)
+        
+        results = []
+        responses = {}
+        for index, (op_id, operation) in enumerate(zip(ids, operations)):
+            try:
+                body = resolve_refs(operation.get('body', {}), responses)
+            except ValueError as e:
+                body, status = {'error': str(e)}, 400
+            else:
+                body, status = run_event(batch_operations[operation['path']], body)
+            responses[op_id] = (status, body)
+            results.append(
+                {'id': op_id, 'path': operation['path'], 'status': status, 'body': body}
+            )
+            if atomic and status >= 400:
+                return {
+                    'error': f'Operation {index} ({op_id}) failed; '
+                    'no operations were applied',
+                    'failed': index,
+                    'results': results,
+                }, status
+        
+        return {
+            'received': len(operations),
+            'applied': sum(1 for result in results if result['status'] < 400),
+            'atomic': atomic,
+            'results': results
+        }, 200
+
+    @app.route('/api/v1/batch', methods=['POST'])
+    @idempotent
+    def run_batch():
+        """Run several write operations in one request and one transaction"""
+        body, status = apply_event(run_batch_event, request.get_json() or {})
+        return jsonify(body), status
+
+    @app.route('/api/v1/sessions/overlaps', methods=['POST'])
+    def check_overlaps():
+        """Check proposed sessions (e.g. an import) for overlaps before creating them
+        
+        Each proposed session is checked against the caller's stored sessions
+        and against the other proposed ones, with one query and one sweep.
+        """
+        data = request.get_json() or {}
+        proposed = data.get('sessions')
+        scope = data.get('overlap_scope', 'user')
+        if not isinstance(proposed, list) or scope not in ('user', 'project'):
+            return (
+                jsonify(
+                    {
+                        'error': 'sessions must be a list and '
+                        'overlap_scope user or project'
+                    }
+                ),
+                400,
+            )
+        if len(proposed) > MAX_OVERLAP_CHECK_SESSIONS:
+            return (
+                jsonify(
+                    {
+                        'error': f'At most {MAX_OVERLAP_CHECK_SESSIONS} '
+                        'sessions per request'
+                    }
+                ),
+                413,
+            )
+        
+        zone = get_timezone()
+        intervals = defaultdict(list)  # by project name, or all together
+        try:
+            for index, entry in enumerate(proposed):
+                start_time = to_utc(
+                    datetime.fromisoformat(entry['start_time'].replace('Z', '+00:00')),
+                    zone,
+                )
+                end_time = None
+                if entry.get('end_time'):
+                    end_time = to_utc(
+                        datetime.fromisoformat(
+                            entry['end_time'].replace('Z', '+00:00')
+                        ),
+                        zone,
+                    )
+                intervals[entry.get('project') if scope == 'project' else None].append(
+                    (index, start_time, end_time)
+                )
+        except (KeyError, TypeError, AttributeError, ValueError) as e:
+            return jsonify({'error': f'Invalid session: {e}'}), 400
+        
+        projects = {
+            project.name: project.id
+            for project in Project.query.filter(
+                Project.name.in_([name for name in intervals if name])
+            )
+        }
+        conflicts = {}
+        for project_name, group in intervals.items():
+            # Sessions for a project that doesn't exist yet can only overlap each other
+            new_project = scope == 'project' and project_name not in projects
+            conflicts.update(
+                overlapping_sessions(
+                    group,
+                    get_user_id(),
+                    projects.get(project_name),
+                    stored=not new_project,
+                )
+            )
+        
+        return jsonify({
+            'checked': len(proposed),
+            'conflicts': [{
+                'index': index,
+                'sessions': [overlap_info(row) for row in overlap['sessions']],
+                'proposed': sorted(overlap['proposed'])
+            } for index, overlap in sorted(conflicts.items())]
         })
 
+    @app.route('/api/v1/sessions/overlaps', methods=['GET'])
+    def audit_overlaps():
+        """Find every pair of overlapping stored sessions, per user
+
+        This takes one sort-and-sweep pass.
+        """
+        query = db.session.query(
+            Session.id,
+            Session.userid,
+            Project.name.label('project'),
+            Session.start_time,
+            Session.end_time,
+        ).join(Project, Session.project_id == Project.id)
+        if request.args.get('project'):
+            query = query.filter(Project.name == request.args['project'])
+        user = get_user_scope()
+        if user:
+            query = query.filter(Session.userid == user)
+        try:
+            if request.args.get('from') or request.args.get('to'):
+                start_date, end_date = parse_date_range(
+                    request.args.get('from'),
+                    request.args.get('to'),
+                    local_today(get_timezone()),
+                )
+                query = query.filter(Session.local_date >= start_date.isoformat(),
+                                     Session.local_date < end_date.isoformat())
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        by_user = defaultdict(list)
+        rows = {}
+        for row in query:
+            rows[row.id] = row
+            by_user[row.userid].append((row.id, row.start_time, row.end_time))
+        
+        overlaps = []
+        for user_id, intervals in sorted(by_user.items()):
+            for first, second, overlap_start, overlap_end in find_overlaps(intervals):
+                overlaps.append(
+                    {
+                        'user': user_id,
+                        'first': overlap_info(rows[first]),
+                        'second': overlap_info(rows[second]),
+                        'overlap_minutes': (
+                            int((overlap_end - overlap_start).total_seconds() / 60)
+                            if overlap_end
+                            else None
+                        ),
+                    }
+                )
+        
+        return jsonify(
+            {
+                'sessions_checked': len(rows),
+                'total': len(overlaps),
+                'overlaps': overlaps,
+            }
+        )
+
     return app
 
 # Create the default app instance
@@ -1420,8 +3576,11 @@ if __name__ == '__main__':
     DATABASE_PATH = os.environ.get('DATABASE_PATH', 'data/timetracker.db')
     os.makedirs(os.path.dirname(DATABASE_PATH), exist_ok=True)
     
+    # Create or upgrade the schema before serving
+    init_database(app)
+    start_background_jobs(app, use_reloader=True)
+    
     # Start the server
     port = int(os.environ.get('PORT', 9000))
     logger.info(f"Starting Time Tracker Server on port {port}")
-    app.run(host='0.0.0.0', port=port, debug=True)
-       
\ No newline at end of file
+    app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Online backups for Universal Time Tracker
+Snapshots are taken with the SQLite backup API in small page steps, so the
+server keeps serving writes while a backup runs. Each snapshot is checked
+with PRAGMA integrity_check before it replaces older ones.
+"""
+
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Pages copied per step and pause between steps; the source is only locked
+# while a step runs, so writers wait at most one step
+BACKUP_PAGES_PER_STEP = 1024
+BACKUP_STEP_SLEEP = 0.005
+
+BACKUP_PREFIX = 'timetracker-'
+
+
+class BackupError(Exception):
+    """A snapshot could not be written, verified or restored"""
+
+
+def _copy(
+    source, target, pages=BACKUP_PAGES_PER_STEP, sleep=BACKUP_STEP_SLEEP, progress=None
+):
+    """Copy one SQLite connection into another with the backup API"""
+    source.backup(target, pages=pages, sleep=sleep, progress=progress)
+
+
+def integrity_check(conn):
+    """Return None if the database is sound, otherwise the problems found"""
+    problems = [row[0] for row in conn.execute('PRAGMA integrity_check')]
+    return None if problems == ['ok'] else problems
+
+
+@contextmanager
+def _opened_backup(path):
+    """Open a backup read-only, decompressing .gz snapshots to a temporary file"""
+    tmp_path = None
+    try:
+        if path.endswith('.gz'):
+            fd, tmp_path = tempfile.mkstemp(suffix='.db')
+            with os.fdopen(fd, 'wb') as out, gzip.open(path, 'rb') as src:
+                shutil.copyfileobj(src, out)
+            db_path = tmp_path
+        else:
+            db_path = path
+        conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+        try:
+            yield conn
+        finally:
+            conn.close()
+    finally:
+        if tmp_path:
+            os.unlink(tmp_path)
+
+
+def list_backups(backup_dir):
+    """Snapshots in a directory, newest first"""
+    if not os.path.isdir(backup_dir):
+        return []
+    names = [
+        name
+        for name in os.listdir(backup_dir)
+        if name.startswith(BACKUP_PREFIX)
+        and (name.endswith('.db') or name.endswith('.db.gz'))
+    ]
+    # Names embed a sortable timestamp
+    return [os.path.join(backup_dir, name) for name in sorted(names, reverse=True)]
+
+
+def rotate_backups(backup_dir, keep):
+    """Delete all but the newest `keep` snapshots, returning the removed paths"""
+    removed = list_backups(backup_dir)[keep:]
+    for path in removed:
+        os.remove(path)
+        logger.info(f"Removed old backup {path}")
+    return removed
+
+
+def backup_database(
+    db_path,
+    backup_dir,
+    keep=24,
+    compress=False,
+    pages=BACKUP_PAGES_PER_STEP,
+    sleep=BACKUP_STEP_SLEEP,
+    progress=None,
+):
+    """Write a verified snapshot of a live database and rotate old ones
+
+    Returns the path of the new snapshot. A snapshot that fails the integrity
+    check is discarded and BackupError raised, leaving existing ones intact.
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    name = f"{BACKUP_PREFIX}{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.db"
+    final_path = os.path.join(backup_dir, name + ('.gz' if compress else ''))
+    tmp_path = os.path.join(backup_dir, f'.{name}.tmp')
+
+    try:
+        source = sqlite3.connect(db_path)
+        target = sqlite3.connect(tmp_path)
+        try:
+            _copy(source, target, pages=pages, sleep=sleep, progress=progress)
+            problems = integrity_check(target)
+        finally:
+            target.close()
+            source.close()
+        if problems:
+            raise BackupError(
+                f"Backup failed integrity check: {'; '.join(problems[:5])}"
+            )
+
+        if compress:
+            with open(tmp_path, 'rb') as src, gzip.open(
+                tmp_path + '.gz', 'wb', compresslevel=6
+            ) as out:
+                shutil.copyfileobj(src, out)
+            os.remove(tmp_path)
+            tmp_path += '.gz'
+        os.replace(tmp_path, final_path)
+    finally:
+        for leftover in (tmp_path, tmp_path + '.gz'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+    logger.info(f"Backed up {db_path} to {final_path}")
+    rotate_backups(backup_dir, keep)
+    return final_path
+
+
+def verify_backup(path):
+    """Return None if a snapshot is sound, otherwise the problems found"""
+    try:
+        with _opened_backup(path) as conn:
+            return integrity_check(conn)
+    except (OSError, sqlite3.DatabaseError) as e:
+        return [str(e)]
+
+
+def restore_backup(path, db_path, pages=BACKUP_PAGES_PER_STEP, sleep=BACKUP_STEP_SLEEP):
+    """Replace a database's contents with a verified snapshot
+
+    The copy goes through SQLite's own locking, so it is safe to run against
+    the live database file, though writes made meanwhile are overwritten.
+    """
+    problems = verify_backup(path)
+    if problems:
+        raise BackupError(f"Refusing to restore {path}: {'; '.join(problems[:5])}")
+    with _opened_backup(path) as source:
+        target = sqlite3.connect(db_path, timeout=30)
+        try:
+            _copy(source, target, pages=pages, sleep=sleep)
+        finally:
+            target.close()
+    logger.info(f"Restored {db_path} from {path}")
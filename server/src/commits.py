@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Git commit helpers for Universal Time Tracker
+Parsing of bulk commit payloads and time-window matching of commits to sessions
+"""
+
+import heapq
+from datetime import datetime, timedelta
+
+from dateutil import parser
+
+from timezones import to_utc
+
+# Commits made shortly after `tt stop` still belong to the session they finish
+DEFAULT_MATCH_GRACE = timedelta(minutes=15)
+
+
+def parse_commit_timestamp(value, zone_name='UTC'):
+    """Parse an ISO 8601 commit timestamp into an aware UTC datetime
+
+    Timestamps without an offset are taken to be local time in `zone_name`.
+    """
+    return to_utc(parser.isoparse(value), zone_name)
+
+
+def match_commits_to_sessions(commits, sessions, grace=DEFAULT_MATCH_GRACE):
+    """Attribute commits to the sessions whose time window contains them
+
+    ``commits`` is an iterable of ``(key, timestamp)`` pairs and ``sessions`` an
+    iterable of ``(session_id, start_time, end_time)`` tuples, where a missing
+    ``end_time`` means the session is still open. Both are sorted once and merged
+    in a single sweep, so matching n commits against m sessions costs
+    O((n + m) log m) rather than one query per commit.
+
+    Returns a dict mapping commit keys to session ids; unmatched commits are omitted.
+    """
+    ordered_commits = sorted(commits, key=lambda commit: commit[1])
+    ordered_sessions = sorted(sessions, key=lambda session: session[1])
+
+    matches = {}
+    active = []  # heap of (window_end, start_time, session_id)
+    next_session = 0
+
+    for key, timestamp in ordered_commits:
+        # Open every session that has started by this commit
+        while (
+            next_session < len(ordered_sessions)
+            and ordered_sessions[next_session][1] <= timestamp
+        ):
+            session_id, start_time, end_time = ordered_sessions[next_session]
+            window_end = (
+                end_time + grace
+                if end_time
+                else datetime.max.replace(tzinfo=start_time.tzinfo)
+            )
+            heapq.heappush(active, (window_end, start_time, session_id))
+            next_session += 1
+
+        # Drop sessions whose window closed before this commit
+        while active and active[0][0] < timestamp:
+            heapq.heappop(active)
+
+        if active:
+            matches[key] = active[0][2]
+
+    return matches
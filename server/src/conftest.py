@@ -33,10 +33,17 @@ def patch_db_browser(monkeypatch):
             start_time TEXT,
             end_time TEXT,
             duration_minutes INTEGER,
+            break_minutes INTEGER,
+            net_minutes INTEGER,
             category TEXT,
+            category_id INTEGER,
             description TEXT,
             git_commits TEXT,
-            userid TEXT
+            userid TEXT,
+            timezone TEXT,
+            local_date TEXT,
+            local_hour INTEGER,
+            iso_week TEXT
         );
         CREATE TABLE breaks (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -46,6 +53,21 @@ def patch_db_browser(monkeypatch):
             duration_minutes INTEGER,
             break_type TEXT
         );
+        CREATE TABLE categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE,
+            canonical_id INTEGER,
+            created_at TEXT
+        );
+        CREATE TABLE commits (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            hash TEXT,
+            project_id INTEGER,
+            session_id INTEGER,
+            timestamp TEXT,
+            message TEXT,
+            author TEXT
+        );
     ''')
     conn.commit()
 
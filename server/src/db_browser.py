@@ -10,8 +10,27 @@ import json
 import sqlite3
 import os
 
+from timezones import local_fields, server_timezone_name, to_utc, utcnow
+
 db_browser = Blueprint('db_browser', __name__)
 
+# Session columns with the canonical category name in place of the legacy column
+SESSION_COLUMNS = '''
+    s.id, s.project_id, s.start_time, s.end_time, s.duration_minutes, s.break_minutes,
+    s.net_minutes, s.description, s.git_commits, s.userid, s.category_id,
+    COALESCE(cc.name, c.name, s.category) as category,
+    s.timezone, s.local_date
+'''
+CATEGORY_JOINS = '''
+    LEFT JOIN categories c ON c.id = s.category_id
+    LEFT JOIN categories cc ON cc.id = c.canonical_id
+'''
+# Sessions in a category given by name or alias, through the category_id index
+CATEGORY_FILTER = '''s.category_id IN (
+    SELECT id FROM categories WHERE COALESCE(canonical_id, id) =
+        (SELECT COALESCE(canonical_id, id) FROM categories WHERE name = ?)
+)'''
+
 def get_db_connection():
     """Get database connection"""
     database_path = os.environ.get('DATABASE_PATH', '/app/data/timetracker.db')
@@ -201,6 +220,13 @@ def delete_project(project_id):
     
     session_ids = [s[0] for s in session_ids]
     
+    # Delete commits recorded for this project and its subprojects
+    conn.execute(
+        'DELETE FROM commits WHERE project_id IN '
+        '(SELECT id FROM projects WHERE id = ? OR parent_id = ?)',
+        (project_id, project_id),
+    )
+    
     # Delete breaks for all sessions
     if session_ids:
         placeholders = ','.join('?' * len(session_ids))
@@ -234,10 +260,11 @@ def sessions():
     date_to = request.args.get('date_to')
     
     # Build query for filtered sessions
-    query = '''
-        SELECT s.*, p.name as project_name, COUNT(b.id) as break_count
+    query = f'''
+        SELECT {SESSION_COLUMNS}, p.name as project_name, COUNT(b.id) as break_count
         FROM sessions s
         JOIN projects p ON s.project_id = p.id
+        {CATEGORY_JOINS}
         LEFT JOIN breaks b ON s.id = b.session_id
     '''
     params = []
@@ -248,15 +275,15 @@ def sessions():
         params.append(f'%{project_filter}%')
     
     if category_filter:
-        conditions.append('s.category = ?')
+        conditions.append(CATEGORY_FILTER)
         params.append(category_filter)
     
     if date_from:
-        conditions.append('DATE(s.start_time) >= ?')
+        conditions.append('s.local_date >= ?')
         params.append(date_from)
     
     if date_to:
-        conditions.append('DATE(s.start_time) <= ?')
+        conditions.append('s.local_date <= ?')
         params.append(date_to)
     
     if conditions:
@@ -294,15 +321,15 @@ def sessions():
         filtered_params.append(f'%{project_filter}%')
     
     if category_filter:
-        filtered_conditions.append('s.category = ?')
+        filtered_conditions.append(CATEGORY_FILTER)
         filtered_params.append(category_filter)
     
     if date_from:
-        filtered_conditions.append('DATE(s.start_time) >= ?')
+        filtered_conditions.append('s.local_date >= ?')
         filtered_params.append(date_from)
     
     if date_to:
-        filtered_conditions.append('DATE(s.start_time) <= ?')
+        filtered_conditions.append('s.local_date <= ?')
         filtered_params.append(date_to)
     
     if filtered_conditions:
@@ -311,7 +338,7 @@ def sessions():
     filtered_stats = conn.execute(filtered_query, filtered_params).fetchone()
     
     # Process sessions to add current duration for active sessions
-    current_time = datetime.now()
+    current_time = utcnow()
     processed_sessions = []
     filtered_total_minutes = 0
     
@@ -322,7 +349,10 @@ def sessions():
         if session['end_time'] is None:
             session_dict['is_active'] = True
             # Calculate current duration
-            start_time = datetime.fromisoformat(session['start_time'].replace('Z', '+00:00'))
+            start_time = to_utc(
+                datetime.fromisoformat(session['start_time'].replace('Z', '+00:00')),
+                'UTC',
+            )
             current_duration_seconds = (current_time - start_time).total_seconds()
             session_dict['current_duration_minutes'] = int(current_duration_seconds / 60)
             session_dict['start_timestamp'] = start_time.timestamp()
@@ -377,12 +407,17 @@ def session_detail(session_id):
     """View session details"""
     conn = get_db_connection()
     
-    session = conn.execute('''
-        SELECT s.*, p.name as project_name, p.parent_id as project_parent_id, p.id as project_id
+    session = conn.execute(
+        f'''
+        SELECT {SESSION_COLUMNS}, p.name as project_name,
+               p.parent_id as project_parent_id
         FROM sessions s
         JOIN projects p ON s.project_id = p.id
+        {CATEGORY_JOINS}
         WHERE s.id = ?
-    ''', (session_id,)).fetchone()
+    ''',
+        (session_id,),
+    ).fetchone()
     
     if not session:
         conn.close()
@@ -415,24 +450,60 @@ def edit_session(session_id):
     
     if request.method == 'POST':
         data = request.form
-        # Parse datetime
+        # Parse datetime (times are edited in UTC, as stored)
         start_time = datetime.fromisoformat(data['start_time'].replace('Z', '+00:00'))
         end_time = None
         if data['end_time']:
             end_time = datetime.fromisoformat(data['end_time'].replace('Z', '+00:00'))
-        # Calculate duration
-        duration_minutes = None
-        if start_time and end_time:
-            duration_seconds = (end_time - start_time).total_seconds()
-            duration_minutes = int(duration_seconds / 60)
-        # Update session
-        conn.execute('''
+        start_time = to_utc(start_time, 'UTC').replace(tzinfo=None)
+        end_time = to_utc(end_time, 'UTC').replace(tzinfo=None) if end_time else None
+        # Local date and hour follow the start time, in the session's own zone
+        row = conn.execute(
+            'SELECT timezone, userid FROM sessions WHERE id = ?', (session_id,)
+        ).fetchone()
+        local = local_fields(start_time, (row and row[0]) or server_timezone_name())
+        # The edited times must not overlap the user's other sessions
+        if row:
+            clashes = conn.execute(
+                '''
+                SELECT s.id, p.name
+                FROM sessions s JOIN projects p ON p.id = s.project_id
+                WHERE s.userid = ? AND s.id != ?
+                  AND (s.end_time IS NULL OR julianday(s.end_time) > julianday(?))
+                  AND (? IS NULL OR julianday(s.start_time) < julianday(?))
+            ''',
+                (row[1], session_id, start_time, end_time, end_time),
+            ).fetchall()
+            if clashes:
+                conn.close()
+                flash(
+                    'Session overlaps '
+                    + ', '.join(f'#{c[0]} ({c[1]})' for c in clashes)
+                    + '; not saved',
+                    'error',
+                )
+                return redirect(
+                    url_for('db_browser.edit_session', session_id=session_id)
+                )
+        # Update session; database triggers recompute its break total and net duration
+        conn.execute(
+            '''
             UPDATE sessions 
-            SET start_time = ?, end_time = ?, duration_minutes = ?, 
-                category = ?, description = ?
+            SET start_time = ?, end_time = ?, category = ?, description = ?,
+                local_date = ?, local_hour = ?, iso_week = ?
             WHERE id = ?
-        ''', (start_time, end_time, duration_minutes, data['category'], 
-              data['description'], session_id))
+        ''',
+            (
+                start_time,
+                end_time,
+                data['category'],
+                data['description'],
+                local['local_date'],
+                local['local_hour'],
+                local['iso_week'],
+                session_id,
+            ),
+        )
         # Handle breaks
         existing_breaks = conn.execute('SELECT id FROM breaks WHERE session_id = ?', (session_id,)).fetchall()
         existing_break_ids = [b[0] for b in existing_breaks]
@@ -489,10 +560,11 @@ def edit_session(session_id):
                     filters[key] = value
         return redirect(url_for('db_browser.session_detail', session_id=session_id, **filters))
     # GET request - show edit form
-    session = conn.execute('''
-        SELECT s.*, p.name as project_name
+    session = conn.execute(f'''
+        SELECT {SESSION_COLUMNS}, p.name as project_name
         FROM sessions s
         JOIN projects p ON s.project_id = p.id
+        {CATEGORY_JOINS}
         WHERE s.id = ?
     ''', (session_id,)).fetchone()
     if not session:
@@ -508,8 +580,11 @@ def edit_session(session_id):
 def delete_session(session_id):
     """Delete a session and its breaks, preserving filter state if present"""
     conn = get_db_connection()
-    # Delete breaks first (if any)
+    # Delete breaks first (if any) and unlink commits, which stay with the project
     conn.execute('DELETE FROM breaks WHERE session_id = ?', (session_id,))
+    conn.execute(
+        'UPDATE commits SET session_id = NULL WHERE session_id = ?', (session_id,)
+    )
     # Delete the session
     conn.execute('DELETE FROM sessions WHERE id = ?', (session_id,))
     conn.commit()
@@ -545,10 +620,13 @@ def export_data():
             data = conn.execute('SELECT * FROM projects').fetchall()
             headers = ['id', 'name', 'type', 'language', 'framework', 'path', 'git_remote', 'created_at']
         elif table == 'sessions':
-            data = conn.execute('''
-                SELECT s.*, p.name as project_name 
+            data = conn.execute(f'''
+                SELECT s.id, s.project_id, p.name as project_name, s.start_time,
+                       s.end_time, s.duration_minutes,
+                       COALESCE(cc.name, c.name, s.category) as category, s.description
                 FROM sessions s 
                 JOIN projects p ON s.project_id = p.id
+                {CATEGORY_JOINS}
             ''').fetchall()
             headers = ['id', 'project_id', 'project_name', 'start_time', 'end_time', 'duration_minutes', 'category', 'description']
         else:
@@ -577,12 +655,14 @@ def export_data():
     elif format_type == 'json':
         # JSON export
         projects = conn.execute('SELECT * FROM projects').fetchall()
-        sessions = conn.execute('SELECT * FROM sessions').fetchall()
+        sessions = conn.execute(
+            f'SELECT {SESSION_COLUMNS} FROM sessions s {CATEGORY_JOINS}'
+        ).fetchall()
         breaks = conn.execute('SELECT * FROM breaks').fetchall()
         
         # Convert to dictionaries
         data = {
-            'exported_at': datetime.now().isoformat(),
+            'exported_at': utcnow().isoformat(),
             'projects': [dict(p) for p in projects],
             'sessions': [dict(s) for s in sessions],
             'breaks': [dict(b) for b in breaks]
@@ -614,12 +694,13 @@ def search():
     ''', (f'%{query}%', f'%{query}%', f'%{query}%', f'%{query}%')).fetchall()
     
     # Search in sessions
-    sessions = conn.execute('''
+    sessions = conn.execute(f'''
         SELECT 'session' as type, s.id, s.description as title, s.start_time as date,
                p.name as project_name
         FROM sessions s
         JOIN projects p ON s.project_id = p.id
-        WHERE s.description LIKE ? OR s.category LIKE ?
+        {CATEGORY_JOINS}
+        WHERE s.description LIKE ? OR COALESCE(cc.name, c.name, s.category) LIKE ?
     ''', (f'%{query}%', f'%{query}%')).fetchall()
     
     conn.close()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Editor heartbeat aggregation for Universal Time Tracker
+Editor plugins send a heartbeat every few seconds while someone is working.
+Rather than storing each one, heartbeats are folded as they arrive into
+spans of activity per user and project: a heartbeat within the gap threshold
+of a span extends it, a longer pause starts a new one. Changed spans are
+written in one transaction per flush, so hundreds of heartbeats a second
+cost a handful of row updates rather than a write each.
+"""
+
+import logging
+import threading
+from datetime import timedelta
+
+logger = logging.getLogger(__name__)
+
+# A pause longer than this between heartbeats ends a span of activity
+DEFAULT_GAP_MINUTES = 15
+
+# Heartbeats taken in before a flush is started from the request itself
+DEFAULT_FLUSH_SIZE = 1000
+
+
+class HeartbeatAggregator:
+    """Fold heartbeats into spans of activity and hand changed spans to a writer
+
+    `write` is called with copies of the changed spans (dicts of userid,
+    project, branch, timezone, start, end and session_id) and returns the
+    session id each was stored in, so later flushes extend the same session.
+    Spans are only written once they cover some time, so a lone heartbeat
+    doesn't make an empty session.
+    """
+
+    def __init__(
+        self, write, gap_minutes=DEFAULT_GAP_MINUTES, flush_size=DEFAULT_FLUSH_SIZE
+    ):
+        self.write = write
+        self.gap = timedelta(minutes=gap_minutes)
+        self.flush_size = flush_size
+        self._spans = {}  # (userid, project) -> the span being extended
+        self._finished = []  # spans ended by a pause, still to be written
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def add(self, userid, timezone, heartbeats):
+        """Take in (project, branch, timestamp) heartbeats; True when a flush is due"""
+        with self._lock:
+            for project, branch, timestamp in sorted(
+                heartbeats, key=lambda heartbeat: heartbeat[2]
+            ):
+                key = (userid, project)
+                span = self._spans.get(key)
+                if span is not None and timestamp > span['end'] + self.gap:
+                    if span['dirty']:
+                        self._finished.append(span)
+                    span = None
+                if span is None:
+                    span = self._spans[key] = {
+                        'userid': userid,
+                        'project': project,
+                        'branch': branch,
+                        'timezone': timezone,
+                        'start': timestamp,
+                        'end': timestamp,
+                        'session_id': None,
+                        'dirty': True,
+                    }
+                elif timestamp < span['start'] - self.gap:
+                    # Older than the span by more than a pause; that time was
+                    # already written
+                    continue
+                else:
+                    span['start'] = min(span['start'], timestamp)
+                    span['end'] = max(span['end'], timestamp)
+                    span['dirty'] = True
+                self._pending += 1
+            return self._pending >= self.flush_size
+
+    def flush(self, now=None):
+        """Write every changed span in one call to `write`; returns the number written
+
+        Spans that have seen no heartbeat for longer than the gap are dropped
+        from memory afterwards. If the write fails the spans stay changed and
+        are written by the next flush.
+        """
+        with self._flush_lock:
+            with self._lock:
+                spans = self._finished + [
+                    span for span in self._spans.values() if span['dirty']
+                ]
+                spans = [span for span in spans if span['end'] > span['start']]
+                finished = self._finished
+                self._finished = []
+                self._pending = 0
+                for span in spans:
+                    span['dirty'] = False
+            try:
+                session_ids = (
+                    self.write([dict(span) for span in spans]) if spans else []
+                )
+            except Exception:
+                with self._lock:
+                    for span in spans:
+                        span['dirty'] = True
+                    self._finished = [
+                        span for span in finished if span['dirty']
+                    ] + self._finished
+                raise
+            with self._lock:
+                for span, session_id in zip(spans, session_ids):
+                    span['session_id'] = session_id
+                if now is not None:
+                    self._spans = {key: span for key, span in self._spans.items()
+                                   if span['dirty'] or span['end'] + self.gap >= now}
+        return len(spans)
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Database maintenance for Universal Time Tracker
+Keeps the SQLite file healthy over months of edits: refreshes planner
+statistics, returns free pages to the filesystem, checkpoints the WAL and
+audits sessions and breaks for inconsistencies, optionally repairing them.
+"""
+
+import logging
+import sqlite3
+from datetime import timedelta
+
+from schema import (
+    BREAK_MINUTES_SQL,
+    CLOSE_EXTRA_OPEN_SESSIONS_SQL,
+    EXTRA_OPEN_SESSIONS_SQL,
+    MINUTES_SQL,
+    NET_MINUTES_SQL,
+)
+from timezones import STORAGE_FORMAT, utcnow
+
+logger = logging.getLogger(__name__)
+
+# Free pages released per incremental vacuum run
+DEFAULT_VACUUM_PAGES = 1000
+
+
+def _net_minutes(row):
+    """Net minutes of the session aliased `row`, as the session triggers compute them"""
+    return NET_MINUTES_SQL.format(row=row, breaks=BREAK_MINUTES_SQL.format(row=row))
+
+
+# Each check returns the ids of offending rows in one set-based query.
+# Stored durations may differ by a minute from rounding of sub-second times.
+AUDIT_CHECKS = {
+    # duration_minutes is the net minutes, with breaks counted only within their
+    # session, as the triggers keep it
+    'duration_mismatch': f"""
+        SELECT s.id FROM sessions s
+        WHERE s.end_time IS NOT NULL
+          AND (s.duration_minutes IS NULL
+               OR ABS(s.duration_minutes - {_net_minutes('s.')}) > 1)
+    """,
+    'break_outside_session': """
+        SELECT b.id FROM breaks b JOIN sessions s ON s.id = b.session_id
+        WHERE julianday(b.start_time) < julianday(s.start_time)
+           OR (s.end_time IS NOT NULL AND (b.end_time IS NULL
+               OR julianday(b.end_time) > julianday(s.end_time)))
+    """,
+    'orphaned_session': """
+        SELECT s.id FROM sessions s LEFT JOIN projects p ON p.id = s.project_id
+        WHERE p.id IS NULL
+    """,
+    'orphaned_break': """
+        SELECT b.id FROM breaks b LEFT JOIN sessions s ON s.id = b.session_id
+        WHERE s.id IS NULL
+    """,
+    'orphaned_commit': """
+        SELECT c.id FROM commits c
+        LEFT JOIN projects p ON p.id = c.project_id
+        LEFT JOIN sessions s ON s.id = c.session_id
+        WHERE p.id IS NULL OR (c.session_id IS NOT NULL AND s.id IS NULL)
+    """,
+    # Every open session except the most recently started one in its project
+    'extra_open_session': EXTRA_OPEN_SESSIONS_SQL.format(column='project_id'),
+}
+
+# Repairs, applied in order inside one transaction. Each works on the whole
+# table at once; orphans go first so later fixes don't touch them.
+REPAIRS = [
+    (
+        'orphaned_break',
+        "DELETE FROM breaks WHERE session_id NOT IN (SELECT id FROM sessions)",
+    ),
+    (
+        'orphaned_session',
+        "DELETE FROM breaks WHERE session_id IN "
+        "(SELECT id FROM sessions WHERE project_id NOT IN (SELECT id FROM projects))",
+    ),
+    (
+        'orphaned_session',
+        "DELETE FROM sessions WHERE project_id NOT IN (SELECT id FROM projects)",
+    ),
+    (
+        'orphaned_commit',
+        "DELETE FROM commits WHERE project_id NOT IN (SELECT id FROM projects)",
+    ),
+    (
+        'orphaned_commit',
+        "UPDATE commits SET session_id = NULL "
+        "WHERE session_id IS NOT NULL AND session_id NOT IN (SELECT id FROM sessions)",
+    ),
+    # Close extra open sessions when the next session in the project started
+    (
+        'extra_open_session',
+        CLOSE_EXTRA_OPEN_SESSIONS_SQL.format(
+            column='project_id', extra=AUDIT_CHECKS['extra_open_session']
+        ),
+    ),
+    # Clamp breaks to their session
+    (
+        'break_outside_session',
+        """
+        UPDATE breaks SET
+            start_time = CASE
+                WHEN julianday(start_time) < julianday(
+                    (SELECT start_time FROM sessions WHERE id = breaks.session_id))
+                THEN (SELECT start_time FROM sessions WHERE id = breaks.session_id)
+                ELSE start_time END,
+            end_time = (SELECT end_time FROM sessions WHERE id = breaks.session_id)
+        WHERE id IN (
+            SELECT b.id FROM breaks b JOIN sessions s ON s.id = b.session_id
+            WHERE s.end_time IS NOT NULL
+              AND (b.end_time IS NULL OR julianday(b.end_time) > julianday(s.end_time))
+        )
+    """,
+    ),
+    (
+        'break_outside_session',
+        """
+        UPDATE breaks
+        SET start_time = (SELECT start_time FROM sessions WHERE id = breaks.session_id)
+        WHERE julianday(start_time) < julianday(
+            (SELECT start_time FROM sessions WHERE id = breaks.session_id))
+    """,
+    ),
+    (
+        'break_outside_session',
+        f"""
+        UPDATE breaks
+        SET duration_minutes = MAX(0,
+            {MINUTES_SQL.format(start='start_time', end='end_time')})
+        WHERE end_time IS NOT NULL AND (duration_minutes IS NULL
+              OR duration_minutes != MAX(0,
+                  {MINUTES_SQL.format(start='start_time', end='end_time')}))
+    """,
+    ),
+    # Recompute durations last, after breaks and end times are fixed
+    (
+        'duration_mismatch',
+        f"""
+        UPDATE sessions SET duration_minutes = {_net_minutes('sessions.')}
+        WHERE id IN ({AUDIT_CHECKS['duration_mismatch']})
+    """,
+    ),
+]
+
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _applicable(conn, name):
+    """Commit checks need the commits table, which databases not yet upgraded lack"""
+    if name != 'orphaned_commit':
+        return True
+    return (
+        conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'commits'"
+        ).fetchone()
+        is not None
+    )
+
+
+def audit(conn):
+    """Run every consistency check, returning {check: [row ids]} for failing checks"""
+    issues = {}
+    for name, sql in AUDIT_CHECKS.items():
+        if not _applicable(conn, name):
+            continue
+        ids = [row[0] for row in conn.execute(sql)]
+        if ids:
+            issues[name] = ids
+    return issues
+
+
+def repair(conn):
+    """Fix everything audit() reports, in one transaction
+
+    Returns the rows changed per check.
+    """
+    changed = {}
+    with conn:
+        for name, sql in REPAIRS:
+            if not _applicable(conn, name):
+                continue
+            count = conn.execute(sql).rowcount
+            if count > 0:
+                changed[name] = changed.get(name, 0) + count
+    return changed
+
+
+def optimize(conn, full_analyze=False):
+    """Refresh query planner statistics"""
+    if full_analyze:
+        conn.execute('ANALYZE')
+    conn.execute('PRAGMA optimize')
+
+
+def incremental_vacuum(conn, pages=DEFAULT_VACUUM_PAGES):
+    """Release up to `pages` free pages; returns (freed, still free)
+
+    Only works once auto_vacuum is INCREMENTAL (see enable_incremental_vacuum).
+    """
+    before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+        # Pages are released as the pragma's result rows are stepped through
+        conn.execute(f'PRAGMA incremental_vacuum({int(pages)})').fetchall()
+    after = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    return before - after, after
+
+
+def enable_incremental_vacuum(conn):
+    """Switch the database to incremental auto-vacuum (rewrites the file once)"""
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    conn.execute('VACUUM')
+
+
+def checkpoint(conn):
+    """Copy the WAL into the database and truncate it
+
+    Returns (busy, wal pages, checkpointed).
+    """
+    return tuple(conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone())
+
+
+def run_maintenance(db_path, vacuum_pages=DEFAULT_VACUUM_PAGES, full_analyze=False,
+                    fix=False, enable_incremental=False):
+    """Run all maintenance steps and return a report of what was done"""
+    conn = connect(db_path)
+    try:
+        report = {}
+        page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        report['size_before'] = (
+            conn.execute('PRAGMA page_count').fetchone()[0] * page_size
+        )
+
+        report['issues'] = audit(conn)
+        if fix and report['issues']:
+            report['repaired'] = repair(conn)
+            report['remaining_issues'] = audit(conn)
+
+        optimize(conn, full_analyze=full_analyze)
+        if enable_incremental and conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            enable_incremental_vacuum(conn)
+            report['incremental_vacuum_enabled'] = True
+        report['pages_freed'], report['free_pages'] = incremental_vacuum(
+            conn, vacuum_pages
+        )
+        report['checkpoint'] = checkpoint(conn)
+
+        report['size_after'] = (
+            conn.execute('PRAGMA page_count').fetchone()[0] * page_size
+        )
+        report['auto_vacuum'] = ('none', 'full', 'incremental')[
+            conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+        ]
+    finally:
+        conn.close()
+
+    if report['issues']:
+        found = ', '.join(f'{k}={len(v)}' for k, v in report['issues'].items())
+        logger.warning(f"Consistency audit found: {found}")
+    logger.info(f"Maintenance done: freed {report['pages_freed']} pages, "
+                f"{report['size_before']} -> {report['size_after']} bytes")
+    return report
+
+
+def expire_idempotency_keys(conn, ttl_hours, max_keys):
+    """Delete stored idempotency keys older than ttl_hours
+
+    Only the newest max_keys are kept. Returns the rows deleted.
+    """
+    cutoff = (utcnow() - timedelta(hours=ttl_hours)).strftime(STORAGE_FORMAT)
+    with conn:
+        deleted = conn.execute(
+            'DELETE FROM idempotency_keys WHERE created_at < ?', (cutoff,)
+        ).rowcount
+        deleted += conn.execute(
+            'DELETE FROM idempotency_keys WHERE key IN '
+            '(SELECT key FROM idempotency_keys '
+            'ORDER BY created_at DESC LIMIT -1 OFFSET ?)',
+            (max_keys,),
+        ).rowcount
+    return deleted
+
+
+def run_idempotency_key_expiry(db_path, ttl_hours, max_keys):
+    """Expire idempotency keys in the database at db_path"""
+    conn = connect(db_path)
+    try:
+        deleted = expire_idempotency_keys(conn, ttl_hours, max_keys)
+    finally:
+        conn.close()
+    if deleted:
+        logger.info(f"Expired {deleted} idempotency keys")
+    return deleted
@@ -3,7 +3,15 @@ Database models for Universal Time Tracker
 """
 
 from datetime import datetime
-import json
+
+from sqlalchemy import event, func, literal_column, text
+
+from schema import (
+    install_category_triggers,
+    install_change_triggers,
+    install_session_total_triggers,
+)
+from timezones import UTCDateTime, local_fields, server_timezone_name, utcnow
 
 # db will be initialized in app.py
 db = None
@@ -38,6 +46,9 @@ def create_models(db_instance):
     
     class Project(db.Model):
         __tablename__ = 'projects'
+        __table_args__ = (
+            db.Index('ix_projects_userid', 'userid'),
+        )
         
         id = db.Column(db.Integer, primary_key=True)
         name = db.Column(db.String(200), unique=True, nullable=False)
@@ -46,13 +57,16 @@ def create_models(db_instance):
         framework = db.Column(db.String(50))
         path = db.Column(db.Text)
         git_remote = db.Column(db.Text)
-        created_at = db.Column(db.DateTime, default=datetime.now)
-        last_activity = db.Column(db.DateTime, default=datetime.now)
+        created_at = db.Column(UTCDateTime, default=utcnow)
+        last_activity = db.Column(UTCDateTime, default=utcnow)
         parent_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=True)
         userid = db.Column(db.String(100), nullable=False)
         
         # Relationships
         sessions = db.relationship('Session', backref='project', lazy=True, cascade='all, delete-orphan')
+        commits = db.relationship(
+            'Commit', backref='project', lazy=True, cascade='all, delete-orphan'
+        )
         subprojects = db.relationship('Project', backref=db.backref('parent', remote_side=[id]), lazy=True)
         
         @property
@@ -75,51 +89,231 @@ def create_models(db_instance):
         def __repr__(self):
             return f'<Project {self.name}>'
 
+    # Recent-first project lists sort on this: a project never touched since it
+    # was created falls back to its creation time, and an undated one sorts last
+    activity_at = func.coalesce(Project.last_activity, Project.created_at,
+                                literal_column("'1970-01-01 00:00:00.000000'"))
+    Project.activity_at = db.column_property(activity_at, deferred=True)
+    # The id tiebreak of those lists comes with the rowid
+    db.Index('ix_projects_activity_at', activity_at)
+
     class Session(db.Model):
         __tablename__ = 'sessions'
+        __table_args__ = (
+            # Per-user views (status, reports, analytics) filter on userid + time
+            db.Index('ix_sessions_userid_start_time', 'userid', 'start_time'),
+            # Overlap checks: a user's sessions ending after (or open at) a given time
+            db.Index('ix_sessions_userid_end_time', 'userid', 'end_time'),
+            db.Index('ix_sessions_project_id_start_time', 'project_id', 'start_time'),
+            # Active session lookups: project_id = ? AND end_time IS NULL
+            db.Index('ix_sessions_project_id_end_time', 'project_id', 'end_time'),
+            # At most one open session per project, even with concurrent starts
+            db.Index(
+                'uq_sessions_open_project_id',
+                'project_id',
+                unique=True,
+                sqlite_where=text('end_time IS NULL'),
+            ),
+            # Stale session checks: only open sessions are indexed, so the scan is tiny
+            db.Index(
+                'ix_sessions_open_last_seen_at',
+                'last_seen_at',
+                'start_time',
+                sqlite_where=text('end_time IS NULL'),
+            ),
+            # Category breakdowns and filters within a project
+            db.Index(
+                'ix_sessions_project_id_category_id_start_time',
+                'project_id',
+                'category_id',
+                'start_time',
+            ),
+            # Day-based reports, heatmaps and status totals group on the local date
+            db.Index('ix_sessions_userid_local_date', 'userid', 'local_date'),
+            db.Index('ix_sessions_project_id_local_date', 'project_id', 'local_date'),
+        )
         
         id = db.Column(db.Integer, primary_key=True)
         project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
-        start_time = db.Column(db.DateTime, default=datetime.now)
-        end_time = db.Column(db.DateTime)
+        start_time = db.Column(UTCDateTime, default=utcnow)
+        end_time = db.Column(UTCDateTime)
         duration_minutes = db.Column(db.Integer)
-        category = db.Column(db.String(50), default='development')
+        # Maintained by triggers whenever breaks or the session's times change
+        break_minutes = db.Column(db.Integer, default=0)
+        net_minutes = db.Column(db.Integer)
+        category_id = db.Column(db.Integer, db.ForeignKey('categories.id'))
+        # Names written here are moved to category_id by a trigger
+        legacy_category = db.Column('category', db.String(50))
         description = db.Column(db.Text, nullable=False)
-        git_commits = db.Column(db.Text)  # JSON string
+        # Legacy JSON string, superseded by the commits table
+        git_commits = db.Column(db.Text)
         userid = db.Column(db.String(100), nullable=False)
+        # Last sign of activity while open (start, break, commit); stale sessions
+        # close after it
+        last_seen_at = db.Column(UTCDateTime)
+        # 'heartbeat' for sessions built from editor heartbeats; None for tt
+        # start/stop and imports
+        source = db.Column(db.String(20))
+        # IANA zone of the user who tracked the session, and the start time's
+        # date, hour and ISO week (YYYY-Www) there; set whenever the session is written
+        timezone = db.Column(db.String(64))
+        local_date = db.Column(db.String(10))
+        local_hour = db.Column(db.Integer)
+        iso_week = db.Column(db.String(8))
         
         # Relationships
         breaks = db.relationship('Break', backref='session', lazy=True, cascade='all, delete-orphan')
+        commits = db.relationship(
+            'Commit', backref='session', lazy=True, order_by='Commit.timestamp'
+        )
+        category_entry = db.relationship('Category', lazy='joined')
+        
+        @property
+        def category(self):
+            """Canonical name of the session's category"""
+            if self.category_entry:
+                return self.category_entry.display_name
+            return self.legacy_category
         
         @property
         def git_commits_list(self):
-            """Get git commits as a list"""
-            if self.git_commits:
-                try:
-                    return json.loads(self.git_commits)
-                except:
-                    return []
-            return []
-        
-        @git_commits_list.setter
-        def git_commits_list(self, value):
-            """Set git commits from a list"""
-            self.git_commits = json.dumps(value) if value else None
+            """Get the git commits linked to this session as a list"""
+            return [commit.to_dict() for commit in self.commits]
         
         def __repr__(self):
             return f'<Session {self.description[:50]}>'
 
+    class Category(db.Model):
+        """Session category
+
+        A row with canonical_id set is an alias of (or was merged into) that category.
+        """
+        __tablename__ = 'categories'
+        
+        id = db.Column(db.Integer, primary_key=True)
+        name = db.Column(db.String(50), unique=True, nullable=False)
+        canonical_id = db.Column(
+            db.Integer, db.ForeignKey('categories.id'), nullable=True, index=True
+        )
+        created_at = db.Column(UTCDateTime, default=utcnow)
+        
+        canonical = db.relationship(
+            'Category', remote_side=[id], lazy='joined', join_depth=1
+        )
+        
+        @property
+        def display_name(self):
+            return self.canonical.name if self.canonical else self.name
+        
+        def __repr__(self):
+            return f'<Category {self.name}>'
+
     class Break(db.Model):
         __tablename__ = 'breaks'
+        __table_args__ = (
+            db.Index('ix_breaks_session_id_end_time', 'session_id', 'end_time'),
+        )
         
         id = db.Column(db.Integer, primary_key=True)
         session_id = db.Column(db.Integer, db.ForeignKey('sessions.id'), nullable=False)
-        start_time = db.Column(db.DateTime, default=datetime.now)
-        end_time = db.Column(db.DateTime)
+        start_time = db.Column(UTCDateTime, default=utcnow)
+        end_time = db.Column(UTCDateTime)
         duration_minutes = db.Column(db.Integer)
         break_type = db.Column(db.String(50), default='break')
         
         def __repr__(self):
             return f'<Break {self.break_type}>'
+
+    class Commit(db.Model):
+        __tablename__ = 'commits'
+        __table_args__ = (
+            db.UniqueConstraint(
+                'project_id', 'hash', name='uq_commits_project_id_hash'
+            ),
+            db.Index('ix_commits_hash', 'hash'),
+            db.Index('ix_commits_session_id', 'session_id'),
+            db.Index('ix_commits_project_id_timestamp', 'project_id', 'timestamp'),
+        )
+        
+        id = db.Column(db.Integer, primary_key=True)
+        hash = db.Column(db.String(40), nullable=False)
+        project_id = db.Column(db.Integer, db.ForeignKey('projects.id'), nullable=False)
+        session_id = db.Column(db.Integer, db.ForeignKey('sessions.id'), nullable=True)
+        timestamp = db.Column(UTCDateTime, nullable=False)
+        message = db.Column(db.Text)
+        author = db.Column(db.String(200))
+        
+        def to_dict(self):
+            return {
+                'hash': self.hash,
+                'message': self.message,
+                'author': self.author,
+                'timestamp': self.timestamp.isoformat()
+            }
+        
+        def __repr__(self):
+            return f'<Commit {self.hash[:8]}>'
+
+    class IdempotencyKey(db.Model):
+        """Outcome of a write applied under a client-generated key
+
+        Retries with the same key get the stored outcome instead of being applied twice.
+        """
+        __tablename__ = 'idempotency_keys'
+        
+        # 'request:<user>:<method> <path>:<Idempotency-Key>', or 'event:<user>:<id>'
+        # for replayed events
+        key = db.Column(db.Text, primary_key=True)
+        endpoint = db.Column(db.String(100), nullable=False)
+        status_code = db.Column(db.Integer, nullable=False)
+        response_body = db.Column(db.Text)
+        # Hash of the request a header key came with; reusing the key for another
+        # request is an error
+        request_hash = db.Column(db.String(64))
+        created_at = db.Column(UTCDateTime, default=utcnow, index=True)
+        
+        def __repr__(self):
+            return f'<IdempotencyKey {self.key}>'
+
+    class Change(db.Model):
+        """Append-only log of row changes, written by triggers
+
+        See schema.CHANGE_TRACKED_TABLES for the tables tracked.
+        """
+        __tablename__ = 'changes'
+        __table_args__ = {
+            'sqlite_autoincrement': True
+        }  # ids are cursors and must never be reused
+        
+        id = db.Column(db.Integer, primary_key=True)
+        table_name = db.Column(db.String(50), nullable=False)
+        row_id = db.Column(db.Integer, nullable=False)
+        operation = db.Column(db.String(10), nullable=False)
+        changed_at = db.Column(UTCDateTime, nullable=False)
+        
+        def __repr__(self):
+            return (
+                f'<Change {self.id} {self.operation} {self.table_name}:{self.row_id}>'
+            )
+    
+    # Local fields need the zone database, so they are computed here rather than
+    # by a trigger
+    def set_local_fields(mapper, connection, session):
+        if not session.timezone:
+            session.timezone = server_timezone_name()
+        if session.start_time is not None:
+            for name, value in local_fields(
+                session.start_time, session.timezone
+            ).items():
+                setattr(session, name, value)
+    event.listen(Session, 'before_insert', set_local_fields)
+    event.listen(Session, 'before_update', set_local_fields)
+    
+    # Tables created by create_all() get their triggers right away
+    def install_triggers(target, connection, **kw):
+        install_change_triggers(connection)
+        install_category_triggers(connection)
+        install_session_total_triggers(connection)
+    event.listen(db.metadata, 'after_create', install_triggers)
     
-    return Project, Session, Break
+    return Project, Session, Category, Break, Commit, IdempotencyKey, Change
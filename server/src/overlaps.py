@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Session overlap helpers for Universal Time Tracker
+Sort-and-sweep detection of overlapping time intervals and clipping of a new
+session to the free time around existing ones.
+"""
+
+import heapq
+from datetime import datetime
+
+# What to do with a new session that overlaps existing ones
+OVERLAP_POLICIES = ('reject', 'clip', 'report')
+
+
+def _end(start, end):
+    """Open intervals (end None) run forever"""
+    return end if end is not None else datetime.max.replace(tzinfo=start.tzinfo)
+
+
+def _or_open(end):
+    """None for the end of an open interval"""
+    return None if end.replace(tzinfo=None) == datetime.max else end
+
+
+def find_overlaps(intervals):
+    """All pairs of overlapping intervals, found in one sort-and-sweep pass
+
+    ``intervals`` is an iterable of ``(key, start, end)`` tuples where a missing
+    ``end`` means the interval is still open. Intervals that merely touch
+    (one ends when the next starts) don't overlap. Sorting dominates, so n
+    intervals cost O(n log n) plus one step per overlapping pair found.
+
+    Returns ``(key_a, key_b, overlap_start, overlap_end)`` tuples with
+    ``key_a`` the interval that started first; ``overlap_end`` is None when
+    both intervals are open.
+    """
+    ordered = sorted(intervals, key=lambda interval: interval[1])
+
+    overlaps = []
+    active = []  # heap of (end, order, key, start)
+    for order, (key, start, end) in enumerate(ordered):
+        # Drop intervals that ended by the time this one starts
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+
+        end = _end(start, end)
+        for other_end, _, other_key, _ in active:
+            overlaps.append((other_key, key, start, _or_open(min(end, other_end))))
+        heapq.heappush(active, (end, order, key, start))
+
+    return overlaps
+
+
+def clip_interval(start, end, busy):
+    """The part of [start, end) before the first busy interval
+
+    Busy time at the start of the interval is skipped first. ``busy`` is an
+    iterable of ``(start, end)`` pairs (end None for open intervals). Returns
+    ``(start, end)`` of the free stretch, or None if no time at the start of
+    the interval is free.
+    """
+    end = _end(start, end)
+    for busy_start, busy_end in sorted(busy, key=lambda interval: interval[0]):
+        busy_end = _end(busy_start, busy_end)
+        if busy_end <= start:
+            continue
+        if busy_start <= start:
+            start = busy_end
+        else:
+            end = min(end, busy_start)
+            break
+        if start >= end:
+            return None
+    if start >= end:
+        return None
+    return start, _or_open(end)
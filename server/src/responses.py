@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Response helpers for Universal Time Tracker
+Compression, fast JSON encoding and compact columnar payloads
+"""
+
+import gzip
+from datetime import date
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+# Optional accelerators - the server works without them
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/javascript',
+    'text/css',
+    'text/csv',
+    'text/html',
+    'text/plain',
+}
+
+COLUMNAR_MIMETYPE = 'application/vnd.timetracker.columnar+json'
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Compact JSON provider that uses orjson when it is installed"""
+
+    compact = True
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and 'indent' not in kwargs:
+            try:
+                return orjson.dumps(
+                    obj,
+                    default=self.default,
+                    option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+                ).decode('utf-8')
+            except TypeError:
+                # Fall back to the stdlib encoder for anything orjson rejects
+                pass
+        return super().dumps(obj, **kwargs)
+
+
+def wants_columnar():
+    """Check whether the client asked for the columnar encoding"""
+    if request.args.get('format') == 'columnar':
+        return True
+    return request.accept_mimetypes.best == COLUMNAR_MIMETYPE
+
+
+def columnar(records, fields):
+    """Convert a list of dicts into parallel arrays keyed by field name"""
+    return {field: [record.get(field) for record in records] for field in fields}
+
+
+def json_value(value):
+    """A column value as it goes into a response; dates and datetimes as ISO 8601"""
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def serialize_rows(rows, fields, as_columns=False):
+    """Serialize selected rows (tuples in `fields` order) without building model objects
+
+    Returns a list of dicts, or parallel arrays keyed by field name when
+    `as_columns` is set (see wants_columnar).
+    """
+    if as_columns:
+        columns = list(zip(*rows)) or [()] * len(fields)
+        return {
+            field: [json_value(value) for value in column]
+            for field, column in zip(fields, columns)
+        }
+    return [
+        {field: json_value(value) for field, value in zip(fields, row)} for row in rows
+    ]
+
+
+def _choose_encoding():
+    """Pick the best response encoding the client accepts"""
+    accepted = request.accept_encodings
+    br_quality = accepted['br'] if brotli is not None else 0
+    gzip_quality = accepted['gzip']
+    if br_quality and br_quality >= gzip_quality:
+        return 'br'
+    if gzip_quality:
+        return 'gzip'
+    return None
+
+
+def compress_response(response, min_size, level):
+    """Compress a response body in place if the client supports it"""
+    if (response.direct_passthrough or response.is_streamed
+            or not 200 <= response.status_code < 300
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = _choose_encoding()
+    if encoding == 'br':
+        response.set_data(brotli.compress(data, quality=min(level, 11)))
+    elif encoding == 'gzip':
+        response.set_data(gzip.compress(data, compresslevel=level))
+    else:
+        return response
+
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_responses(app):
+    """Install the fast JSON provider and response compression on an app"""
+    app.json = FastJSONProvider(app)
+
+    @app.after_request
+    def compress(response):
+        if not app.config.get('COMPRESS_RESPONSES', True):
+            return response
+        return compress_response(
+            response,
+            app.config.get('COMPRESS_MIN_SIZE', 1024),
+            app.config.get('COMPRESS_LEVEL', 6)
+        )
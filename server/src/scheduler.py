@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Background job scheduler for Universal Time Tracker
+Runs periodic maintenance jobs (backups and the like) on one daemon thread.
+"""
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Scheduler:
+    """Run registered jobs at fixed intervals on a background thread"""
+
+    def __init__(self):
+        self.jobs = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_job(self, name, interval_seconds, func, run_immediately=False):
+        """Register `func` to run every `interval_seconds`"""
+        first_run = time.monotonic() + (0 if run_immediately else interval_seconds)
+        self.jobs.append(
+            {
+                'name': name,
+                'interval': interval_seconds,
+                'func': func,
+                'next_run': first_run,
+            }
+        )
+
+    def start(self):
+        if self._thread or not self.jobs:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name='timetracker-scheduler', daemon=True
+        )
+        self._thread.start()
+        names = ', '.join(job['name'] for job in self.jobs)
+        logger.info(f"Scheduler started with jobs: {names}")
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run_pending(self):
+        """Run every job that is due; a failing job is logged and retried next time"""
+        now = time.monotonic()
+        for job in self.jobs:
+            if job['next_run'] > now:
+                continue
+            job['next_run'] = now + job['interval']
+            try:
+                job['func']()
+            except Exception:
+                logger.exception(f"Scheduled job {job['name']} failed")
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.run_pending()
+            next_run = min(job['next_run'] for job in self.jobs)
+            self._stop.wait(max(0.1, next_run - time.monotonic()))
@@ -0,0 +1,520 @@
+#!/usr/bin/env python3
+"""
+Schema upgrades for existing Universal Time Tracker databases
+New tables, columns and indexes declared on the models are added in place;
+every step is idempotent so it is safe to run on each server start.
+Databases from before timestamps were stored in UTC are converted once,
+taking their times to be in the server's zone.
+"""
+
+import json
+import logging
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.schema import CreateIndex
+
+from timezones import STORAGE_FORMAT, local_fields, server_timezone_name, to_utc, utcnow
+
+logger = logging.getLogger(__name__)
+
+# Tables whose inserts, updates and deletes are recorded in the changes table.
+# Triggers catch every writer - the API, the database browser and scripts alike.
+CHANGE_TRACKED_TABLES = ('projects', 'sessions', 'breaks', 'commits', 'categories')
+
+CHANGE_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS trg_{table}_{operation}_change
+AFTER {event} ON {table}
+BEGIN
+    INSERT INTO changes (table_name, row_id, operation, changed_at)
+    VALUES ('{table}', {row}.id, '{operation}', strftime('%Y-%m-%d %H:%M:%f', 'now'));
+END
+"""
+
+
+# Whole minutes between two timestamps, matching the int(seconds / 60) used by the API
+# (rounded to milliseconds first, as julianday arithmetic is floating point)
+MINUTES_SQL = (
+    "CAST(ROUND((julianday({end}) - julianday({start})) * 86400000) AS INTEGER) / 60000"
+)
+
+# Net worked minutes of a closed session: its length less {breaks}, its break minutes
+NET_MINUTES_SQL = ("CASE WHEN {row}end_time IS NULL THEN NULL ELSE MAX(0, "
+                   + MINUTES_SQL.format(start='{row}start_time', end='{row}end_time')
+                   + " - {breaks}) END")
+# Minutes of a session's finished breaks, each clamped to the session (whose end an
+# open session doesn't have yet), as the maintenance repair clamps them. A break's
+# stored duration counts unless the part of it inside the session is shorter.
+CLAMPED_BREAK_MINUTES_SQL = MINUTES_SQL.format(
+    start='MAX(julianday(breaks.start_time), julianday({row}start_time))',
+    end=(
+        'MIN(julianday(breaks.end_time), '
+        'COALESCE(julianday({row}end_time), julianday(breaks.end_time)))'
+    ),
+)
+BREAK_MINUTES_SQL = (
+    "(SELECT COALESCE(SUM(MAX(0, MIN(COALESCE(breaks.duration_minutes, "
+    + CLAMPED_BREAK_MINUTES_SQL
+    + "), "
+    + CLAMPED_BREAK_MINUTES_SQL
+    + "))), 0) FROM breaks "
+    "WHERE breaks.session_id = {row}id AND breaks.end_time IS NOT NULL)"
+)
+
+# Sessions keep break_minutes, net_minutes and duration_minutes (= net_minutes)
+# current whenever a break or the session's times change, from any writer
+BREAK_TOTALS_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS trg_breaks_{operation}_session_totals
+AFTER {event} ON breaks
+BEGIN
+    UPDATE sessions SET break_minutes = {break_minutes} WHERE id IN ({session_ids});
+END
+"""
+SESSION_NET_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS trg_sessions_{operation}_net_minutes
+AFTER {event} ON sessions
+WHEN NEW.break_minutes IS NOT {new_breaks} OR NEW.net_minutes IS NOT ({new_net})
+     OR NEW.duration_minutes IS NOT ({new_net})
+BEGIN
+    UPDATE sessions
+    SET break_minutes = {breaks}, net_minutes = {net}, duration_minutes = {net}
+    WHERE id = NEW.id;
+END
+"""
+SESSION_TOTAL_TRIGGERS = (
+    'trg_breaks_insert_session_totals',
+    'trg_breaks_update_session_totals',
+    'trg_breaks_delete_session_totals',
+    'trg_sessions_insert_net_minutes',
+    'trg_sessions_update_net_minutes',
+)
+
+# Category names written to the legacy sessions.category column (by the database
+# browser or scripts) are moved into the categories table and category_id
+CATEGORY_NAME_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS trg_sessions_{operation}_category_name
+AFTER {event} ON sessions
+WHEN NEW.category IS NOT NULL
+BEGIN
+    INSERT OR IGNORE INTO categories (name, created_at)
+    VALUES (NEW.category, strftime('%Y-%m-%d %H:%M:%f', 'now'));
+    UPDATE sessions SET category = NULL,
+        category_id = (SELECT id FROM categories WHERE name = NEW.category)
+    WHERE id = NEW.id;
+END
+"""
+
+# Categories from the default .timecfg, and the names that resolve to them
+# (the .timecfg command aliases plus the historical consolidation mapping)
+DEFAULT_CATEGORIES = (
+    'development',
+    'research',
+    'documentation',
+    'meetings',
+    'testing',
+    'deployment',
+)
+DEFAULT_CATEGORY_ALIASES = {
+    'work': 'development',
+    'code': 'development',
+    'docs': 'documentation',
+    'meet': 'meetings',
+    'test': 'testing',
+    'Architecture': 'development',
+    'Design': 'development',
+    'Documentation': 'documentation',
+    'Planning': 'meetings',
+    'Research': 'research',
+    'architecture': 'development',
+    'design': 'development',
+    'frontend': 'development',
+    'planning': 'meetings',
+    'debugging': 'testing',
+    'meeting': 'meetings',
+    'other': 'development',
+}
+
+# Open sessions other than the most recently started one per project (or per
+# user); the unique indexes on open sessions allow only one
+EXTRA_OPEN_SESSIONS_SQL = """
+    SELECT s.id FROM sessions s
+    WHERE s.end_time IS NULL AND EXISTS (
+        SELECT 1 FROM sessions newer
+        WHERE newer.{column} = s.{column} AND newer.end_time IS NULL
+          AND (newer.start_time > s.start_time
+               OR (newer.start_time = s.start_time AND newer.id > s.id))
+    )
+"""
+# Extra open sessions end when the next session (per project or user) started
+CLOSE_EXTRA_OPEN_SESSIONS_SQL = """
+    UPDATE sessions SET end_time = (
+        SELECT MIN(newer.start_time) FROM sessions newer
+        WHERE newer.{column} = sessions.{column}
+          AND (newer.start_time > sessions.start_time
+               OR (newer.start_time = sessions.start_time AND newer.id > sessions.id))
+    )
+    WHERE id IN ({extra})
+"""
+
+# Timestamp columns written as naive local time before storage moved to UTC
+LOCAL_TIME_COLUMNS = {
+    'projects': ('created_at', 'last_activity'),
+    'sessions': ('start_time', 'end_time'),
+    'breaks': ('start_time', 'end_time'),
+    'commits': ('timestamp',),
+    'categories': ('created_at',),
+    'idempotency_keys': ('created_at',),
+    'changes': ('changed_at',),
+}
+
+
+def close_extra_open_sessions(conn, column):
+    """Leave at most one open session per project_id or userid
+
+    Returns the number of sessions closed.
+    """
+    extra = EXTRA_OPEN_SESSIONS_SQL.format(column=column)
+    return conn.execute(
+        text(CLOSE_EXTRA_OPEN_SESSIONS_SQL.format(column=column, extra=extra))
+    ).rowcount
+
+
+def install_open_session_index(conn, per_user):
+    """Allow one open session per user across projects, or drop that rule (idempotent)
+
+    One open session per project is always enforced by uq_sessions_open_project_id.
+    """
+    if not per_user:
+        conn.execute(text('DROP INDEX IF EXISTS uq_sessions_open_userid'))
+        return
+    closed = close_extra_open_sessions(conn, 'userid')
+    if closed:
+        logger.info(f"Closed {closed} extra open sessions before allowing one per user")
+    conn.execute(text('CREATE UNIQUE INDEX IF NOT EXISTS uq_sessions_open_userid '
+                      'ON sessions (userid) WHERE end_time IS NULL'))
+
+
+def install_change_triggers(conn):
+    """Create the triggers that feed the changes table (idempotent)"""
+    for table in CHANGE_TRACKED_TABLES:
+        for operation, row in (('insert', 'NEW'), ('update', 'NEW'), ('delete', 'OLD')):
+            conn.execute(text(CHANGE_TRIGGER.format(
+                table=table, operation=operation, event=operation.upper(), row=row
+            )))
+
+
+def install_category_triggers(conn):
+    """Create the triggers that normalize legacy category names (idempotent)"""
+    for operation, event in (('insert', 'INSERT'), ('update', 'UPDATE OF category')):
+        conn.execute(
+            text(CATEGORY_NAME_TRIGGER.format(operation=operation, event=event))
+        )
+
+
+def install_session_total_triggers(conn):
+    """Create the triggers that maintain session break and net totals (idempotent)"""
+    for operation, event, session_ids in (
+        ('insert', 'INSERT', 'NEW.session_id'),
+        (
+            'update',
+            'UPDATE OF session_id, start_time, end_time, duration_minutes',
+            'OLD.session_id, NEW.session_id',
+        ),
+        ('delete', 'DELETE', 'OLD.session_id'),
+    ):
+        conn.execute(text(BREAK_TOTALS_TRIGGER.format(
+            operation=operation, event=event, session_ids=session_ids,
+            break_minutes=BREAK_MINUTES_SQL.format(row='sessions.')
+        )))
+    # Session times decide how much of each break counts, so the net trigger
+    # recomputes the break total as well
+    new_breaks, breaks = BREAK_MINUTES_SQL.format(row='NEW.'), BREAK_MINUTES_SQL.format(
+        row='sessions.'
+    )
+    for operation, event in (
+        ('insert', 'INSERT'),
+        ('update', 'UPDATE OF start_time, end_time, break_minutes, duration_minutes'),
+    ):
+        conn.execute(text(SESSION_NET_TRIGGER.format(
+            operation=operation, event=event, new_breaks=new_breaks, breaks=breaks,
+            new_net=NET_MINUTES_SQL.format(row='NEW.', breaks=new_breaks),
+            net=NET_MINUTES_SQL.format(row='', breaks=breaks)
+        )))
+
+
+def drop_session_total_triggers(conn):
+    """Drop the session total triggers, to recreate them with a new definition"""
+    for trigger in SESSION_TOTAL_TRIGGERS:
+        conn.execute(text(f'DROP TRIGGER IF EXISTS {trigger}'))
+
+
+def _add_missing_columns(conn, table, existing_columns):
+    """Add columns declared on a model but missing from its table"""
+    for column in table.columns:
+        if column.name in existing_columns:
+            continue
+        column_type = column.type.compile(dialect=conn.dialect)
+        ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'
+        if column.server_default is not None:
+            default = column.server_default.arg
+            if isinstance(default, str):
+                default = "'" + default.replace("'", "''") + "'"
+            else:
+                default = default.text
+            ddl += f' DEFAULT {default}'
+        conn.execute(text(ddl))
+        logger.info(f"Added column {table.name}.{column.name}")
+
+
+def _migrate_legacy_commits(conn, commits_table, zone):
+    """Move commits stored as JSON on sessions into the commits table
+
+    Timestamps without an offset are taken to be in `zone`.
+    """
+    rows = conn.execute(
+        text(
+            "SELECT id, project_id, git_commits FROM sessions "
+            "WHERE git_commits IS NOT NULL AND git_commits != ''"
+        )
+    ).fetchall()
+    for session_id, project_id, raw_commits in rows:
+        try:
+            commits = json.loads(raw_commits)
+        except ValueError:
+            commits = []
+        values = [
+            {
+                'hash': commit['hash'][:40],
+                'project_id': project_id,
+                'session_id': session_id,
+                'timestamp': to_utc(datetime.fromisoformat(commit['timestamp']), zone),
+                'message': commit.get('message'),
+            }
+            for commit in commits
+            if isinstance(commit, dict)
+            and commit.get('hash')
+            and commit.get('timestamp')
+        ]
+        if values:
+            conn.execute(sqlite_insert(commits_table).on_conflict_do_nothing(), values)
+        conn.execute(
+            text('UPDATE sessions SET git_commits = NULL WHERE id = :id'),
+            {'id': session_id},
+        )
+    if rows:
+        logger.info(f"Migrated legacy git commits from {len(rows)} sessions")
+
+
+def _seed_categories(conn):
+    """Add the default categories and aliases; names already present are left alone"""
+    now = utcnow()
+    for name in DEFAULT_CATEGORIES:
+        conn.execute(
+            text(
+                'INSERT OR IGNORE INTO categories (name, created_at) '
+                'VALUES (:name, :now)'
+            ),
+            {'name': name, 'now': now},
+        )
+    for alias, name in DEFAULT_CATEGORY_ALIASES.items():
+        conn.execute(text(
+            'INSERT OR IGNORE INTO categories (name, canonical_id, created_at) '
+            'SELECT :alias, id, :now FROM categories WHERE name = :name'
+        ), {'alias': alias, 'name': name, 'now': now})
+
+
+def _backfill_session_totals(conn):
+    """Bring break_minutes and net_minutes up to date
+
+    Breaks are clamped to their sessions. Runs while the session total triggers
+    are dropped. duration_minutes is the net time from then on, as the triggers
+    keep it, so stored durations that differ (older sessions stored the full
+    length without breaks) are replaced and logged.
+    """
+    breaks = BREAK_MINUTES_SQL.format(row='sessions.')
+    net = NET_MINUTES_SQL.format(row='', breaks='break_minutes')
+    result = conn.execute(
+        text(
+            f'UPDATE sessions SET break_minutes = {breaks} '
+            f'WHERE break_minutes IS NOT {breaks}'
+        )
+    )
+    conn.execute(
+        text(
+            f'UPDATE sessions SET net_minutes = {net} WHERE net_minutes IS NOT ({net})'
+        )
+    )
+    if result.rowcount:
+        logger.info(f"Computed break and net minutes for {result.rowcount} sessions")
+    
+    # Rounding differences of a minute aren't worth a warning each
+    replaced = [
+        tuple(row)
+        for row in conn.execute(
+            text(
+                'SELECT id, duration_minutes, net_minutes FROM sessions '
+                'WHERE ABS(duration_minutes - net_minutes) > 1'
+            )
+        )
+    ]
+    result = conn.execute(
+        text(
+            'UPDATE sessions SET duration_minutes = net_minutes '
+            'WHERE duration_minutes IS NOT net_minutes'
+        )
+    )
+    if result.rowcount:
+        logger.info(f"Set duration to net minutes for {result.rowcount} sessions")
+    for session_id, stored, net_minutes in replaced:
+        logger.warning(
+            f"Session {session_id}: replaced stored duration {stored} "
+            f"with {net_minutes} net minutes"
+        )
+
+
+def _migrate_legacy_categories(conn):
+    """Move category names stored on sessions into the categories table"""
+    conn.execute(text(
+        'INSERT OR IGNORE INTO categories (name, created_at) '
+        'SELECT DISTINCT category, :now FROM sessions WHERE category IS NOT NULL'
+    ), {'now': utcnow()})
+    result = conn.execute(
+        text(
+            'UPDATE sessions SET category_id = '
+            '(SELECT id FROM categories WHERE name = sessions.category), '
+            'category = NULL WHERE category IS NOT NULL'
+        )
+    )
+    if result.rowcount:
+        logger.info(
+            f"Moved category names of {result.rowcount} sessions "
+            "to the categories table"
+        )
+
+
+def _stores_local_times(inspector):
+    """True for databases written before timestamps were stored in UTC"""
+    if not inspector.has_table('sessions'):
+        return False
+    return 'timezone' not in {
+        column['name'] for column in inspector.get_columns('sessions')
+    }
+
+
+def _convert_local_times_to_utc(conn, inspector, zone):
+    """Rewrite naive local timestamps as UTC, taking them to be in `zone`
+
+    Triggers are dropped first so the rewrite doesn't flood the change feed;
+    they are recreated (with UTC timestamps) by the rest of the upgrade.
+    """
+    triggers = (
+        conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'trigger'"))
+        .scalars()
+        .all()
+    )
+    for name in triggers:
+        conn.execute(text(f'DROP TRIGGER "{name}"'))
+
+    for table, columns in LOCAL_TIME_COLUMNS.items():
+        if not inspector.has_table(table):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table)}
+        columns = [column for column in columns if column in existing]
+        if not columns:
+            continue
+        updates = []
+        for row in conn.execute(
+            text(f"SELECT rowid, {', '.join(columns)} FROM {table}")
+        ):
+            values = {}
+            for column, value in zip(columns, row[1:]):
+                try:
+                    values[column] = (
+                        to_utc(datetime.fromisoformat(value), zone)
+                        .replace(tzinfo=None)
+                        .strftime(STORAGE_FORMAT)
+                    )
+                except (TypeError, ValueError):
+                    values[column] = value  # NULL or unparseable values are left alone
+            updates.append(dict(values, rowid=row[0]))
+        if updates:
+            assignments = ', '.join(f'{column} = :{column}' for column in columns)
+            conn.execute(
+                text(f'UPDATE {table} SET {assignments} WHERE rowid = :rowid'), updates
+            )
+            logger.info(f"Converted {len(updates)} {table} rows from {zone} to UTC")
+
+
+def _backfill_local_fields(conn, zone):
+    """Fill the time zone and local date, hour and week of older sessions
+
+    These are sessions recorded before the columns existed.
+    """
+    rows = conn.execute(
+        text(
+            'SELECT id, start_time, timezone FROM sessions '
+            'WHERE local_date IS NULL AND start_time IS NOT NULL'
+        )
+    ).fetchall()
+    updates = []
+    for session_id, start_time, session_zone in rows:
+        session_zone = session_zone or zone
+        try:
+            fields = local_fields(datetime.fromisoformat(start_time), session_zone)
+        except (TypeError, ValueError):
+            continue
+        updates.append(dict(fields, id=session_id, timezone=session_zone))
+    if updates:
+        conn.execute(text(
+            'UPDATE sessions SET timezone = :timezone, local_date = :local_date, '
+            'local_hour = :local_hour, iso_week = :iso_week WHERE id = :id'
+        ), updates)
+        logger.info(f"Computed local dates for {len(updates)} sessions")
+
+
+def upgrade_schema(db, open_session_scope='project'):
+    """Bring the database up to date with the current models
+
+    open_session_scope is 'project' (one open session per project) or 'user'
+    (one per user, across projects).
+    """
+    engine = db.engine
+    zone = server_timezone_name()
+
+    inspector = inspect(engine)
+    if _stores_local_times(inspector):
+        with engine.begin() as conn:
+            _convert_local_times_to_utc(conn, inspector, zone)
+
+    # New tables are created together with their indexes
+    db.metadata.create_all(engine)
+
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            existing_columns = {
+                column['name'] for column in inspector.get_columns(table.name)
+            }
+            _add_missing_columns(conn, table, existing_columns)
+            if table.name == 'sessions':
+                # The unique index on open sessions can't be built over duplicates
+                closed = close_extra_open_sessions(conn, 'project_id')
+                if closed:
+                    logger.info(
+                        f"Closed {closed} extra open sessions "
+                        "before allowing one per project"
+                    )
+            # IF NOT EXISTS rather than checkfirst, which can't see expression indexes
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+
+        _migrate_legacy_commits(conn, db.metadata.tables['commits'], zone)
+        _seed_categories(conn)
+        _migrate_legacy_categories(conn)
+        install_category_triggers(conn)
+        drop_session_total_triggers(conn)
+        _backfill_session_totals(conn)
+        install_session_total_triggers(conn)
+        _backfill_local_fields(conn, zone)
+        install_open_session_index(conn, open_session_scope == 'user')
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Columnar in-memory session store for Universal Time Tracker
+Analytics read a handful of fields from many sessions. Rather than building
+an ORM object per session on every request, the store keeps those fields in
+parallel typed arrays (under 50 bytes a session) and answers analytics
+queries by scanning them. It is loaded once, then kept current from the
+change feed, so writes from any worker process or script are picked up.
+Snapshots of the arrays let a restarted server skip the full load.
+"""
+
+import json
+import logging
+import mmap
+import os
+import sys
+import threading
+from array import array
+from bisect import bisect_left, insort
+from collections import defaultdict, namedtuple
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+# Stands in for NULL (open sessions, no category) in the integer columns
+MISSING = -1
+
+EPOCH_DAY = date(1970, 1, 1)
+
+# Column name -> array typecode
+COLUMNS = {
+    'id': 'q',
+    'project_id': 'i',
+    'user': 'i',           # index into SessionStore.users
+    'category_id': 'i',
+    'start': 'q',          # UTC epoch seconds
+    'end': 'q',            # UTC epoch seconds, MISSING while open
+    'net_minutes': 'i',
+    'local_day': 'i',      # the start's local date, in days since 1970-01-01
+    'local_hour': 'b',
+    'zone': 'h',           # index into SessionStore.zones
+}
+
+SESSIONS_SQL = """
+    SELECT id, project_id, userid, COALESCE(category_id, -1),
+           COALESCE(CAST(strftime('%s', start_time) AS INTEGER), 0),
+           COALESCE(CAST(strftime('%s', end_time) AS INTEGER), -1),
+           COALESCE(net_minutes, 0),
+           COALESCE(CAST(julianday(local_date) - 2440587.5 AS INTEGER), -1),
+           COALESCE(local_hour, 0), timezone
+    FROM sessions
+"""
+
+# The fields of a session analytics use; `category` is the canonical name
+StoredSession = namedtuple('StoredSession', [
+    'id', 'project_id', 'userid', 'category', 'start_time', 'end_time',
+    'net_minutes', 'local_date', 'local_hour', 'timezone'
+])
+
+
+def _epoch(value):
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def _day(value):
+    return (value - EPOCH_DAY).days
+
+
+class SessionStore:
+    """Sessions held as parallel arrays, one column per field
+
+    Rows keep their position for life; a deleted session leaves a row with
+    project_id MISSING behind until the next full load. Each project has a
+    list of its rows' positions, in id order, so a query only scans the
+    project it's about.
+    """
+
+    def __init__(self):
+        self.cursor = None  # id of the last change applied; None until loaded
+        self.users = []
+        self.zones = []
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._columns = {name: array(typecode) for name, typecode in COLUMNS.items()}
+        self._positions = {}   # session id -> row
+        self._by_project = defaultdict(lambda: array('i'))
+        self._user_index = {userid: index for index, userid in enumerate(self.users)}
+        self._zone_index = {zone: index for index, zone in enumerate(self.zones)}
+
+    def __len__(self):
+        return len(self._positions)
+
+    def _intern(self, values, index, value):
+        if value not in index:
+            index[value] = len(values)
+            values.append(value)
+        return index[value]
+
+    def _store_row(self, row):
+        (
+            session_id,
+            project_id,
+            userid,
+            category_id,
+            start,
+            end,
+            net_minutes,
+            local_day,
+            local_hour,
+            zone,
+        ) = row
+        values = {
+            'id': session_id,
+            'project_id': project_id,
+            'user': self._intern(self.users, self._user_index, userid),
+            'category_id': category_id,
+            'start': start,
+            'end': end,
+            'net_minutes': net_minutes,
+            'local_day': local_day,
+            'local_hour': local_hour,
+            'zone': self._intern(self.zones, self._zone_index, zone or 'UTC'),
+        }
+        position = self._positions.get(session_id)
+        if position is None:
+            position = self._positions[session_id] = len(self._columns['id'])
+            for name, value in values.items():
+                self._columns[name].append(value)
+            insort(self._by_project[project_id], position)
+            return
+
+        old_project_id = self._columns['project_id'][position]
+        if old_project_id != project_id:
+            self._unindex(old_project_id, position)
+            insort(self._by_project[project_id], position)
+        for name, value in values.items():
+            self._columns[name][position] = value
+
+    def _unindex(self, project_id, position):
+        positions = self._by_project[project_id]
+        index = bisect_left(positions, position)
+        if index < len(positions) and positions[index] == position:
+            del positions[index]
+
+    def _delete_row(self, session_id):
+        position = self._positions.pop(session_id, None)
+        if position is not None:
+            self._unindex(self._columns['project_id'][position], position)
+            self._columns['project_id'][position] = MISSING
+
+    def sync(self, conn):
+        """Apply the changes to sessions made since the last sync
+
+        Returns the number of sessions reloaded. `conn` is a SQLAlchemy
+        connection. The first sync (or one after the change feed went backwards,
+        as after restoring a backup) loads every session.
+        """
+        with self._lock:
+            latest = conn.execute(
+                text('SELECT COALESCE(MAX(id), 0) FROM changes')
+            ).scalar()
+            if self.cursor is None or latest < self.cursor:
+                self._reset()
+                for row in conn.execute(text(SESSIONS_SQL + ' ORDER BY id')):
+                    self._store_row(tuple(row))
+                self.cursor = latest
+                logger.info(f"Loaded {len(self)} sessions into the session store")
+                return len(self)
+            if latest == self.cursor:
+                return 0
+
+            session_ids = sorted(
+                {
+                    row_id
+                    for (row_id,) in conn.execute(
+                        text(
+                            "SELECT row_id FROM changes WHERE id > :cursor "
+                            "AND id <= :latest AND table_name = 'sessions'"
+                        ),
+                        {'cursor': self.cursor, 'latest': latest},
+                    )
+                }
+            )
+            for offset in range(0, len(session_ids), 500):
+                chunk = session_ids[offset:offset + 500]
+                found = set()
+                for row in conn.execute(
+                    text(
+                        SESSIONS_SQL
+                        + ' WHERE id IN (%s) ORDER BY id'
+                        % ', '.join(str(int(session_id)) for session_id in chunk)
+                    )
+                ):
+                    self._store_row(tuple(row))
+                    found.add(row[0])
+                for session_id in chunk:
+                    if session_id not in found:
+                        self._delete_row(session_id)
+            self.cursor = latest
+            return len(session_ids)
+
+    def select(
+        self,
+        project_id,
+        since=None,
+        user=None,
+        from_date=None,
+        to_date=None,
+        closed=True,
+    ):
+        """Rows of a project's sessions
+
+        Optionally only those started since a UTC datetime, by one user, or on
+        local dates in [from_date, to_date]; by default only closed ones.
+        """
+        with self._lock:
+            if user is not None and user not in self._user_index:
+                return []
+            columns = self._columns
+            positions = self._by_project.get(project_id, array('i'))
+            # One pass per condition, narrowing the rows as it goes
+            if since is not None:
+                start, since = columns['start'], _epoch(since)
+                positions = [
+                    position for position in positions if start[position] >= since
+                ]
+            if from_date is not None or to_date is not None:
+                local_day = columns['local_day']
+                first = _day(from_date) if from_date is not None else -sys.maxsize
+                last = _day(to_date) if to_date is not None else sys.maxsize
+                positions = [
+                    position
+                    for position in positions
+                    if first <= local_day[position] <= last
+                ]
+            if closed:
+                end = columns['end']
+                positions = [
+                    position for position in positions if end[position] != MISSING
+                ]
+            if user is not None:
+                users, user_index = columns['user'], self._user_index[user]
+                positions = [
+                    position for position in positions if users[position] == user_index
+                ]
+            return list(positions)
+
+    def totals(self, positions, *keys):
+        """Session count and net minutes of some rows, grouped on columns
+
+        Returns {key tuple: (sessions, net_minutes)}; a local_day key is
+        given as an ISO date and MISSING as None.
+        """
+        with self._lock:
+            key_columns = [self._columns[key] for key in keys]
+            net_minutes = self._columns['net_minutes']
+            grouped = defaultdict(lambda: [0, 0])
+            for position in positions:
+                totals = grouped[tuple(column[position] for column in key_columns)]
+                totals[0] += 1
+                totals[1] += net_minutes[position]
+
+        def convert(key, value):
+            if value == MISSING:
+                return None
+            if key == 'local_day':
+                return (EPOCH_DAY + timedelta(days=value)).isoformat()
+            return value
+        return {
+            tuple(convert(key, value) for key, value in zip(keys, group)): tuple(totals)
+            for group, totals in grouped.items()
+        }
+
+    def sessions(self, positions, category_names=None):
+        """Rows as StoredSession tuples, with category ids named from category_names"""
+        category_names = category_names or {}
+        with self._lock:
+            c = self._columns
+            return [
+                StoredSession(
+                    id=c['id'][position],
+                    project_id=c['project_id'][position],
+                    userid=self.users[c['user'][position]],
+                    category=category_names.get(c['category_id'][position]),
+                    start_time=datetime.fromtimestamp(
+                        c['start'][position], timezone.utc
+                    ),
+                    end_time=(
+                        datetime.fromtimestamp(c['end'][position], timezone.utc)
+                        if c['end'][position] != MISSING
+                        else None
+                    ),
+                    net_minutes=c['net_minutes'][position],
+                    local_date=(
+                        EPOCH_DAY + timedelta(days=c['local_day'][position])
+                    ).isoformat(),
+                    local_hour=c['local_hour'][position],
+                    timezone=self.zones[c['zone'][position]],
+                )
+                for position in positions
+            ]
+
+    def save_snapshot(self, path, database):
+        """Write the arrays to path (atomically), tagged with their database"""
+        with self._lock:
+            if self.cursor is None:
+                return False
+            header = {
+                'version': SNAPSHOT_VERSION,
+                'database': os.path.realpath(database),
+                'cursor': self.cursor,
+                'rows': len(self._columns['id']),
+                'byteorder': sys.byteorder,
+                'columns': {
+                    name: [column.typecode, column.itemsize]
+                    for name, column in self._columns.items()
+                },
+                'users': self.users,
+                'zones': self.zones,
+            }
+            temp_path = f'{path}.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(json.dumps(header).encode() + b'\n')
+                for column in self._columns.values():
+                    column.tofile(f)
+            os.replace(temp_path, path)
+        logger.info(f"Saved session store snapshot ({header['rows']} rows) to {path}")
+        return True
+
+    def load_snapshot(self, path, database):
+        """Load the arrays from a snapshot of the same database
+
+        Returns False if there is no snapshot to use. The next sync() applies
+        the changes made since the snapshot was taken.
+        """
+        if not os.path.exists(path):
+            return False
+        with self._lock, open(path, 'rb') as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ
+        ) as data:
+            header_end = data.find(b'\n')
+            try:
+                header = json.loads(data[:header_end])
+            except ValueError:
+                header = {}
+            expected = {
+                name: [typecode, array(typecode).itemsize]
+                for name, typecode in COLUMNS.items()
+            }
+            if (
+                header.get('version') != SNAPSHOT_VERSION
+                or header.get('byteorder') != sys.byteorder
+                or header.get('database') != os.path.realpath(database)
+                or header.get('columns') != expected
+            ):
+                logger.info(
+                    f"Ignoring session store snapshot {path}: "
+                    "taken of another database or format"
+                )
+                return False
+
+            self.users, self.zones = header['users'], header['zones']
+            self._reset()
+            offset, rows = header_end + 1, header['rows']
+            for name, column in self._columns.items():
+                size = rows * column.itemsize
+                column.frombytes(data[offset:offset + size])
+                offset += size
+
+            project_ids = self._columns['project_id']
+            for position, session_id in enumerate(self._columns['id']):
+                if project_ids[position] != MISSING:
+                    self._positions[session_id] = position
+                    self._by_project[project_ids[position]].append(position)
+            self.cursor = header['cursor']
+        logger.info(f"Loaded session store snapshot ({rows} rows) from {path}")
+        return True
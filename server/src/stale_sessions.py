@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Stale session cleanup for Universal Time Tracker
+Closes sessions left running (a forgotten `tt stop`) once they have shown no
+activity for a while, so their ever-growing open time stops skewing reports.
+A session is closed shortly after its last sign of activity: its start, a
+break starting or ending, or a commit.
+"""
+
+import logging
+import sqlite3
+from datetime import datetime, timedelta
+
+from timezones import STORAGE_FORMAT, utcnow
+
+logger = logging.getLogger(__name__)
+
+# Work assumed to have gone on after the last sign of activity
+DEFAULT_GRACE_MINUTES = 15
+
+# Open sessions idle since before a cutoff, found through the partial index on
+# open sessions (ix_sessions_open_last_seen_at), with their latest activity
+STALE_SESSIONS_SQL = """
+    SELECT s.id, s.project_id, s.userid, s.start_time, s.last_seen_at,
+           (SELECT MAX(timestamp) FROM commits WHERE session_id = s.id) AS last_commit,
+           (SELECT MAX(COALESCE(end_time, start_time)) FROM breaks
+            WHERE session_id = s.id) AS last_break,
+           (SELECT MIN(start_time) FROM breaks
+            WHERE session_id = s.id AND end_time IS NULL) AS open_break
+    FROM sessions s
+    WHERE s.end_time IS NULL AND COALESCE(s.last_seen_at, s.start_time) < ?
+"""
+
+
+def _parse(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def _format(value):
+    return value.strftime(STORAGE_FORMAT)
+
+
+def close_stale_sessions(
+    conn, idle_minutes, grace_minutes=DEFAULT_GRACE_MINUTES, now=None
+):
+    """Close open sessions with no activity in the last `idle_minutes`
+
+    All are closed in one transaction. Each session ends `grace_minutes` after
+    its last activity (or when its open break started, if it was left on a
+    break); open breaks end with it.
+    Returns one event dict per closed session. The closes also reach the
+    change feed through the usual triggers.
+    """
+    now = (now or utcnow()).replace(tzinfo=None)
+    cutoff = now - timedelta(minutes=idle_minutes)
+    grace = timedelta(minutes=min(grace_minutes, idle_minutes))
+
+    closed = []
+    with conn:
+        for row in conn.execute(STALE_SESSIONS_SQL, (_format(cutoff),)).fetchall():
+            start_time = _parse(row['start_time'])
+            open_break = _parse(row['open_break'])
+            last_activity = max(
+                value
+                for value in (
+                    start_time,
+                    _parse(row['last_seen_at']),
+                    _parse(row['last_commit']),
+                    _parse(row['last_break']),
+                )
+                if value is not None
+            )
+            if last_activity >= cutoff:
+                continue  # A commit or break newer than last_seen_at
+
+            if open_break is not None:
+                end_time = max(open_break, start_time)
+            else:
+                end_time = min(last_activity + grace, now)
+
+            # Breaks first, so the break total is current when the session closes
+            breaks = conn.execute(
+                'SELECT id, start_time FROM breaks '
+                'WHERE session_id = ? AND end_time IS NULL',
+                (row['id'],),
+            ).fetchall()
+            for break_row in breaks:
+                break_start = _parse(break_row['start_time'])
+                break_end = max(end_time, break_start)
+                conn.execute(
+                    'UPDATE breaks SET end_time = ?, duration_minutes = ? WHERE id = ?',
+                    (
+                        _format(break_end),
+                        int((break_end - break_start).total_seconds() / 60),
+                        break_row['id'],
+                    ),
+                )
+            # Database triggers recompute the session's break total and net duration
+            updated = conn.execute(
+                'UPDATE sessions SET end_time = ? WHERE id = ? AND end_time IS NULL',
+                (_format(end_time), row['id']),
+            ).rowcount
+            if not updated:
+                continue
+
+            closed.append({
+                'session_id': row['id'],
+                'project_id': row['project_id'],
+                'userid': row['userid'],
+                'start_time': start_time.isoformat(),
+                'end_time': end_time.isoformat(),
+                'last_activity': last_activity.isoformat(),
+                'breaks_closed': len(breaks)
+            })
+    return closed
+
+
+def run_stale_session_check(db_path, idle_minutes, grace_minutes=DEFAULT_GRACE_MINUTES):
+    """Close stale sessions in the database at db_path and log each one"""
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        closed = close_stale_sessions(conn, idle_minutes, grace_minutes)
+    finally:
+        conn.close()
+
+    for event in closed:
+        logger.info(
+            f"Auto-closed stale session {event['session_id']} of {event['userid']} "
+            f"at {event['end_time']} "
+            f"(last activity {event['last_activity']})"
+        )
+    return closed
@@ -12,7 +12,8 @@ def client():
     test_config = {
         'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
         'TESTING': True,
-        'SECRET_KEY': 'test-secret-key'
+        'SECRET_KEY': 'test-secret-key',
+        'TIMEZONE': 'UTC'
     }
     
     app = create_app(test_config)
@@ -167,4 +168,1706 @@ def test_api_ai_prompt_test_success(client):
     data = response.get_json()
     assert 'message' in data
     assert 'formatted_prompt' in data
-    assert 'sample_data' in data 
\ No newline at end of file
+    assert 'sample_data' in data
+
+
+def test_large_responses_are_gzip_compressed(client):
+    """Test that large JSON responses are compressed when the client accepts gzip"""
+    import gzip
+    import json
+    client.post(
+        '/api/v1/sessions/start',
+        json={'project': 'Heatmap Project', 'description': 'Work'},
+    )
+    response = client.get('/api/v1/analytics/heatmap?project=Heatmap%20Project',
+                          headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    data = json.loads(gzip.decompress(response.get_data()))
+    assert len(data['heatmap']) == 53
+
+
+def test_small_responses_are_not_compressed(client):
+    """Test that responses below the size threshold are sent uncompressed"""
+    response = client.get('/health', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_api_reports_columnar_format(client):
+    """Test the opt-in columnar encoding for reports"""
+    response = client.get('/api/v1/reports/month?format=columnar')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['format'] == 'columnar'
+    sessions = data['sessions']
+    assert set(sessions) == {'id', 'project', 'description', 'category',
+                             'start_time', 'end_time', 'duration_minutes'}
+    assert len(sessions['id']) == data['total_sessions']
+
+
+def test_api_reports_quarter_and_year_periods(client):
+    """Test that quarter and year periods are supported"""
+    for period in ['quarter', 'year']:
+        response = client.get(f'/api/v1/reports/{period}?include_sessions=false')
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['period'] == period
+        assert 'sessions' not in data
+
+
+def test_api_range_report_grouped(client):
+    """Test arbitrary-range reports grouped by day and category in SQL"""
+    sessions = [
+        ('2024-03-04T09:00:00', '2024-03-04T11:00:00', 'development'),
+        ('2024-03-04T13:00:00', '2024-03-04T14:00:00', 'testing'),
+        ('2024-03-05T09:00:00', '2024-03-05T09:30:00', 'development'),
+        ('2024-04-01T09:00:00', '2024-04-01T10:00:00', 'development'),
+    ]
+    for start, end, category in sessions:
+        client.post('/api/v1/sessions/create', json={
+            'project': 'Range Project', 'description': 'Backfill',
+            'category': category, 'start_time': start, 'end_time': end
+        })
+    
+    response = client.get(
+        '/api/v1/reports?from=2024-03-01&to=2024-03-31&group_by=day,category'
+    )
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['total_sessions'] == 3
+    assert data['total_hours'] == 3.5
+    assert 'sessions' not in data
+    assert data['groups'] == [
+        {'day': '2024-03-04', 'category': 'development', 'hours': 2.0, 'sessions': 1},
+        {'day': '2024-03-04', 'category': 'testing', 'hours': 1.0, 'sessions': 1},
+        {'day': '2024-03-05', 'category': 'development', 'hours': 0.5, 'sessions': 1},
+    ]
+    
+    response = client.get(
+        '/api/v1/reports?from=2024-03-01&to=2024-04-30&group_by=week,project'
+        '&include_sessions=true&limit=2'
+    )
+    data = response.get_json()
+    assert [g['week'] for g in data['groups']] == ['2024-03-04', '2024-04-01']
+    assert len(data['sessions']) == 2
+    assert data['pagination'] == {'limit': 2, 'offset': 0, 'total': 4}
+
+
+def test_api_range_report_invalid_parameters(client):
+    """Test validation of range report parameters"""
+    assert client.get('/api/v1/reports?to=2024-03-31').status_code == 400
+    assert (
+        client.get('/api/v1/reports?from=2024-03-31&to=2024-03-01').status_code == 400
+    )
+    assert (
+        client.get('/api/v1/reports?from=2024-03-01&group_by=minute').status_code == 400
+    )
+
+
+def test_user_id_resolved_once_per_process(client):
+    """Test that process identity lookups are cached"""
+    from app import get_user_id, resolve_process_user_id
+    resolve_process_user_id.cache_clear()
+    with client.application.test_request_context('/'):
+        first = get_user_id()
+        second = get_user_id()
+    assert first == second
+    assert resolve_process_user_id.cache_info().misses == 1
+
+
+def test_user_header_scopes_reports(client):
+    """Test that the user header is recorded on writes and scopes reads"""
+    for hour, user in [(9, 'alice'), (10, 'alice'), (9, 'bob')]:
+        client.post(
+            '/api/v1/sessions/create',
+            headers={'X-Time-Tracker-User': user},
+            json={
+                'project': 'Shared Project',
+                'description': f'{user} work',
+                'start_time': f'2024-05-06T{hour:02d}:00:00',
+                'end_time': f'2024-05-06T{hour + 1:02d}:00:00',
+            },
+        )
+    
+    response = client.get('/api/v1/reports?from=2024-05-01&to=2024-05-31',
+                          headers={'X-Time-Tracker-User': 'alice'})
+    assert response.get_json()['total_sessions'] == 2
+    
+    response = client.get('/api/v1/reports?from=2024-05-01&to=2024-05-31&user=bob')
+    assert response.get_json()['total_sessions'] == 1
+    
+    response = client.get('/api/v1/reports?from=2024-05-01&to=2024-05-31&group_by=user')
+    assert response.get_json()['groups'] == [
+        {'user': 'alice', 'hours': 2.0, 'sessions': 2},
+        {'user': 'bob', 'hours': 1.0, 'sessions': 1},
+    ]
+
+
+def test_user_scoped_indexes_exist(client):
+    """Test that user-scoped queries are backed by indexes"""
+    from sqlalchemy import inspect
+    indexes = {index['name'] for index in inspect(db.engine).get_indexes('sessions')}
+    assert 'ix_sessions_userid_start_time' in indexes
+
+
+def test_match_commits_to_sessions_sorted_merge():
+    """Test time-window attribution of commits to sessions"""
+    from datetime import datetime, timedelta
+    from commits import match_commits_to_sessions
+    day = datetime(2024, 1, 8)
+    sessions = [
+        (1, day.replace(hour=9), day.replace(hour=11)),
+        (2, day.replace(hour=13), day.replace(hour=15)),
+        (3, day.replace(hour=16), None),
+    ]
+    commits = [
+        ('a', day.replace(hour=10)),
+        ('b', day.replace(hour=11, minute=10)),  # within the grace period
+        ('c', day.replace(hour=12)),             # between sessions
+        ('d', day.replace(hour=14)),
+        ('e', day.replace(hour=23)),             # open session
+        ('f', day.replace(hour=8)),              # before any session
+    ]
+    matches = match_commits_to_sessions(commits, sessions, grace=timedelta(minutes=15))
+    assert matches == {'a': 1, 'b': 1, 'd': 2, 'e': 3}
+
+
+def test_api_commit_links_to_active_session(client):
+    """Test that linking a commit persists it in the commits table"""
+    client.post(
+        '/api/v1/sessions/start',
+        json={'project': 'Commit Project', 'description': 'Work'},
+    )
+    response = client.post(
+        '/api/v1/sessions/commit',
+        json={
+            'project': 'Commit Project',
+            'commit_hash': 'abcdef1234567890',
+            'commit_message': 'Fix bug',
+        },
+    )
+    assert response.status_code == 200
+    assert response.get_json()['commit_hash'] == 'abcdef12'
+    
+    data = client.get('/api/v1/commits?project=Commit%20Project').get_json()
+    assert data['total_commits'] == 1
+    assert data['commits'][0]['session_id'] == response.get_json()['session_id']
+
+
+def test_api_bulk_commits_import(client):
+    """Test bulk commit ingestion with session matching and de-duplication"""
+    client.post('/api/v1/sessions/create', json={
+        'project': 'History Project', 'description': 'Feature work',
+        'start_time': '2023-02-01T09:00:00', 'end_time': '2023-02-01T11:00:00'
+    })
+    commits = [
+        {
+            'hash': 'a' * 40,
+            'timestamp': '2023-02-01T09:30:00',
+            'message': 'Start feature',
+        },
+        {
+            'hash': 'b' * 40,
+            'timestamp': '2023-02-01T10:45:00',
+            'message': 'Finish feature',
+        },
+        {
+            'hash': 'c' * 40,
+            'timestamp': '2023-02-02T10:00:00',
+            'message': 'Untracked work',
+        },
+    ]
+    response = client.post(
+        '/api/v1/commits/bulk', json={'project': 'History Project', 'commits': commits}
+    )
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['inserted'] == 3
+    assert data['matched'] == 2
+    
+    response = client.post(
+        '/api/v1/commits/bulk', json={'project': 'History Project', 'commits': commits}
+    )
+    assert response.get_json()['inserted'] == 0
+    assert response.get_json()['duplicates'] == 3
+    
+    data = client.get(
+        '/api/v1/commits?project=History%20Project&from=2023-02-01&to=2023-02-01'
+    ).get_json()
+    assert data['total_commits'] == 2
+    assert [c['minutes'] for c in data['commits']] == [60.0, 60.0]
+    
+    # A backfilled session picks up the unmatched commit
+    client.post('/api/v1/sessions/create', json={
+        'project': 'History Project', 'description': 'Untracked work',
+        'start_time': '2023-02-02T09:00:00', 'end_time': '2023-02-02T10:30:00'
+    })
+    data = client.get('/api/v1/commits?project=History%20Project').get_json()
+    assert data['matched_commits'] == 3
+    
+    # Re-importing links a commit whose session was added without attributing it
+    late = [{'hash': 'd' * 40, 'timestamp': '2023-02-03T09:30:00', 'message': 'Late'}]
+    client.post(
+        '/api/v1/commits/bulk', json={'project': 'History Project', 'commits': late}
+    )
+    db.session.execute(
+        db.text(
+            "INSERT INTO sessions "
+            "(project_id, start_time, end_time, description, userid) "
+            "SELECT project_id, '2023-02-03 09:00:00.000000', "
+            "'2023-02-03 10:00:00.000000', 'Late', userid FROM sessions LIMIT 1"
+        )
+    )
+    db.session.commit()
+    data = client.post(
+        '/api/v1/commits/bulk',
+        json={'project': 'History Project', 'commits': commits + late},
+    ).get_json()
+    assert (data['inserted'], data['duplicates'], data['matched']) == (0, 4, 4)
+    data = client.get('/api/v1/commits?project=History%20Project').get_json()
+    assert data['matched_commits'] == 4
+
+
+def test_api_bulk_commits_invalid(client):
+    """Test bulk commit validation"""
+    assert client.post('/api/v1/commits/bulk', json={'project': 'X'}).status_code == 400
+    response = client.post(
+        '/api/v1/commits/bulk', json={'project': 'X', 'commits': [{'hash': 'abc'}]}
+    )
+    assert response.status_code == 400
+
+
+def test_api_replay_events_applied_once(client):
+    """Test that replayed offline events use client timestamps and are idempotent"""
+    events = [
+        {'id': 'evt-1', 'type': 'start', 'timestamp': '2023-03-01T09:00:00',
+         'payload': {'project': 'Offline Project', 'description': 'On the train'}},
+        {'id': 'evt-2', 'type': 'break', 'timestamp': '2023-03-01T10:00:00',
+         'payload': {'project': 'Offline Project', 'break_type': 'coffee'}},
+        {'id': 'evt-3', 'type': 'break', 'timestamp': '2023-03-01T10:15:00',
+         'payload': {'project': 'Offline Project'}},
+        {'id': 'evt-4', 'type': 'stop', 'timestamp': '2023-03-01T11:00:00',
+         'payload': {'project': 'Offline Project'}},
+    ]
+    response = client.post('/api/v1/sessions/replay', json={'events': events})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['applied'] == 4
+    assert [r['status'] for r in data['results']] == [200, 200, 200, 200]
+    stop = data['results'][-1]['body']
+    assert stop['start_time'] == '2023-03-01T09:00:00+00:00'
+    assert stop['duration_minutes'] == 105
+    
+    # Resending (e.g. after a lost response) does not apply anything twice
+    response = client.post('/api/v1/sessions/replay', json={'events': events})
+    data = response.get_json()
+    assert data['applied'] == 0
+    assert all(r['replayed'] for r in data['results'])
+    assert data['results'][-1]['body'] == stop
+    
+    # Order is by instant, not by the timestamp strings: 09:30-02:00 is after 10:00Z
+    response = client.post('/api/v1/sessions/replay', json={'events': [
+        {'id': 'evt-5', 'type': 'stop', 'timestamp': '2023-03-02T09:30:00-02:00',
+         'payload': {'project': 'Offline Project'}},
+        {'id': 'evt-6', 'type': 'start', 'timestamp': '2023-03-02T10:00:00Z',
+         'payload': {'project': 'Offline Project', 'description': 'Abroad'}},
+    ]})
+    assert [r['id'] for r in response.get_json()['results']] == ['evt-6', 'evt-5']
+    assert response.get_json()['results'][-1]['body']['duration_minutes'] == 90
+
+
+def test_api_replay_events_invalid(client):
+    """Test replay validation and per-event errors"""
+    assert client.post('/api/v1/sessions/replay', json={}).status_code == 400
+    response = client.post(
+        '/api/v1/sessions/replay', json={'events': [{'id': 'x', 'type': 'delete'}]}
+    )
+    assert response.status_code == 400
+    
+    response = client.post(
+        '/api/v1/sessions/replay',
+        json={
+            'events': [
+                {
+                    'id': 'evt-stop',
+                    'type': 'stop',
+                    'timestamp': '2023-03-01T11:00:00',
+                    'payload': {'project': 'Missing'},
+                }
+            ]
+        },
+    )
+    assert response.status_code == 200
+    assert response.get_json()['results'][0]['status'] == 404
+
+
+def test_api_status_batch_fixed_query_count(client):
+    """Test that batch status answers many projects with a fixed number of queries"""
+    from sqlalchemy import event
+    for i in range(6):
+        client.post(
+            '/api/v1/sessions/start',
+            json={'project': f'Repo {i}', 'description': f'Task {i}'},
+        )
+    client.post(
+        '/api/v1/sessions/break', json={'project': 'Repo 0', 'break_type': 'lunch'}
+    )
+    client.post('/api/v1/sessions/stop', json={'project': 'Repo 1'})
+    
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        response = client.get(
+            '/api/v1/sessions/status/batch?projects=Repo 0,Repo 1,Repo 2,Repo 5,Unknown'
+        )
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    
+    assert response.status_code == 200
+    statuses = {status['project']: status for status in response.get_json()['statuses']}
+    assert list(statuses) == ['Repo 0', 'Repo 1', 'Repo 2', 'Repo 5', 'Unknown']
+    assert statuses['Repo 0']['active_break']['type'] == 'lunch'
+    assert statuses['Repo 1']['active_session'] is None
+    assert statuses['Repo 1']['daily_summary']['sessions'] == 1
+    assert statuses['Repo 5']['active_session']['description'] == 'Task 5'
+    assert statuses['Unknown']['active_session'] is None
+    assert len(statements) == 4
+    
+    # Without names, all of the caller's projects are returned
+    response = client.post('/api/v1/sessions/status/batch', json={})
+    assert len(response.get_json()['statuses']) == 6
+
+
+def test_api_changes_feed(client):
+    """Test the change feed covers inserts, updates and deletes from every writer"""
+    data = client.get('/api/v1/changes').get_json()
+    assert data == {'changes': [], 'next_cursor': 0, 'has_more': False}
+    
+    session_id = client.post('/api/v1/sessions/start', json={
+        'project': 'Feed Project', 'description': 'Work'
+    }).get_json()['session_id']
+    data = client.get('/api/v1/changes').get_json()
+    assert [(c['table'], c['operation']) for c in data['changes']] == [
+        ('projects', 'insert'), ('categories', 'insert'), ('sessions', 'insert')]
+    cursor = data['next_cursor']
+    
+    client.post('/api/v1/sessions/stop', json={'project': 'Feed Project'})
+    data = client.get(f'/api/v1/changes?since={cursor}').get_json()
+    session_changes = [c for c in data['changes'] if c['table'] == 'sessions']
+    assert session_changes[0]['operation'] == 'update'
+    assert session_changes[0]['data']['end_time'] is not None
+    cursor = data['next_cursor']
+    
+    # Raw SQL writes (as the database browser does) are captured too
+    db.session.execute(
+        db.text('DELETE FROM sessions WHERE id = :id'), {'id': session_id}
+    )
+    db.session.commit()
+    data = client.get(f'/api/v1/changes?since={cursor}&limit=1').get_json()
+    assert data['changes'][0]['operation'] == 'delete'
+    assert data['changes'][0]['data'] is None
+    assert data['has_more'] is False
+    
+    assert client.get('/api/v1/changes?since=abc').status_code == 400
+
+
+def test_online_backup_verify_rotate_restore(tmp_path):
+    """Test stepped online backups with verification, rotation and restore"""
+    import sqlite3
+    from backup import backup_database, list_backups, restore_backup, verify_backup
+    db_path = str(tmp_path / 'live.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE sessions (id INTEGER PRIMARY KEY, description TEXT)')
+    conn.executemany(
+        'INSERT INTO sessions (description) VALUES (?)',
+        [(f'Session {i}' * 50,) for i in range(500)],
+    )
+    conn.commit()
+    
+    backup_dir = str(tmp_path / 'backups')
+    first = backup_database(db_path, backup_dir, keep=2, pages=4)
+    backup_database(db_path, backup_dir, keep=2, pages=4, compress=True)
+    latest = backup_database(db_path, backup_dir, keep=2, pages=4, compress=True)
+    assert list_backups(backup_dir) == [latest, list_backups(backup_dir)[1]]
+    assert first not in list_backups(backup_dir)
+    assert verify_backup(latest) is None
+    
+    conn.execute('DELETE FROM sessions')
+    conn.commit()
+    restore_backup(latest, db_path)
+    assert conn.execute('SELECT COUNT(*) FROM sessions').fetchone()[0] == 500
+    conn.close()
+    
+    damaged = tmp_path / 'backups' / 'timetracker-damaged.db'
+    damaged.write_bytes(b'not a database')
+    assert verify_backup(str(damaged))
+
+
+def test_scheduler_runs_due_jobs():
+    """Test that the scheduler runs due jobs and survives failing ones"""
+    from scheduler import Scheduler
+    runs = []
+    scheduler = Scheduler()
+    scheduler.add_job('ok', 3600, lambda: runs.append('ok'), run_immediately=True)
+    scheduler.add_job('broken', 3600, lambda: 1 / 0, run_immediately=True)
+    scheduler.add_job('later', 3600, lambda: runs.append('later'))
+    scheduler.run_pending()
+    scheduler.run_pending()
+    assert runs == ['ok']
+
+
+def test_maintenance_audit_and_repair(tmp_path):
+    """Test the set-based consistency audit, its repair and incremental vacuum"""
+    import sqlite3
+    from maintenance import audit, run_maintenance
+    db_path = str(tmp_path / 'maint.db')
+    conn = sqlite3.connect(db_path)
+    conn.executescript('''
+        CREATE TABLE projects (id INTEGER PRIMARY KEY, name TEXT);
+        CREATE TABLE sessions (id INTEGER PRIMARY KEY, project_id INTEGER,
+                               start_time TEXT, end_time TEXT,
+                               duration_minutes INTEGER);
+        CREATE TABLE breaks (id INTEGER PRIMARY KEY, session_id INTEGER,
+                             start_time TEXT, end_time TEXT,
+                             duration_minutes INTEGER);
+        INSERT INTO projects VALUES (1, 'P');
+        -- 2h session with a 30 minute break, stored without subtracting it
+        INSERT INTO sessions VALUES
+            (1, 1, '2024-01-08 09:00:00', '2024-01-08 11:00:00', 120);
+        INSERT INTO breaks VALUES
+            (1, 1, '2024-01-08 10:00:00', '2024-01-08 10:30:00', 30);
+        -- Break left open after its session ended
+        INSERT INTO sessions VALUES
+            (2, 1, '2024-01-08 12:00:00', '2024-01-08 13:00:00', 60);
+        INSERT INTO breaks VALUES (2, 2, '2024-01-08 12:50:00', NULL, NULL);
+        -- Two open sessions in one project
+        INSERT INTO sessions VALUES (3, 1, '2024-01-09 09:00:00', NULL, NULL);
+        INSERT INTO sessions VALUES (4, 1, '2024-01-09 10:00:00', NULL, NULL);
+        -- Orphans
+        INSERT INTO sessions VALUES
+            (5, 99, '2024-01-09 09:00:00', '2024-01-09 10:00:00', 60);
+        INSERT INTO breaks VALUES
+            (3, 42, '2024-01-09 09:00:00', '2024-01-09 09:10:00', 10);
+    ''')
+    conn.commit()
+    
+    issues = audit(conn)
+    assert issues == {
+        'duration_mismatch': [1],
+        'break_outside_session': [2],
+        'orphaned_session': [5],
+        'orphaned_break': [3],
+        'extra_open_session': [3],
+    }
+    
+    report = run_maintenance(db_path, fix=True, enable_incremental=True)
+    assert report['remaining_issues'] == {}
+    assert report['auto_vacuum'] == 'incremental'
+    sessions = dict(
+        conn.execute('SELECT id, duration_minutes FROM sessions').fetchall()
+    )
+    assert sessions == {1: 90, 2: 50, 3: 60, 4: None}
+    assert (
+        conn.execute('SELECT end_time FROM breaks WHERE id = 2').fetchone()[0]
+        == '2024-01-08 13:00:00'
+    )
+    conn.close()
+
+
+def test_api_categories_merge_and_rename(client):
+    """Test categories are merged and renamed without rewriting sessions"""
+    for hour, description, category in [
+        (9, 'Code', 'development'),
+        (10, 'Mockups', 'Design'),
+        (11, 'More mockups', 'Design'),
+    ]:
+        client.post(
+            '/api/v1/sessions/create',
+            json={
+                'project': 'Category Project',
+                'description': description,
+                'category': category,
+                'start_time': f'2024-03-04T{hour:02d}:00:00',
+                'end_time': f'2024-03-04T{hour + 1:02d}:00:00',
+            },
+        )
+    cursor = client.get('/api/v1/changes').get_json()['next_cursor']
+    
+    response = client.post(
+        '/api/v1/categories/Design/merge', json={'into': 'development'}
+    )
+    assert response.get_json() == {
+        'merged': 'Design',
+        'into': 'development',
+        'categories_updated': 1,
+    }
+    assert (
+        client.put(
+            '/api/v1/categories/development', json={'name': 'engineering'}
+        ).status_code
+        == 200
+    )
+    changes = client.get(f'/api/v1/changes?since={cursor}').get_json()['changes']
+    assert {change['table'] for change in changes} == {'categories'}
+    
+    report = client.get(
+        '/api/v1/reports?from=2024-03-04&to=2024-03-04'
+        '&project=Category Project&include_sessions=true'
+    ).get_json()
+    assert report['category_breakdown'] == {'engineering': 3.0}
+    assert {s['category'] for s in report['sessions']} == {'engineering'}
+    assert client.get('/api/v1/categories').get_json() == [
+        {'id': 1, 'name': 'engineering', 'aliases': ['Design'], 'sessions': 3}]
+    
+    assert (
+        client.post(
+            '/api/v1/categories/Design/merge', json={'into': 'engineering'}
+        ).status_code
+        == 400
+    )
+    assert (
+        client.put(
+            '/api/v1/categories/Design', json={'name': 'engineering'}
+        ).status_code
+        == 409
+    )
+    assert (
+        client.post(
+            '/api/v1/categories', json={'name': 'ops', 'aliases': ['Design']}
+        ).status_code
+        == 409
+    )
+
+
+def test_legacy_category_names_are_normalized(client):
+    """Test names written to sessions.category by raw SQL reach the categories table"""
+    session_id = client.post('/api/v1/sessions/start', json={
+        'project': 'Legacy Project', 'description': 'Work', 'category': 'research'
+    }).get_json()['session_id']
+    db.session.execute(
+        db.text("UPDATE sessions SET category = 'debugging' WHERE id = :id"),
+        {'id': session_id},
+    )
+    db.session.commit()
+    
+    row = db.session.execute(
+        db.text(
+            'SELECT s.category, c.name FROM sessions s '
+            'JOIN categories c ON c.id = s.category_id WHERE s.id = :id'
+        ),
+        {'id': session_id},
+    ).one()
+    assert tuple(row) == (None, 'debugging')
+    status = client.get('/api/v1/sessions/status?project=Legacy Project').get_json()
+    assert status['active_session']['category'] == 'debugging'
+
+
+def test_session_break_and_net_minutes_maintained(client):
+    """Test break totals and net minutes stay current across API and raw SQL writes"""
+    session_id = client.post('/api/v1/sessions/create', json={
+        'project': 'Net Project', 'description': 'Work',
+        'start_time': '2024-03-04T09:00:00', 'end_time': '2024-03-04T11:00:00'
+    }).get_json()['session_id']
+    
+    def totals():
+        return tuple(
+            db.session.execute(
+                db.text(
+                    'SELECT break_minutes, net_minutes, duration_minutes '
+                    'FROM sessions WHERE id = :id'
+                ),
+                {'id': session_id},
+            ).one()
+        )
+    assert totals() == (0, 120, 120)
+    
+    # Breaks added, edited and deleted directly, as the database browser does
+    db.session.execute(
+        db.text(
+            "INSERT INTO breaks "
+            "(session_id, start_time, end_time, duration_minutes, break_type) "
+            "VALUES (:id, '2024-03-04 10:00:00', '2024-03-04 10:30:00', 30, 'lunch')"
+        ),
+        {'id': session_id},
+    )
+    db.session.commit()
+    assert totals() == (30, 90, 90)
+    db.session.execute(
+        db.text(
+            "UPDATE sessions SET end_time = '2024-03-04 12:00:00', "
+            "duration_minutes = 180 WHERE id = :id"
+        ),
+        {'id': session_id},
+    )
+    db.session.commit()
+    assert totals() == (30, 150, 150)
+    
+    report = client.get(
+        '/api/v1/reports?from=2024-03-04&to=2024-03-04&project=Net Project'
+    ).get_json()
+    assert report['total_hours'] == 2.5
+    
+    db.session.execute(
+        db.text('DELETE FROM breaks WHERE session_id = :id'), {'id': session_id}
+    )
+    db.session.commit()
+    assert totals() == (0, 180, 180)
+
+
+def test_api_stop_subtracts_breaks(client):
+    """Test stopping a session uses the break total kept on the session"""
+    client.post(
+        '/api/v1/sessions/start',
+        json={
+            'project': 'Break Project',
+            'description': 'Work',
+            'timestamp': '2024-03-04T09:00:00',
+        },
+    )
+    client.post(
+        '/api/v1/sessions/break',
+        json={'project': 'Break Project', 'timestamp': '2024-03-04T10:00:00'},
+    )
+    client.post(
+        '/api/v1/sessions/break',
+        json={'project': 'Break Project', 'timestamp': '2024-03-04T10:15:00'},
+    )
+    data = client.post(
+        '/api/v1/sessions/stop',
+        json={'project': 'Break Project', 'timestamp': '2024-03-04T11:00:00'},
+    ).get_json()
+    assert (data['duration_minutes'], data['break_minutes']) == (105, 15)
+
+
+def test_breaks_clamped_and_durations_follow_net_minutes(tmp_path):
+    """Test breaks count only inside their session and durations are net minutes
+
+    Upgrades replace stored durations with the net minutes, and later edits that
+    don't change a session's times or breaks leave them alone.
+    """
+    import sqlite3
+    from app import init_database
+    db_path = str(tmp_path / 'legacy.db')
+    app = create_app(
+        {
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+            'TESTING': True,
+            'TIMEZONE': 'UTC',
+        }
+    )
+    init_database(app)
+    
+    # Sessions as older versions stored them: no totals, one duration with breaks
+    # subtracted and one without, and a break before its session started
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        DROP TRIGGER trg_breaks_insert_session_totals;
+        DROP TRIGGER trg_sessions_insert_net_minutes;
+        INSERT INTO projects (id, name, userid) VALUES (1, 'Legacy', 'alice');
+        INSERT INTO sessions (id, project_id, start_time, end_time,
+                              duration_minutes, description, userid) VALUES
+            (1, 1, '2025-06-23 11:40:26', '2025-06-23 11:55:23', 14, 'Short', 'alice'),
+            (2, 1, '2025-06-24 09:35:05', '2025-06-24 14:47:25', 312, 'Long', 'alice'),
+            (3, 1, '2025-06-25 09:00:00', '2025-06-25 10:00:00', 500, 'Wrong', 'alice');
+        INSERT INTO breaks (session_id, start_time, end_time, duration_minutes) VALUES
+            (1, '2025-06-23 11:19:00', '2025-06-23 11:24:20', 5),
+            (2, '2025-06-24 10:58:22', '2025-06-24 11:13:46', 15),
+            (2, '2025-06-24 11:27:59', '2025-06-24 13:44:03', 136);
+    """)
+    conn.commit()
+    init_database(app)
+    assert conn.execute(
+        'SELECT duration_minutes, break_minutes, net_minutes FROM sessions ORDER BY id'
+    ).fetchall() == [(14, 0, 14), (161, 151, 161), (60, 0, 60)]
+    
+    # Editing only the description, as the database browser does, rewrites
+    # the times unchanged
+    conn.execute(
+        "UPDATE sessions SET start_time = start_time, end_time = end_time, "
+        "description = 'Long day' WHERE id = 2"
+    )
+    conn.commit()
+    assert conn.execute(
+        'SELECT duration_minutes, break_minutes, net_minutes FROM sessions WHERE id = 2'
+    ).fetchone() == (161, 151, 161)
+    init_database(app)
+    assert conn.execute(
+        'SELECT duration_minutes FROM sessions ORDER BY id'
+    ).fetchall() == [(14,), (161,), (60,)]
+    
+    # Moving the start back brings the break inside the session
+    conn.execute("UPDATE sessions SET start_time = '2025-06-23 11:10:00' WHERE id = 1")
+    conn.commit()
+    assert conn.execute(
+        'SELECT break_minutes, net_minutes FROM sessions WHERE id = 1'
+    ).fetchone() == (5, 40)
+    conn.execute(
+        "INSERT INTO breaks (session_id, start_time, end_time, duration_minutes) "
+        "VALUES (1, '2025-06-23 11:50:00', '2025-06-23 12:10:00', 20)"
+    )
+    conn.commit()
+    assert conn.execute(
+        'SELECT break_minutes, net_minutes FROM sessions WHERE id = 1'
+    ).fetchone() == (10, 35)
+    conn.close()
+
+
+def test_audit_and_repair_agree_with_upgraded_durations(tmp_path):
+    """Test the maintenance audit and repair use the durations an upgrade stores"""
+    import sqlite3
+    from app import init_database
+    from maintenance import audit, repair
+    db_path = str(tmp_path / 'legacy.db')
+    app = create_app(
+        {
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+            'TESTING': True,
+            'TIMEZONE': 'UTC',
+        }
+    )
+    init_database(app)
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        DROP TRIGGER trg_breaks_insert_session_totals;
+        DROP TRIGGER trg_sessions_insert_net_minutes;
+        INSERT INTO projects (id, name, userid) VALUES (1, 'Legacy', 'alice');
+        INSERT INTO sessions (id, project_id, start_time, end_time,
+                              duration_minutes, description, userid) VALUES
+            (1, 1, '2025-06-23 11:40:26', '2025-06-23 11:55:23', 14, 'Short', 'alice'),
+            (2, 1, '2025-06-24 09:35:05', '2025-06-24 14:47:25', 312, 'Long', 'alice');
+        INSERT INTO breaks (session_id, start_time, end_time, duration_minutes) VALUES
+            (1, '2025-06-23 11:19:00', '2025-06-23 11:24:20', 5),
+            (2, '2025-06-24 10:58:22', '2025-06-24 11:13:46', 15),
+            (2, '2025-06-24 11:27:59', '2025-06-24 13:44:03', 136);
+    """)
+    conn.commit()
+    init_database(app)
+    
+    assert audit(conn) == {'break_outside_session': [1]}
+    repair(conn)
+    assert audit(conn) == {}
+    assert conn.execute(
+        'SELECT duration_minutes, net_minutes FROM sessions ORDER BY id'
+    ).fetchall() == [(14, 14), (161, 161)]
+    conn.close()
+
+
+def test_reports_group_by_local_day_of_each_user(client):
+    """Test sessions are stored in UTC and grouped on their user's local day and hour"""
+    # 00:30 in Berlin on the night clocks went forward is still 23:30 UTC the day before
+    berlin = client.post(
+        '/api/v1/sessions/create',
+        headers={'X-Time-Tracker-Timezone': 'Europe/Berlin'},
+        json={
+            'project': 'Zones',
+            'description': 'Late',
+            'start_time': '2024-03-31T00:30:00',
+            'end_time': '2024-03-31T03:30:00',
+        },
+    ).get_json()
+    assert berlin['start_time'] == '2024-03-30T23:30:00+00:00'
+    assert berlin['duration_minutes'] == 120  # 02:00-03:00 never happened
+    # 22:00 in Los Angeles is already the next day in UTC
+    client.post(
+        '/api/v1/sessions/create',
+        headers={'X-Time-Tracker-Timezone': 'America/Los_Angeles'},
+        json={
+            'project': 'Zones',
+            'description': 'Evening',
+            'start_time': '2024-03-30T22:00:00',
+            'end_time': '2024-03-30T23:00:00',
+        },
+    )
+    
+    report = client.get(
+        '/api/v1/reports?from=2024-03-30&to=2024-03-31&group_by=day,hour'
+    ).get_json()
+    assert [
+        (group['day'], group['hour'], group['hours']) for group in report['groups']
+    ] == [('2024-03-30', 22, 1.0), ('2024-03-31', 0, 2.0)]
+    report = client.get(
+        '/api/v1/reports?from=2024-03-25&to=2024-03-31&group_by=iso_week'
+    ).get_json()
+    assert report['groups'] == [{'iso_week': '2024-W13', 'hours': 3.0, 'sessions': 2}]
+    
+    response = client.get(
+        '/api/v1/reports/today', headers={'X-Time-Tracker-Timezone': 'Mars/Olympus'}
+    )
+    assert response.status_code == 400
+
+
+def test_legacy_local_times_converted_to_utc(tmp_path, monkeypatch):
+    """Test upgrading a database of naive local times converts them to UTC once"""
+    import sqlite3
+    from app import init_database
+    monkeypatch.setenv('TIME_TRACKER_TIMEZONE', 'America/New_York')
+    db_path = str(tmp_path / 'legacy.db')
+    conn = sqlite3.connect(db_path)
+    conn.executescript('''
+        CREATE TABLE projects (id INTEGER PRIMARY KEY, name TEXT, type TEXT,
+                               language TEXT, framework TEXT, path TEXT,
+                               git_remote TEXT, created_at DATETIME,
+                               last_activity DATETIME, parent_id INTEGER,
+                               userid TEXT NOT NULL);
+        CREATE TABLE sessions (id INTEGER PRIMARY KEY, project_id INTEGER NOT NULL,
+                               start_time DATETIME, end_time DATETIME,
+                               duration_minutes INTEGER, category TEXT,
+                               description TEXT NOT NULL, git_commits TEXT,
+                               userid TEXT NOT NULL);
+        INSERT INTO projects VALUES
+            (1, 'Old', 'development', NULL, NULL, NULL, NULL,
+             '2024-01-15 08:00:00.000000', '2024-07-01 22:30:00.000000', NULL,
+             'alice');
+        INSERT INTO sessions VALUES
+            (1, 1, '2024-07-01 21:30:00.000000', '2024-07-01 22:30:00.000000', 60,
+             'development', 'Evening', NULL, 'alice');
+    ''')
+    conn.commit()
+    conn.close()
+    
+    app = create_app(
+        {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}', 'TESTING': True}
+    )
+    init_database(app)
+    init_database(app)  # Already converted; nothing shifts again
+    
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('SELECT created_at FROM projects').fetchone() == (
+        '2024-01-15 13:00:00.000000',
+    )
+    assert conn.execute(
+        'SELECT start_time, end_time, net_minutes, timezone, local_date, local_hour, '
+        'iso_week FROM sessions'
+    ).fetchone() == (
+        '2024-07-02 01:30:00.000000',
+        '2024-07-02 02:30:00.000000',
+        60,
+        'America/New_York',
+        '2024-07-01',
+        21,
+        '2024-W27',
+    )
+    conn.close()
+
+
+def test_historical_session_overlaps_rejected_clipped_or_reported(client):
+    """Test overlapping historical sessions, across projects, by policy"""
+    def create(project, start, end, **options):
+        return client.post(
+            '/api/v1/sessions/create',
+            json=dict(
+                project=project,
+                description='Backfill',
+                start_time=f'2024-04-01T{start}',
+                end_time=f'2024-04-01T{end}',
+                **options,
+            ),
+        )
+    
+    assert create('Alpha', '09:00:00', '11:00:00').status_code == 200
+    assert (
+        create('Alpha', '11:00:00', '12:00:00').status_code == 200
+    )  # Touching is fine
+    response = create('Beta', '10:30:00', '13:00:00')
+    assert response.status_code == 409
+    assert [overlap['project'] for overlap in response.get_json()['overlaps']] == [
+        'Alpha',
+        'Alpha',
+    ]
+    assert (
+        create('Beta', '10:30:00', '13:00:00', overlap_scope='project').status_code
+        == 200
+    )
+    
+    data = create('Gamma', '11:30:00', '14:00:00', on_overlap='clip').get_json()
+    assert (data['start_time'], data['end_time'], data['clipped']) == (
+        '2024-04-01T13:00:00+00:00', '2024-04-01T14:00:00+00:00', True)
+    assert create('Gamma', '10:00:00', '11:00:00', on_overlap='clip').status_code == 409
+    data = create('Gamma', '10:00:00', '11:00:00', on_overlap='report').get_json()
+    assert len(data['overlaps']) == 2 and data['clipped'] is False
+    
+    audit = client.get('/api/v1/sessions/overlaps').get_json()
+    assert audit['sessions_checked'] == 5
+    assert sorted(overlap['overlap_minutes'] for overlap in audit['overlaps']) == [
+        30,
+        30,
+        60,
+        60,
+    ]
+    
+    # Proposed sessions are checked against stored ones and each other
+    check = client.post('/api/v1/sessions/overlaps', json={'sessions': [
+        {'start_time': '2024-04-01T15:00:00', 'end_time': '2024-04-01T16:00:00'},
+        {'start_time': '2024-04-01T15:30:00', 'end_time': '2024-04-01T17:00:00'},
+        {'start_time': '2024-04-01T13:30:00', 'end_time': '2024-04-01T14:30:00'},
+        {'start_time': '2024-04-02T09:00:00'},
+    ]}).get_json()
+    assert check['checked'] == 4
+    assert [
+        (c['index'], [s['project'] for s in c['sessions']], c['proposed'])
+        for c in check['conflicts']
+    ] == [(0, [], [1]), (1, [], [0]), (2, ['Gamma'], [])]
+
+
+def test_find_overlaps_sweep():
+    """Test the sort-and-sweep pass reports each overlapping pair once"""
+    from datetime import datetime
+    from overlaps import clip_interval, find_overlaps
+
+    def day(hour):
+        return datetime(2024, 4, 1, hour)
+
+    intervals = [
+        ('c', day(12), None),
+        ('a', day(9), day(11)),
+        ('b', day(10), day(13)),
+        ('d', day(11), day(12)),
+    ]
+    assert find_overlaps(intervals) == [
+        ('a', 'b', day(10), day(11)),
+        ('b', 'd', day(11), day(12)),
+        ('b', 'c', day(12), day(13)),
+    ]
+    assert clip_interval(day(10), day(15), [(day(9), day(11)), (day(13), None)]) == (
+        day(11),
+        day(13),
+    )
+    assert clip_interval(day(13), None, [(day(12), None)]) is None
+
+
+def test_stale_sessions_closed_after_last_activity(tmp_path):
+    """Test forgotten sessions are closed shortly after their last activity"""
+    import sqlite3
+    from datetime import datetime
+    from app import init_database
+    from stale_sessions import close_stale_sessions
+    db_path = str(tmp_path / 'stale.db')
+    app = create_app(
+        {
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+            'TESTING': True,
+            'TIMEZONE': 'UTC',
+        }
+    )
+    init_database(app)
+    client = app.test_client()
+    
+    def post(path, project, timestamp, **data):
+        return client.post(
+            f'/api/v1/sessions/{path}',
+            json=dict(project=project, timestamp=timestamp, **data),
+        )
+    
+    # Last seen at a commit, left on a break, and still in use
+    post('start', 'Committed', '2024-01-08T09:00:00', description='Work')
+    post(
+        'commit',
+        'Committed',
+        '2024-01-08T11:00:00',
+        commit_hash='a' * 40,
+        commit_message='Fix',
+    )
+    post('start', 'On break', '2024-01-08T09:00:00', description='Work')
+    post('break', 'On break', '2024-01-08T10:00:00')
+    post('start', 'Current', '2024-01-09T07:00:00', description='Work')
+    
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    closed = close_stale_sessions(
+        conn, idle_minutes=12 * 60, now=datetime(2024, 1, 9, 8)
+    )
+    assert sorted(
+        (event['session_id'], event['end_time'], event['breaks_closed'])
+        for event in closed
+    ) == [(1, '2024-01-08T11:15:00', 0), (2, '2024-01-08T10:00:00', 1)]
+    rows = conn.execute(
+        'SELECT id, duration_minutes, end_time IS NULL FROM sessions ORDER BY id'
+    ).fetchall()
+    assert [tuple(row) for row in rows] == [(1, 135, 0), (2, 60, 0), (3, None, 1)]
+    assert (
+        close_stale_sessions(conn, idle_minutes=12 * 60, now=datetime(2024, 1, 9, 8))
+        == []
+    )
+    conn.close()
+
+
+def test_project_upsert_keeps_unsent_fields(client):
+    """Test projects are created or updated in one statement"""
+    response = client.post(
+        '/api/v1/projects', json={'name': 'Upserted', 'language': 'python'}
+    )
+    assert response.get_json()['message'] == 'Project created successfully'
+    response = client.post(
+        '/api/v1/projects', json={'name': 'Upserted', 'framework': 'flask'}
+    )
+    assert response.get_json()['message'] == 'Project updated successfully'
+    (project,) = [
+        p for p in client.get('/api/v1/projects').get_json() if p['name'] == 'Upserted'
+    ]
+    assert (project['id'], project['language'], project['framework']) == (
+        response.get_json()['id'],
+        'python',
+        'flask',
+    )
+
+
+def test_one_open_session_per_user(tmp_path):
+    """Test the unique indexes on open sessions and starting with a per-user scope"""
+    import sqlite3
+    from sqlalchemy.exc import IntegrityError
+    from app import init_database
+    db_path = str(tmp_path / 'open.db')
+    config = {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'TESTING': True,
+        'TIMEZONE': 'UTC',
+    }
+    app = create_app(dict(config, ACTIVE_SESSION_SCOPE='user'))
+    init_database(app)
+    
+    # Databases that already have two open sessions in a project are repaired on upgrade
+    conn = sqlite3.connect(db_path)
+    conn.executescript('''
+        DROP INDEX uq_sessions_open_project_id;
+        DROP INDEX uq_sessions_open_userid;
+        INSERT INTO projects (id, name, userid) VALUES (1, 'Old', 'alice');
+        INSERT INTO sessions (project_id, start_time, description, userid) VALUES
+            (1, '2024-01-08 09:00:00.000000', 'First', 'alice'),
+            (1, '2024-01-08 10:00:00.000000', 'Second', 'alice');
+    ''')
+    init_database(app)
+    assert conn.execute('SELECT id, end_time FROM sessions ORDER BY id').fetchall() == [
+        (1, '2024-01-08 10:00:00.000000'), (2, None)]
+    
+    client = app.test_client()
+    headers = {'X-Time-Tracker-User': 'alice'}
+    client.post('/api/v1/sessions/start', headers=headers, json={
+        'project': 'New', 'description': 'Work', 'timestamp': '2024-01-08T11:00:00'})
+    assert conn.execute(
+        'SELECT id, end_time FROM sessions WHERE end_time IS NULL OR id = 2 ORDER BY id'
+    ).fetchall() == [(2, '2024-01-08 11:00:00.000000'), (3, None)]
+    response = client.post('/api/v1/sessions/stop', headers=headers, json={
+        'project': 'New', 'timestamp': '2024-01-08T12:30:00'})
+    assert response.get_json()['duration_minutes'] == 90
+    conn.close()
+    
+    with app.app_context():
+        from app import Session
+        for project_id in (1, 1):
+            db.session.add(
+                Session(project_id=project_id, description='Open', userid='bob')
+            )
+        with pytest.raises(IntegrityError):
+            db.session.commit()
+
+
+def test_new_project_created_once_under_concurrent_writes(tmp_path):
+    """Test historical sessions and commit imports racing to create a project"""
+    import sqlite3
+    import threading
+    from app import init_database
+    db_path = str(tmp_path / 'race.db')
+    app = create_app(
+        {
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+            'TESTING': True,
+            'TIMEZONE': 'UTC',
+        }
+    )
+    init_database(app)
+
+    statuses = []
+    ready = threading.Barrier(8)
+
+    def write(i):
+        client = app.test_client()
+        ready.wait(5)
+        if i % 2:
+            response = client.post(
+                '/api/v1/commits/bulk',
+                json={
+                    'project': 'Raced',
+                    'commits': [
+                        {
+                            'hash': f'{i:040x}',
+                            'timestamp': '2024-01-08T09:30:00',
+                            'message': 'Fix',
+                        }
+                    ],
+                },
+            )
+        else:
+            response = client.post(
+                '/api/v1/sessions/create',
+                json={
+                    'project': 'Raced',
+                    'description': 'Work',
+                    'start_time': f'2024-01-08T{9 + i:02d}:00:00',
+                    'end_time': f'2024-01-08T{9 + i:02d}:30:00',
+                },
+            )
+        statuses.append(response.status_code)
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert statuses == [200] * 8
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('SELECT COUNT(*) FROM projects').fetchone()[0] == 1
+    assert conn.execute(
+        'SELECT COUNT(*), COUNT(DISTINCT project_id) FROM sessions'
+    ).fetchone() == (4, 1)
+    conn.close()
+
+
+def test_heartbeats_aggregated_into_sessions(client):
+    """Test heartbeats open, extend and split sessions on flush, not stored as rows"""
+    from datetime import datetime, timezone
+    aggregator = client.application.extensions['heartbeats']
+    t0 = datetime(2024, 6, 3, 9, tzinfo=timezone.utc).timestamp()
+    
+    def send(*minutes, project='Editor'):
+        return client.post(
+            '/api/v1/heartbeats',
+            json={
+                'heartbeats': [
+                    {
+                        'project': project,
+                        'branch': 'main',
+                        'file': 'app.py',
+                        'timestamp': t0 + m * 60,
+                    }
+                    for m in minutes
+                ]
+            },
+        )
+    
+    assert send(0, 1, 2, 30, 31).get_json() == {'accepted': 5}
+    assert aggregator.flush() == 2
+    send(33)
+    assert aggregator.flush() == 1
+    assert aggregator.flush() == 0
+    sessions = client.get('/api/v1/sessions/overlaps').get_json()['sessions_checked']
+    assert sessions == 2
+    data = client.get(
+        '/api/v1/reports?from=2024-06-03&to=2024-06-03'
+        '&project=Editor&include_sessions=true'
+    ).get_json()
+    assert sorted(s['duration_minutes'] for s in data['sessions']) == [2, 3]
+    assert {s['description'] for s in data['sessions']} == {'Editing on main'}
+    
+    # Activity in a project with a running tt session only keeps it from going stale
+    client.post(
+        '/api/v1/sessions/start',
+        json={
+            'project': 'Tracked',
+            'description': 'Work',
+            'timestamp': '2024-06-03T08:00:00',
+        },
+    )
+    send(10, 12, project='Tracked')
+    aggregator.flush()
+    assert client.get('/api/v1/sessions/overlaps').get_json()['sessions_checked'] == 3
+    from app import Session
+    assert (
+        Session.query.filter_by(description='Work').one().last_seen_at.isoformat()
+        == '2024-06-03T09:12:00+00:00'
+    )
+    
+    assert (
+        client.post(
+            '/api/v1/heartbeats',
+            json={'heartbeats': [{'project': 'Editor', 'timestamp': 'soon'}]},
+        ).status_code
+        == 400
+    )
+
+
+def test_heartbeat_spans_kept_when_write_fails():
+    """Test a failed flush leaves its spans to be written by the next one"""
+    from datetime import datetime
+    from heartbeats import HeartbeatAggregator
+    written = []
+
+    def write(spans):
+        if not written:
+            written.append(None)
+            raise RuntimeError('database is locked')
+        written.extend((span['start'].minute, span['end'].minute) for span in spans)
+        return list(range(len(spans)))
+
+    aggregator = HeartbeatAggregator(write, gap_minutes=5, flush_size=3)
+    assert not aggregator.add(
+        'alice', 'UTC', [('P', None, datetime(2024, 1, 1, 9, m)) for m in (0, 2)]
+    )
+    assert aggregator.add(
+        'alice', 'UTC', [('P', None, datetime(2024, 1, 1, 9, m)) for m in (20, 21)]
+    )
+    with pytest.raises(RuntimeError):
+        aggregator.flush()
+    assert aggregator.flush(now=datetime(2024, 1, 1, 10)) == 2
+    assert written == [None, (0, 2), (20, 21)]
+    assert aggregator.flush() == 0
+
+
+def test_write_queue_group_commits_and_backpressure(tmp_path):
+    """Test queued writes are committed together and keep their request context
+
+    A full queue pushes back.
+    """
+    import sqlite3
+    import threading
+    import time
+    from app import init_database
+    from write_queue import WriteQueue, WriteQueueFull
+    db_path = str(tmp_path / 'queued.db')
+    app = create_app(
+        {
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+            'TESTING': True,
+            'TIMEZONE': 'UTC',
+            'WRITE_QUEUE': True,
+            'WRITE_QUEUE_WINDOW_MS': 20,
+        }
+    )
+    init_database(app)
+    
+    statuses = []
+
+    def start(user):
+        client = app.test_client()
+        headers = {'X-Time-Tracker-User': user}
+        statuses.append(
+            client.post(
+                '/api/v1/sessions/start',
+                headers=headers,
+                json={'project': f'{user} project', 'description': 'Work'},
+            ).status_code
+        )
+        statuses.append(
+            client.post(
+                '/api/v1/sessions/stop', json={'project': 'Missing'}
+            ).status_code
+        )
+
+    threads = [threading.Thread(target=start, args=(f'user{i}',)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(statuses) == [200] * 8 + [404] * 8
+    conn = sqlite3.connect(db_path)
+    assert (
+        conn.execute(
+            "SELECT COUNT(*) FROM sessions WHERE userid || ' project' = "
+            "(SELECT name FROM projects WHERE id = project_id)"
+        ).fetchone()[0]
+        == 8
+    )
+    conn.close()
+    
+    # One write holds the writer thread, one waits in the queue, the next is turned away
+    release = threading.Event()
+    writes = WriteQueue(app, db, max_pending=1, window_ms=0)
+    threads = [threading.Thread(target=writes.submit, args=(lambda: release.wait(5),))]
+    threads[0].start()
+    while not writes._queue.empty():
+        time.sleep(0.001)
+    threads.append(threading.Thread(target=writes.submit, args=(lambda: None,)))
+    threads[1].start()
+    while writes._queue.empty():
+        time.sleep(0.001)
+    with pytest.raises(WriteQueueFull):
+        writes.submit(lambda: None)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+
+def test_idempotency_key_replays_stored_response(client):
+    """Test a retried write with the same Idempotency-Key is answered, not run again"""
+    def post(path, key, **data):
+        return client.post(
+            f'/api/v1/sessions/{path}', headers={'Idempotency-Key': key}, json=data
+        )
+    
+    first = post('start', 'start-1', project='Retry Project', description='Work')
+    again = post('start', 'start-1', project='Retry Project', description='Work')
+    assert (
+        again.get_json() == first.get_json()
+        and again.headers['Idempotent-Replayed'] == 'true'
+    )
+    
+    # A break toggle retried would otherwise end the break it started
+    assert (
+        post('break', 'break-1', project='Retry Project').get_json()['action']
+        == 'started'
+    )
+    assert (
+        post('break', 'break-1', project='Retry Project').get_json()['action']
+        == 'started'
+    )
+    assert post('break', 'break-1', project='Other Project').status_code == 422
+    
+    created = [
+        post(
+            'create',
+            'create-1',
+            project='Retry Project',
+            description='Earlier',
+            start_time='2024-02-01T09:00:00',
+            end_time='2024-02-01T10:00:00',
+        )
+        for _ in range(2)
+    ]
+    assert created[0].get_json()['session_id'] == created[1].get_json()['session_id']
+    
+    status = client.get('/api/v1/sessions/status?project=Retry Project').get_json()
+    assert status['active_session'] and status['active_break']
+    assert client.get('/api/v1/sessions/overlaps').get_json()['sessions_checked'] == 2
+
+
+def test_idempotency_keys_scoped_to_user_endpoint_and_event(client):
+    """Test header keys and replayed event ids answer only their own request
+
+    They never answer for another user, endpoint or event.
+    """
+    event = {'id': 'shared', 'type': 'start', 'timestamp': '2024-02-01T09:00:00',
+             'payload': {'project': 'Scoped', 'description': 'Offline'}}
+    assert (
+        client.post('/api/v1/sessions/replay', json={'events': [event]}).get_json()[
+            'applied'
+        ]
+        == 1
+    )
+    
+    # The same string as a header key is a fresh key, per user and per endpoint
+    def post(path, user, **data):
+        return client.post(
+            f'/api/v1/{path}',
+            json=data,
+            headers={'Idempotency-Key': 'shared', 'X-Time-Tracker-User': user},
+        )
+    created = post('projects', 'alice', name='Scoped Two')
+    assert (
+        'Idempotent-Replayed' not in created.headers
+        and created.get_json()['name'] == 'Scoped Two'
+    )
+    assert (
+        post('projects', 'bob', name='Scoped Three').get_json()['name']
+        == 'Scoped Three'
+    )
+    assert (
+        post('sessions/break', 'alice', project='Scoped').get_json()['action']
+        == 'started'
+    )
+    
+    # Reusing an event id for a different event is refused rather than replayed
+    other = dict(event, timestamp='2024-02-02T09:00:00')
+    (result,) = client.post(
+        '/api/v1/sessions/replay', json={'events': [other]}
+    ).get_json()['results']
+    assert (result['status'], result['replayed']) == (422, False)
+
+
+def test_idempotency_keys_expire(tmp_path):
+    """Test stored idempotency keys are dropped after their TTL and past the limit"""
+    import sqlite3
+    from datetime import timedelta
+    from maintenance import expire_idempotency_keys
+    from timezones import STORAGE_FORMAT, utcnow
+    conn = sqlite3.connect(str(tmp_path / 'keys.db'))
+    conn.execute(
+        'CREATE TABLE idempotency_keys (key TEXT PRIMARY KEY, created_at TEXT)'
+    )
+    now = utcnow()
+    conn.executemany(
+        'INSERT INTO idempotency_keys VALUES (?, ?)',
+        [
+            (f'key{hours}', (now - timedelta(hours=hours)).strftime(STORAGE_FORMAT))
+            for hours in (1, 2, 3, 30, 50)
+        ],
+    )
+    assert expire_idempotency_keys(conn, ttl_hours=24, max_keys=2) == 3
+    assert [
+        row[0] for row in conn.execute('SELECT key FROM idempotency_keys ORDER BY key')
+    ] == ['key1', 'key2']
+    conn.close()
+
+
+def test_batch_runs_operations_in_one_transaction(client):
+    """Test /batch applies operations in order, with references to earlier results"""
+    operations = [
+        {
+            'id': 'project',
+            'path': '/projects',
+            'body': {'name': 'Backfill', 'language': 'python'},
+        },
+        {
+            'id': 'old',
+            'path': '/sessions/create',
+            'body': {
+                'project': {'$ref': 'project.name'},
+                'description': 'Imported',
+                'start_time': '2024-03-01T09:00:00',
+                'end_time': '2024-03-01T11:00:00',
+            },
+        },
+        {
+            'path': '/commits/bulk',
+            'body': {
+                'project': {'$ref': 'old.project'},
+                'commits': [
+                    {
+                        'hash': 'a' * 40,
+                        'timestamp': '2024-03-01T10:00:00',
+                        'message': 'Fix',
+                    }
+                ],
+            },
+        },
+        {
+            'path': '/sessions/start',
+            'body': {
+                'project': 'Backfill',
+                'description': 'Live',
+                'timestamp': '2024-03-02T09:00:00',
+            },
+        },
+        {
+            'path': '/sessions/break',
+            'body': {'project': 'Backfill', 'timestamp': '2024-03-02T10:00:00'},
+        },
+        {
+            'path': '/sessions/break',
+            'body': {'project': 'Backfill', 'timestamp': '2024-03-02T10:30:00'},
+        },
+        {
+            'path': '/sessions/stop',
+            'body': {'project': 'Backfill', 'timestamp': '2024-03-02T12:00:00'},
+        },
+    ]
+    data = client.post('/api/v1/batch', json={'operations': operations}).get_json()
+    assert data['applied'] == 7 and data['results'][2]['body']['matched'] == 1
+    assert data['results'][6]['body']['break_minutes'] == 30
+    
+    # An atomic batch is rolled back as a whole when one operation fails
+    failing = [
+        {'path': '/projects', 'body': {'name': 'Rolled Back'}},
+        {
+            'path': '/sessions/create',
+            'body': {
+                'project': 'Backfill',
+                'description': 'Overlapping',
+                'start_time': '2024-03-01T10:00:00',
+                'end_time': '2024-03-01T10:30:00',
+            },
+        },
+    ]
+    response = client.post('/api/v1/batch', json={'operations': failing})
+    assert response.status_code == 409 and response.get_json()['failed'] == 1
+    assert 'Rolled Back' not in [
+        project['name'] for project in client.get('/api/v1/projects').get_json()
+    ]
+    
+    # Otherwise only the failed operations are dropped; references to them fail too
+    failing.append(
+        {
+            'path': '/sessions/start',
+            'body': {'project': 'Backfill', 'description': {'$ref': '1.session_id'}},
+        }
+    )
+    data = client.post(
+        '/api/v1/batch', json={'operations': failing, 'atomic': False}
+    ).get_json()
+    assert [result['status'] for result in data['results']] == [200, 409, 400]
+    assert 'Rolled Back' in [
+        project['name'] for project in client.get('/api/v1/projects').get_json()
+    ]
+
+
+def test_session_store_matches_sql_analytics(tmp_path):
+    """Test analytics read from the session store match the SQL queries
+
+    They keep matching across writes and restarts.
+    """
+    import sqlite3
+    from datetime import timedelta
+    from app import init_database, save_session_store
+    from timezones import utcnow
+    config = {
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'store.db'}",
+        'TESTING': True,
+        'TIMEZONE': 'UTC',
+        'SESSION_STORE_SNAPSHOT': str(tmp_path / 'store.db.sessions')
+    }
+    plain = create_app(config)
+    init_database(plain)
+    stored = create_app(dict(config, SESSION_STORE=True))
+    client = plain.test_client()
+    
+    now = utcnow().replace(minute=0, second=0, microsecond=0)
+
+    def create(days_ago, hours, category, at=5):
+        start = now - timedelta(days=days_ago, hours=at)
+        return client.post(
+            '/api/v1/sessions/create',
+            json={
+                'project': 'Columns',
+                'description': 'Work',
+                'category': category,
+                'start_time': start.isoformat(),
+                'end_time': (start + timedelta(hours=hours, minutes=7)).isoformat(),
+            },
+        ).get_json()['session_id']
+    
+    def analytics(app):
+        with app.test_client() as test_client:
+            return [
+                test_client.get(f'/api/v1/analytics/{path}').get_json()
+                for path in (
+                    f'heatmap?project=Columns&year={now.year}',
+                    'category-breakdown?project=Columns',
+                    'productivity-trends?project=Columns',
+                    'session-patterns?project=Columns',
+                )
+            ]
+    
+    for days_ago, hours, category in [
+        (1, 1, 'development'),
+        (2, 2, 'design'),
+        (2, 3, 'testing'),
+        (40, 1, 'design'),
+    ]:
+        create(days_ago, hours, category, at=9 if category == 'testing' else 5)
+    assert analytics(stored) == analytics(plain)
+    
+    # Writes through the API, category merges and changes made outside the server
+    # are picked up
+    removed = create(3, 4, 'design')
+    client.post('/api/v1/categories/design/merge', json={'into': 'development'})
+    client.post(
+        '/api/v1/sessions/start', json={'project': 'Columns', 'description': 'Open'}
+    )
+    conn = sqlite3.connect(str(tmp_path / 'store.db'))
+    with conn:
+        conn.execute('DELETE FROM sessions WHERE id = ?', (removed,))
+    conn.close()
+    assert analytics(stored) == analytics(plain)
+    
+    # A restarted server starts from the snapshot and catches up from the change feed
+    save_session_store(stored)
+    create(4, 2, 'testing')
+    restarted = create_app(dict(config, SESSION_STORE=True))
+    assert analytics(restarted) == analytics(plain)
+    assert len(restarted.extensions['session_store']) == 6
+
+
+def test_projects_serialized_from_selected_columns(client):
+    """Test project lists are serialized from column rows, as records or as columns"""
+    from datetime import datetime
+    from responses import serialize_rows
+    assert serialize_rows(
+        [(1, datetime(2024, 1, 2, 3, 4), None)], ['id', 'at', 'none']
+    ) == [{'id': 1, 'at': '2024-01-02T03:04:00', 'none': None}]
+    assert serialize_rows([], ['id', 'at'], as_columns=True) == {'id': [], 'at': []}
+    
+    client.post('/api/v1/projects', json={'name': 'Rows', 'language': 'python'})
+    client.post('/api/v1/projects', json={'name': 'Columns'})
+    projects = client.get('/api/v1/projects').get_json()
+    assert [
+        (project['name'], project['language'], project['type']) for project in projects
+    ] == [('Rows', 'python', 'development'), ('Columns', None, 'development')]
+    columns = client.get('/api/v1/projects?format=columnar').get_json()
+    assert columns['name'] == ['Rows', 'Columns'] and columns['created_at'] == [
+        p['created_at'] for p in projects
+    ]
+
+
+def test_projects_paged_filtered_and_counted(client):
+    """Test /projects pages with a keyset cursor, filters and embeds counts
+
+    Filters are by name prefix and type.
+    """
+    for name in ['alpha', 'alpine', 'beta', 'alps', 'gamma']:
+        client.post(
+            '/api/v1/projects',
+            json={
+                'name': name,
+                'type': 'web' if name.startswith('al') else 'development',
+            },
+        )
+    client.post(
+        '/api/v1/sessions/create',
+        json={
+            'project': 'beta',
+            'description': 'Work',
+            'start_time': '2024-01-01T09:00:00',
+            'end_time': '2024-01-01T10:30:00',
+        },
+    )
+    
+    def pages(**params):
+        names, cursor = [], None
+        while True:
+            response = client.get(
+                '/api/v1/projects',
+                query_string=dict(
+                    params, limit=2, **({'cursor': cursor} if cursor else {})
+                ),
+            )
+            names.append([project['name'] for project in response.get_json()])
+            cursor = response.headers.get('X-Next-Cursor')
+            if not cursor:
+                return names
+    
+    assert pages(sort='name') == [['alpha', 'alpine'], ['alps', 'beta'], ['gamma']]
+    assert pages(sort='last_activity')[0] == ['beta', 'gamma']
+    assert pages(prefix='alp', type='web') == [['alpha', 'alpine'], ['alps']]
+    assert pages(type='development') == [['beta', 'gamma']]
+    
+    response = client.get(
+        '/api/v1/projects?prefix=al&counts=true&total=true&sort=name&limit=1'
+    )
+    assert response.headers['X-Total-Count'] == '3'
+    assert [
+        (p['name'], p['sessions'], p['total_hours']) for p in response.get_json()
+    ] == [('alpha', 0, 0)]
+    beta, = client.get('/api/v1/projects?prefix=beta&counts=true').get_json()
+    assert (beta['sessions'], beta['total_hours']) == (1, 1.5)
+    assert client.get('/api/v1/projects?cursor=nonsense').status_code == 400
+    assert client.get('/api/v1/projects?limit=5000').status_code == 400
+
+
+def test_projects_without_last_activity_still_page(client):
+    """Test recent-first pages fall back to created_at, and keep undated projects"""
+    for name in ['alpha', 'beta', 'gamma', 'delta']:
+        client.post('/api/v1/projects', json={'name': name})
+    db.session.execute(
+        db.text(
+            "UPDATE projects SET last_activity = NULL WHERE name IN ('alpha', 'gamma')"
+        )
+    )
+    db.session.execute(
+        db.text("UPDATE projects SET created_at = NULL WHERE name = 'gamma'")
+    )
+    db.session.commit()
+    
+    names, cursor = [], None
+    while True:
+        response = client.get(
+            '/api/v1/projects',
+            query_string={'sort': 'last_activity', 'limit': 1, 'cursor': cursor or ''},
+        )
+        names += [project['name'] for project in response.get_json()]
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+    assert names == ['delta', 'beta', 'alpha', 'gamma']
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Time zone handling for Universal Time Tracker
+Timestamps are stored in UTC. Each session also records the time zone of
+the user who tracked it, along with its local date, hour and ISO week in
+that zone. These are computed when the session is written, so reports
+group by them in SQL and day boundaries stay right across DST changes.
+"""
+
+import os
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy.types import DateTime, TypeDecorator
+
+# Request header carrying the caller's IANA time zone, e.g. Europe/Berlin
+TIMEZONE_HEADER = 'X-Time-Tracker-Timezone'
+
+# Format SQLAlchemy uses for DateTime values in SQLite
+STORAGE_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+
+@lru_cache(maxsize=None)
+def get_zone(name):
+    return ZoneInfo(name)
+
+
+def valid_timezone(name):
+    try:
+        get_zone(name)
+        return True
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+
+
+def server_timezone_name():
+    """Zone assumed for callers that don't name one
+
+    TIME_TRACKER_TIMEZONE, then TZ, then UTC.
+    """
+    for name in (os.environ.get('TIME_TRACKER_TIMEZONE'), os.environ.get('TZ')):
+        name = (name or '').lstrip(':')
+        if name and valid_timezone(name):
+            return name
+    return 'UTC'
+
+
+def utcnow():
+    return datetime.now(timezone.utc)
+
+
+def to_utc(value, zone_name):
+    """An aware UTC datetime; naive values are taken to be local time in zone_name"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=get_zone(zone_name))
+    return value.astimezone(timezone.utc)
+
+
+def local_today(zone_name):
+    return utcnow().astimezone(get_zone(zone_name)).date()
+
+
+def local_fields(value, zone_name):
+    """local_date, local_hour and iso_week of a timestamp (naive means UTC) in a zone"""
+    local = to_utc(value, 'UTC').astimezone(get_zone(zone_name))
+    year, week, _ = local.isocalendar()
+    return {
+        'local_date': local.date().isoformat(),
+        'local_hour': local.hour,
+        'iso_week': f'{year}-W{week:02d}'
+    }
+
+
+def local_time(value, zone_name):
+    """A stored UTC timestamp as local time in a zone"""
+    return to_utc(value, 'UTC').astimezone(get_zone(zone_name))
+
+
+class UTCDateTime(TypeDecorator):
+    """DateTime stored as naive UTC and loaded as an aware UTC datetime
+
+    Aware values are converted to UTC on the way in; naive values are taken
+    to be UTC already.
+    """
+
+    impl = DateTime
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if isinstance(value, datetime) and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        elif isinstance(value, date) and not isinstance(value, datetime):
+            value = datetime(value.year, value.month, value.day)
+        return value
+
+    def process_result_value(self, value, dialect):
+        if value is not None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Group-commit write queue for Universal Time Tracker
+Request threads hand their writes to one writer thread, which runs the
+writes that arrive close together in a single transaction. Each write runs
+in its own savepoint, so a failing one doesn't undo the others, and the
+whole group costs one commit (one fsync) instead of one per request.
+"""
+
+import logging
+import queue
+import threading
+import time
+
+from flask import copy_current_request_context, has_request_context
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_WINDOW_MS = 2
+DEFAULT_MAX_PENDING = 1000
+
+
+class WriteQueueFull(Exception):
+    """The queue has no room for another write; the caller should retry later"""
+
+
+class WriteQueue:
+    """Run writes on one thread and commit them in groups
+
+    Writes are functions that change db.session without committing (see
+    run_event in app.py). They run with a copy of the submitting request's
+    context, so helpers reading headers behave as they would in the request.
+    `retryable(error)` says whether a write that raised can be run again.
+    """
+
+    def __init__(
+        self,
+        app,
+        db,
+        batch_size=DEFAULT_BATCH_SIZE,
+        window_ms=DEFAULT_WINDOW_MS,
+        max_pending=DEFAULT_MAX_PENDING,
+        retryable=None,
+        retries=3,
+    ):
+        self.app = app
+        self.db = db
+        self.batch_size = batch_size
+        self.window = window_ms / 1000
+        self.retryable = retryable or (lambda error: False)
+        self.retries = retries
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, func):
+        """Queue a write and wait for its result
+
+        Raises WriteQueueFull when the queue is full.
+        """
+        if has_request_context():
+            func = copy_current_request_context(func)
+        item = {'func': func, 'result': None, 'error': None, 'done': threading.Event()}
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            raise WriteQueueFull(f'{self._queue.maxsize} writes are already waiting')
+        self._start()
+        item['done'].wait()
+        if item['error'] is not None:
+            raise item['error']
+        return item['result']
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='timetracker-writer', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                batch = [self._queue.get()]
+                # Take in whatever else arrives within the window
+                deadline = time.monotonic() + self.window
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(
+                            self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                        )
+                    except queue.Empty:
+                        break
+                try:
+                    self._apply(batch)
+                finally:
+                    self.db.session.remove()
+                    for item in batch:
+                        item['done'].set()
+
+    def _run_item(self, item):
+        for attempt in range(self.retries):
+            try:
+                item['result'], item['error'] = item['func'](), None
+                return
+            except Exception as e:
+                item['error'] = e
+                if attempt + 1 == self.retries or not self.retryable(e):
+                    return
+                time.sleep(0.01 * 2 ** attempt)
+
+    def _apply(self, batch):
+        """Run a batch of writes and commit them together"""
+        for item in batch:
+            self._run_item(item)
+        try:
+            self.db.session.commit()
+        except Exception as e:
+            self.db.session.rollback()
+            if len(batch) == 1:
+                batch[0]['error'] = e
+                return
+            # Find the write that can't be committed by committing each on its own
+            logger.warning(
+                f"Group commit of {len(batch)} writes failed ({e}); "
+                "committing them one by one"
+            )
+            for item in batch:
+                self._apply([item])
+            return
+        if len(batch) > 1:
+            logger.debug(f"Committed {len(batch)} writes together")
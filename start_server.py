@@ -13,7 +13,7 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'server', 'src'))
 os.environ['DATABASE_PATH'] = os.path.join(os.path.dirname(__file__), 'data', 'timetracker.db')
 
 # Import and run the Flask app
-from app import app
+from app import app, init_database, start_background_jobs
 
 if __name__ == '__main__':
     print("Starting Universal Time Tracker Server...")
@@ -22,4 +22,7 @@ if __name__ == '__main__':
     print("Press Ctrl+C to stop the server")
     print()
     
+    init_database(app)
+    start_background_jobs(app, use_reloader=True)
+    
     app.run(host='0.0.0.0', port=5000, debug=True) 
\ No newline at end of file